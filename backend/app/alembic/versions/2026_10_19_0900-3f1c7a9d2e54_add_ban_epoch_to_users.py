@@ -0,0 +1,28 @@
+"""Add ban_epoch to users
+
+Revision ID: 3f1c7a9d2e54
+Revises: b9d85530861e
+Create Date: 2026-10-19 09:00:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c7a9d2e54'
+down_revision: Union[str, None] = 'b9d85530861e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('ban_epoch', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_users_revoked', 'users', ['id', 'ban_epoch', 'is_banned'], unique=False, postgresql_where=sa.text('ban_epoch > 0'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_revoked', table_name='users', postgresql_where=sa.text('ban_epoch > 0'))
+    op.drop_column('users', 'ban_epoch')
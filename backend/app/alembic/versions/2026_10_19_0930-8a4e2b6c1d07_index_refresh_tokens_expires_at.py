@@ -0,0 +1,26 @@
+"""Index refresh_tokens.expires_at for the expiry reaper
+
+Revision ID: 8a4e2b6c1d07
+Revises: 3f1c7a9d2e54
+Create Date: 2026-10-19 09:30:41.772915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e2b6c1d07'
+down_revision: Union[str, None] = '3f1c7a9d2e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
@@ -0,0 +1,32 @@
+"""Create unlogged rate_limit_buckets table
+
+Revision ID: c52d9e0f4a18
+Revises: 8a4e2b6c1d07
+Create Date: 2026-10-19 10:00:03.905117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52d9e0f4a18'
+down_revision: Union[str, None] = '8a4e2b6c1d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
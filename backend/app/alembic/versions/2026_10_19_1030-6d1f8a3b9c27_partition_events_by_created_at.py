@@ -0,0 +1,104 @@
+"""Partition events by created_at
+
+Revision ID: 6d1f8a3b9c27
+Revises: c52d9e0f4a18
+Create Date: 2026-10-19 10:30:12.418309
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1f8a3b9c27'
+down_revision: Union[str, None] = 'c52d9e0f4a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monthly partitions created up front; later ones come from the maintenance task
+PARTITIONS_AHEAD = 3
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE events RENAME TO events_legacy")
+    op.execute("ALTER TABLE events_legacy RENAME CONSTRAINT events_pkey TO events_legacy_pkey")
+    op.drop_index('ix_events_listing_id', table_name='events_legacy')
+    op.drop_index('ix_events_type_created_at_desc', table_name='events_legacy')
+    op.drop_index('ix_events_user_id', table_name='events_legacy')
+
+    op.execute("""
+        CREATE TABLE events (
+            id UUID NOT NULL,
+            user_id UUID CONSTRAINT events_user_id_fkey REFERENCES users (id) ON DELETE SET NULL,
+            event_type VARCHAR NOT NULL,
+            listing_id UUID CONSTRAINT events_listing_id_fkey REFERENCES listings (id) ON DELETE SET NULL,
+            region VARCHAR,
+            city VARCHAR,
+            metadata JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            CONSTRAINT events_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+
+    oldest = op.get_bind().scalar(sa.text("SELECT MIN(created_at) FROM events_legacy"))
+    today = datetime.now(timezone.utc).date()
+    month = (oldest.astimezone(timezone.utc).date() if oldest else today).replace(day=1)
+    for _ in range(PARTITIONS_AHEAD):
+        today = _next_month(today)
+    while month < today:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE events_p{month:%Y%m} PARTITION OF events "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+        month = end
+
+    op.execute("""
+        INSERT INTO events (id, user_id, event_type, listing_id, region, city, metadata, created_at)
+        SELECT id, user_id, event_type, listing_id, region, city, metadata, created_at FROM events_legacy
+    """)
+    op.drop_table('events_legacy')
+
+    op.create_index(op.f('ix_events_listing_id'), 'events', ['listing_id'], unique=False)
+    op.create_index('ix_events_type_created_at_desc', 'events', ['event_type', sa.text('created_at DESC')], unique=False)
+    op.create_index(op.f('ix_events_user_id'), 'events', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE events RENAME TO events_partitioned")
+    op.execute("ALTER TABLE events_partitioned RENAME CONSTRAINT events_pkey TO events_partitioned_pkey")
+    op.drop_index('ix_events_listing_id', table_name='events_partitioned')
+    op.drop_index('ix_events_type_created_at_desc', table_name='events_partitioned')
+    op.drop_index('ix_events_user_id', table_name='events_partitioned')
+
+    op.execute("""
+        CREATE TABLE events (
+            id UUID NOT NULL,
+            user_id UUID CONSTRAINT events_user_id_fkey REFERENCES users (id) ON DELETE SET NULL,
+            event_type VARCHAR NOT NULL,
+            listing_id UUID CONSTRAINT events_listing_id_fkey REFERENCES listings (id) ON DELETE SET NULL,
+            region VARCHAR,
+            city VARCHAR,
+            metadata JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            CONSTRAINT events_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO events (id, user_id, event_type, listing_id, region, city, metadata, created_at)
+        SELECT id, user_id, event_type, listing_id, region, city, metadata, created_at FROM events_partitioned
+    """)
+    # Drops every partition along with the parent
+    op.drop_table('events_partitioned')
+
+    op.create_index(op.f('ix_events_listing_id'), 'events', ['listing_id'], unique=False)
+    op.create_index('ix_events_type_created_at_desc', 'events', ['event_type', sa.text('created_at DESC')], unique=False)
+    op.create_index(op.f('ix_events_user_id'), 'events', ['user_id'], unique=False)
@@ -0,0 +1,47 @@
+"""Create event_rollups_hourly
+
+Revision ID: 9e3c5a7b1f42
+Revises: 6d1f8a3b9c27
+Create Date: 2026-10-19 11:00:41.207733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3c5a7b1f42'
+down_revision: Union[str, None] = '6d1f8a3b9c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('event_rollups_hourly',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('region', sa.String(), nullable=True),
+    sa.Column('city', sa.String(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('listing_id', sa.UUID(), nullable=True),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_event_rollups_hourly_key', 'event_rollups_hourly', ['hour', 'event_type', 'region', 'city', 'category', 'listing_id'], unique=True, postgresql_nulls_not_distinct=True)
+
+    # Backfill from history; new events are rolled up as they are ingested
+    op.execute("""
+        INSERT INTO event_rollups_hourly (hour, event_type, region, city, category, listing_id, count)
+        SELECT date_trunc('hour', e.created_at, 'UTC'), e.event_type, e.region, e.city, l.category, e.listing_id, COUNT(*)
+        FROM events e
+        LEFT JOIN listings l ON l.id = e.listing_id
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_event_rollups_hourly_key', table_name='event_rollups_hourly')
+    op.drop_table('event_rollups_hourly')
@@ -0,0 +1,50 @@
+"""Add category to events and backfill event enrichment
+
+Revision ID: 2b7e4d9a0c63
+Revises: 9e3c5a7b1f42
+Create Date: 2026-10-19 11:30:26.650194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7e4d9a0c63'
+down_revision: Union[str, None] = '9e3c5a7b1f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('category', sa.String(), nullable=True))
+
+    # Historical events were stored without geo or category
+    op.execute("""
+        UPDATE events e SET region = u.region, city = u.city
+        FROM users u
+        WHERE u.id = e.user_id AND e.region IS NULL AND e.city IS NULL
+    """)
+    op.execute("""
+        UPDATE events e SET category = l.category
+        FROM listings l
+        WHERE l.id = e.listing_id
+    """)
+
+    # Re-aggregate the rollups still backed by raw events so they pick up the new dimensions
+    op.execute("""
+        DELETE FROM event_rollups_hourly
+        WHERE hour >= (SELECT date_trunc('hour', MIN(created_at), 'UTC') FROM events)
+    """)
+    op.execute("""
+        INSERT INTO event_rollups_hourly (hour, event_type, region, city, category, listing_id, count)
+        SELECT date_trunc('hour', created_at, 'UTC'), event_type, region, city, category, listing_id, COUNT(*)
+        FROM events
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('events', 'category')
@@ -0,0 +1,26 @@
+"""Add suppressed count to event_rollups_hourly
+
+Revision ID: f4a6c8e2b915
+Revises: 2b7e4d9a0c63
+Create Date: 2026-10-19 12:00:18.533920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a6c8e2b915'
+down_revision: Union[str, None] = '2b7e4d9a0c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('event_rollups_hourly', sa.Column('suppressed', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('event_rollups_hourly', 'suppressed')
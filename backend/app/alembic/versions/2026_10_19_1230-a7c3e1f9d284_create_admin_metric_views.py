@@ -0,0 +1,66 @@
+"""Create admin metrics materialized views
+
+Revision ID: a7c3e1f9d284
+Revises: f4a6c8e2b915
+Create Date: 2026-10-19 12:30:07.114862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e1f9d284'
+down_revision: Union[str, None] = 'f4a6c8e2b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VIEWS = {
+    "mv_user_signups_daily": (
+        """
+        SELECT (created_at AT TIME ZONE 'UTC')::date AS day, region, city, COUNT(*) AS users
+        FROM users
+        GROUP BY 1, 2, 3
+        """,
+        "day, region, city",
+    ),
+    "mv_listing_stats_daily": (
+        """
+        SELECT (l.created_at AT TIME ZONE 'UTC')::date AS day, u.region, u.city, l.category, l.status,
+               COUNT(*) AS listings
+        FROM listings l
+        JOIN users u ON l.seller_id = u.id
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+        "day, region, city, category, status",
+    ),
+    "mv_event_activity_daily": (
+        """
+        SELECT (hour AT TIME ZONE 'UTC')::date AS day, event_type, region, city, category,
+               SUM(count)::bigint AS events, SUM(suppressed)::bigint AS suppressed
+        FROM event_rollups_hourly
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+        "day, event_type, region, city, category",
+    ),
+}
+
+
+def upgrade() -> None:
+    op.create_table('metric_view_refreshes',
+    sa.Column('view_name', sa.String(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('view_name')
+    )
+    for name, (query, key) in VIEWS.items():
+        op.execute(f"CREATE MATERIALIZED VIEW {name} AS {query}")
+        op.execute(f"CREATE UNIQUE INDEX ux_{name} ON {name} ({key}) NULLS NOT DISTINCT")
+        op.execute(f"INSERT INTO metric_view_refreshes (view_name, refreshed_at) VALUES ('{name}', NOW())")
+
+
+def downgrade() -> None:
+    for name in VIEWS:
+        op.execute(f"DROP MATERIALIZED VIEW {name}")
+    op.drop_table('metric_view_refreshes')
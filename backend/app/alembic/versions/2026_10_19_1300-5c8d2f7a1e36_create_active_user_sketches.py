@@ -0,0 +1,38 @@
+"""Create active_user_sketches
+
+Revision ID: 5c8d2f7a1e36
+Revises: a7c3e1f9d284
+Create Date: 2026-10-19 13:00:27.530164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8d2f7a1e36'
+down_revision: Union[str, None] = 'a7c3e1f9d284'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('active_user_sketches',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('region', sa.String(), nullable=True),
+    sa.Column('registers', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_active_user_sketches_day_region', 'active_user_sketches', ['day', 'region'], unique=True, postgresql_nulls_not_distinct=True)
+
+    # Sketches for events already recorded are backfilled separately, day by day:
+    #     python -m app.scripts.backfill_active_users
+    # New events are merged in as they are ingested.
+
+
+def downgrade() -> None:
+    op.drop_index('ux_active_user_sketches_day_region', table_name='active_user_sketches')
+    op.drop_table('active_user_sketches')
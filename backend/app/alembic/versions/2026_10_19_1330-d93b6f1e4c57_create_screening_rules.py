@@ -0,0 +1,36 @@
+"""Create screening_rules
+
+Revision ID: d93b6f1e4c57
+Revises: 5c8d2f7a1e36
+Create Date: 2026-10-19 13:30:52.114870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b6f1e4c57'
+down_revision: Union[str, None] = '5c8d2f7a1e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('screening_rules',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('pattern', sa.String(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint("action IN ('flag', 'hide')", name='check_valid_action'),
+    sa.CheckConstraint("kind IN ('term', 'regex')", name='check_valid_kind'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'pattern', name='uq_screening_rules_kind_pattern')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('screening_rules')
@@ -0,0 +1,53 @@
+"""Add keyset pagination indexes to moderation_actions
+
+Revision ID: 3b7e9a2c5f18
+Revises: d93b6f1e4c57
+Create Date: 2026-10-19 14:00:27.630512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9a2c5f18'
+down_revision: Union[str, None] = 'd93b6f1e4c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # b9d85530861e is named for this table but never created it, so databases built
+    # from migrations alone do not have it yet
+    if not sa.inspect(op.get_bind()).has_table('moderation_actions'):
+        op.create_table('moderation_actions',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('admin_id', sa.UUID(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('target_type', sa.String(), nullable=False),
+        sa.Column('target_id', sa.UUID(), nullable=False),
+        sa.Column('reason', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['admin_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+        )
+    # The action and target indexes gain (created_at DESC, id DESC) so pages come off
+    # them in order; dropped and recreated under the same names
+    op.drop_index('ix_moderation_actions_action_created_at_desc', table_name='moderation_actions', if_exists=True)
+    op.drop_index('ix_moderation_actions_target', table_name='moderation_actions', if_exists=True)
+    op.create_index('ix_moderation_actions_created_at_id_desc', 'moderation_actions', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_moderation_actions_action_created_at_desc', 'moderation_actions', ['action', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_moderation_actions_admin_created_at_desc', 'moderation_actions', ['admin_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_moderation_actions_target', 'moderation_actions', ['target_type', 'target_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    # The table stays: earlier revisions' code expects it even though none creates it
+    op.drop_index('ix_moderation_actions_target', table_name='moderation_actions')
+    op.drop_index('ix_moderation_actions_admin_created_at_desc', table_name='moderation_actions')
+    op.drop_index('ix_moderation_actions_action_created_at_desc', table_name='moderation_actions')
+    op.drop_index('ix_moderation_actions_created_at_id_desc', table_name='moderation_actions')
+    op.create_index('ix_moderation_actions_target', 'moderation_actions', ['target_type', 'target_id'], unique=False)
+    op.create_index('ix_moderation_actions_action_created_at_desc', 'moderation_actions', ['action', sa.text('created_at DESC')], unique=False)
@@ -1,68 +1,213 @@
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Literal
 import uuid
-from fastapi import APIRouter, Depends, Query, HTTPException, Body
+from datetime import date, datetime, timezone
+from fastapi import APIRouter, Depends, Query, HTTPException, Body, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.deps import get_current_admin
-from app.models.user import User
-from app.services.admin_metrics_service import AdminMetricsService
-from app.services.moderation_service import ModerationService
+from app.core.deps import Principal, get_current_admin
+from app.core.metrics import metrics
+from app.services.admin_metrics_service import AdminMetricsService, SERIES_METRICS, cached_metric, get_dashboard
+from app.services.moderation_service import ModerationService, get_target_history, list_actions
+from app.services.active_user_service import get_active_users
+from app.services.retention_service import MAX_WEEKS, cached_retention
+from app.services.duplicate_service import cached_clusters
+from app.services import screening_service
+from app.schemas.moderation import ModerationActionPage, ModerationTargetHistory
+from app.schemas.screening import ScreeningRule, ScreeningRuleCreate
+from app.services.export_service import stream_export
 
 router = APIRouter()
 
 # --- Metrics Endpoints ---
+# Served from materialized views through a per-worker result cache unless live=true;
+# X-Metrics-Refreshed-At tells how fresh the numbers are.
+
+async def _metric(response: Response, db: AsyncSession, live: bool, method: str, days: int, **filters) -> Any:
+    if live:
+        service = AdminMetricsService(db, live=True)
+        data = await getattr(service, method)(days, **filters)
+        refreshed_at = await service.freshness()
+    else:
+        data, refreshed_at = await cached_metric(method, days, **filters)
+    response.headers["X-Metrics-Refreshed-At"] = refreshed_at.isoformat()
+    return data
 
 @router.get("/metrics/users-by-region")
 async def get_users_by_region(
+    response: Response,
     days: int = 30,
     region: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> List[Any]:
-    service = AdminMetricsService(db)
-    return await service.get_users_by_region(days, region)
+    return await _metric(response, db, live, "get_users_by_region", days, region=region)
 
 @router.get("/metrics/listings-by-region")
 async def get_listings_by_region(
+    response: Response,
     days: int = 30,
     region: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> List[Any]:
-    service = AdminMetricsService(db)
-    return await service.get_listings_by_region(days, region)
+    return await _metric(response, db, live, "get_listings_by_region", days, region=region)
 
 @router.get("/metrics/listings-by-category")
 async def get_listings_by_category(
+    response: Response,
     days: int = 30,
     region: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> List[Any]:
-    service = AdminMetricsService(db)
-    return await service.get_listings_by_category(days, region)
+    return await _metric(response, db, live, "get_listings_by_category", days, region=region)
 
 @router.get("/metrics/activity")
 async def get_activity(
+    response: Response,
     days: int = 30,
     region: Optional[str] = None,
     city: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> List[Any]:
-    service = AdminMetricsService(db)
-    return await service.get_activity(days, region, city)
+    return await _metric(response, db, live, "get_activity", days, region=region, city=city)
 
 @router.get("/metrics/supply-demand")
 async def get_supply_demand(
+    response: Response,
     days: int = 30,
     region: Optional[str] = None,
     category: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> List[Any]:
-    service = AdminMetricsService(db)
-    return await service.get_supply_demand(days, region, category)
+    return await _metric(response, db, live, "get_supply_demand", days, region=region, category=category)
+
+@router.get("/metrics/series/{metric}")
+async def get_metric_series(
+    response: Response,
+    metric: Literal["events", "users", "listings"],
+    days: int = Query(30, ge=1, le=365),
+    interval: Literal["day", "hour"] = "day",
+    group_by: Optional[Literal["region", "city"]] = None,
+    window: int = Query(7, ge=1, le=90),
+    region: Optional[str] = None,
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    event_type: Optional[str] = None,
+    live: bool = False,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    # Daily or hourly buckets, one series per group_by value plus the total;
+    # window is the moving-average width in buckets
+    if interval == "hour" and days > settings.METRICS_SERIES_MAX_HOURLY_DAYS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Hourly series cover at most {settings.METRICS_SERIES_MAX_HOURLY_DAYS} days",
+        )
+    method, accepted = SERIES_METRICS[metric]
+    filters = {"region": region, "city": city, "category": category, "event_type": event_type}
+    return await _metric(
+        response, db, live, method, days,
+        interval=interval, group_by=group_by, window=window,
+        **{key: filters[key] for key in accepted},
+    )
+
+@router.get("/metrics/dashboard")
+async def get_metrics_dashboard(
+    days: int = 30,
+    region: Optional[str] = None,
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    live: bool = False,
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await get_dashboard(days, live, region=region, city=city, category=category)
+
+# Distinct active users from the per-day HyperLogLog sketches; approximate
+# (see relative_error) and independent of event volume
+
+@router.get("/metrics/dau")
+async def get_daily_active_users(
+    day: Optional[date] = None,
+    region: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await get_active_users(db, 1, day, region)
+
+@router.get("/metrics/wau")
+async def get_weekly_active_users(
+    day: Optional[date] = None,
+    region: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await get_active_users(db, 7, day, region)
+
+@router.get("/metrics/mau")
+async def get_monthly_active_users(
+    day: Optional[date] = None,
+    region: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await get_active_users(db, 30, day, region)
+
+@router.get("/metrics/retention")
+async def get_retention(
+    weeks: int = Query(12, ge=1, le=MAX_WEEKS),
+    region: Optional[str] = None,
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    # Weekly signup cohorts; computed in batch and cached (generated_at tells when)
+    return await cached_retention(weeks, region)
+
+# --- Export Endpoints ---
+
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: Literal["events", "listings", "moderation_actions"],
+    start: datetime,
+    end: Optional[datetime] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    compress: bool = True,
+    admin: Principal = Depends(get_current_admin)
+) -> StreamingResponse:
+    # Rows created in [start, end); naive timestamps are taken as UTC
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    end = end or datetime.now(timezone.utc)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    filename = f"{dataset}_{start:%Y%m%dT%H%M}_{end:%Y%m%dT%H%M}.{format}"
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_export(dataset, start, end, format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# --- System Endpoints ---
+
+@router.get("/system/metrics")
+async def get_system_metrics(
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return metrics.snapshot()
 
 # --- Moderation Endpoints ---
 
@@ -71,7 +216,7 @@ async def hide_listing(
     listing_id: uuid.UUID = Body(..., embed=True),
     reason: str = Body("", embed=True),
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> Any:
     service = ModerationService(db, admin)
     success = await service.hide_listing(listing_id, reason)
@@ -84,7 +229,7 @@ async def ban_user(
     user_id: uuid.UUID = Body(..., embed=True),
     reason: str = Body("", embed=True),
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> Any:
     service = ModerationService(db, admin)
     success = await service.ban_user(user_id, reason)
@@ -97,10 +242,108 @@ async def unban_user(
     user_id: uuid.UUID = Body(..., embed=True),
     reason: str = Body("", embed=True),
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ) -> Any:
     service = ModerationService(db, admin)
     success = await service.unban_user(user_id, reason)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"ok": True}
+
+# Bulk variants: one transaction and a few set-based statements per request
+
+@router.post("/moderation/bulk/hide-listings")
+async def bulk_hide_listings(
+    listing_ids: Optional[List[uuid.UUID]] = Body(None, embed=True),
+    seller_id: Optional[uuid.UUID] = Body(None, embed=True),
+    status: Optional[str] = Body(None, embed=True),
+    category: Optional[str] = Body(None, embed=True),
+    reason: str = Body("", embed=True),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    service = ModerationService(db, admin)
+    return await service.hide_listings(listing_ids, seller_id, status, category, reason)
+
+@router.post("/moderation/bulk/ban-users")
+async def bulk_ban_users(
+    user_ids: List[uuid.UUID] = Body(..., embed=True),
+    reason: str = Body("", embed=True),
+    hide_listings: bool = Body(False, embed=True),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    service = ModerationService(db, admin)
+    return await service.ban_users(user_ids, reason, hide_listings)
+
+@router.post("/moderation/bulk/unban-users")
+async def bulk_unban_users(
+    user_ids: List[uuid.UUID] = Body(..., embed=True),
+    reason: str = Body("", embed=True),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    service = ModerationService(db, admin)
+    return await service.unban_users(user_ids, reason)
+
+# Audit log, newest first; follow next_cursor for older pages
+
+@router.get("/moderation/actions", response_model=ModerationActionPage)
+async def list_moderation_actions(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[Literal["listing", "user"]] = None,
+    target_id: Optional[uuid.UUID] = None,
+    admin_id: Optional[uuid.UUID] = None,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await list_actions(db, limit, cursor, action, target_type, target_id, admin_id)
+
+@router.get("/moderation/targets/{target_type}/{target_id}", response_model=ModerationTargetHistory)
+async def get_moderation_target_history(
+    target_type: Literal["listing", "user"],
+    target_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await get_target_history(db, target_type, target_id, limit, cursor)
+
+@router.get("/moderation/duplicates")
+async def get_duplicate_clusters(
+    limit: int = Query(50, ge=1, le=500),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    # Review queue of near-duplicate live listings, largest groups first; cached (generated_at tells when)
+    result = await cached_clusters()
+    return {**result, "clusters": result["clusters"][:limit]}
+
+# --- Content Screening Rules ---
+# Changes reach every worker's screener through pg_notify; no restart needed
+
+@router.get("/screening/rules", response_model=List[ScreeningRule])
+async def list_screening_rules(
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return await screening_service.list_rules(db)
+
+@router.post("/screening/rules")
+async def add_screening_rules(
+    rules: List[ScreeningRuleCreate] = Body(..., embed=True),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    return {"added": await screening_service.add_rules(db, rules)}
+
+@router.delete("/screening/rules/{rule_id}")
+async def delete_screening_rule(
+    rule_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+) -> Any:
+    await screening_service.delete_rule(db, rule_id)
+    return {"ok": True}
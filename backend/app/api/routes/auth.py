@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, status, Body
+from fastapi import APIRouter, Depends, status, Body, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
+from app.core.rate_limit import limit_login, limit_signup
 from app.schemas.auth import Signup, Login, Token
 from app.schemas.user import User
 from app.services import auth_service
@@ -8,11 +9,14 @@ from app.services import auth_service
 router = APIRouter()
 
 @router.post("/signup", response_model=Token) # Returns dict with token and user, specific schema implies custom response structure combined
-async def signup(signup_data: Signup, db: AsyncSession = Depends(get_db)):
+async def signup(signup_data: Signup, request: Request, db: AsyncSession = Depends(get_db)):
+    await limit_signup(request)
     return await auth_service.signup(db, signup_data)
 
 @router.post("/login", response_model=Token)
-async def login(login_data: Login, db: AsyncSession = Depends(get_db)):
+async def login(login_data: Login, request: Request, db: AsyncSession = Depends(get_db)):
+    # Rejected before any argon2 work is queued
+    await limit_login(request, login_data.email)
     return await auth_service.login(db, login_data)
 
 @router.post("/refresh", response_model=Token)
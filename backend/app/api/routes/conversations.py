@@ -1,17 +1,22 @@
 from typing import Any, List
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
 import uuid
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, WebSocket, WebSocketDisconnect, status
+from jose import jwt
 from sqlalchemy import select, func, or_, and_, desc, update
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.deps import get_current_user
-from app.models.user import User as UserModel
+from app.core.chat_broker import RECHECK, chat_broker
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.deps import Principal, authenticate_token, get_current_principal
+from app.core.pg_listener import pg_listener
 from app.models.conversation import Conversation
 from app.models.message import Message
 from app.models.listing import Listing
+from app.models.user import User
 from app.schemas.conversation import ConversationCreate, ConversationSummary
 from app.schemas.message import MessageCreate, Message as MessageSchema
 
@@ -34,7 +39,7 @@ def _prepare_conversation_response(conversation: Conversation, current_user_id:
 async def create_conversation(
     conversation_in: ConversationCreate,
     session: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ) -> Any:
     """
     Create a new conversation or return existing one.
@@ -90,7 +95,7 @@ async def create_conversation(
 @router.get("/", response_model=List[ConversationSummary])
 async def list_conversations(
     session: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = 0,
     limit: int = 50,
 ) -> Any:
@@ -150,7 +155,7 @@ async def list_conversations(
 async def get_messages(
     conversation_id: uuid.UUID,
     session: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     limit: int = 50,
     after: datetime | None = None,
 ) -> Any:
@@ -178,7 +183,7 @@ async def send_message(
     conversation_id: uuid.UUID,
     message_in: MessageCreate,
     session: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ) -> Any:
     """
     Send a message.
@@ -200,16 +205,23 @@ async def send_message(
     # Update conversation timestamp
     conversation.last_message_at = func.now()
     session.add(conversation)
-    
-    await session.commit()
+    await session.flush()
     await session.refresh(message)
-    return message
+
+    # Pushed to both participants' open connections (the sender's other tabs too) on commit
+    data = MessageSchema.model_validate(message)
+    await chat_broker.publish(
+        session, [conversation.buyer_id, conversation.seller_id],
+        {"type": "message", **data.model_dump(mode="json")},
+    )
+    await session.commit()
+    return data
 
 @router.post("/{conversation_id}/read")
 async def mark_read(
     conversation_id: uuid.UUID,
     session: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ) -> Any:
     """
     Mark all messages in conversation as read.
@@ -225,8 +237,90 @@ async def mark_read(
         Message.conversation_id == conversation_id,
         Message.sender_id != current_user.id,
         Message.read_at == None
-    ).values(read_at=func.now())
+    ).values(read_at=func.now()).returning(Message.read_at)
     
-    await session.execute(stmt)
+    read_at = (await session.execute(stmt)).scalars().first()
+    if read_at is not None:
+        await chat_broker.publish(session, [conversation.buyer_id, conversation.seller_id], {
+            "type": "read",
+            "conversation_id": str(conversation_id),
+            "reader_id": str(current_user.id),
+            "read_at": read_at.isoformat(),
+        })
     await session.commit()
     return {"status": "success"}
+
+@router.websocket("/ws")
+async def conversation_events(websocket: WebSocket):
+    """
+    Push channel for all of the caller's conversations, replacing polling of
+    GET /{id}/messages?after=. Sends {"type": "message", ...} for new messages and
+    {"type": "read", ...} for read receipts as JSON.
+
+    Browsers cannot set headers on WebSockets and query strings end up in access
+    logs, so the first frame must be {"type": "auth", "token": "<access token>"},
+    sent within CHAT_WS_AUTH_TIMEOUT_SECONDS. The socket is closed with 1008 on a
+    bad token or once the user is banned, 4001 when the token expires, and 1013
+    when the client falls too far behind or events may have been lost between
+    workers. After any reconnect (with backoff), fetch once with after= to catch up.
+    """
+    await websocket.accept()
+    try:
+        frame = await asyncio.wait_for(websocket.receive_json(), timeout=settings.CHAT_WS_AUTH_TIMEOUT_SECONDS)
+        token = frame.get("token") if isinstance(frame, dict) and frame.get("type") == "auth" else None
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError):
+        token = None
+    try:
+        if not isinstance(token, str):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        # Short-lived session: the connection must not hold a database connection open
+        async with SessionLocal() as db:
+            principal = await authenticate_token(db, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if chat_broker.fanout == "postgres" and not pg_listener.connected:
+        # Events from other workers would not arrive
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    subscription = chat_broker.subscribe(principal.id)
+    if subscription is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Too many connections")
+        return
+
+    async def push():
+        while True:
+            event = await subscription.queue.get()
+            if event is None:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            if event is RECHECK:
+                async with SessionLocal() as db:
+                    user = await db.get(User, principal.id)
+                if user is None or user.is_banned:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User is banned")
+                    return
+                continue
+            await websocket.send_json(event)
+
+    async def receive():
+        # Clients send nothing but keepalives; this returns when they disconnect
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    expires_in = jwt.get_unverified_claims(token).get("exp", 0) - datetime.now(timezone.utc).timestamp()
+    tasks: List[asyncio.Task] = []
+    try:
+        tasks = [asyncio.create_task(push()), asyncio.create_task(receive())]
+        done, _ = await asyncio.wait(tasks, timeout=max(expires_in, 0), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            await websocket.close(code=4001, reason="Token expired")
+        for task in done:
+            # A send to a client that just went away fails; that is a normal end
+            task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        chat_broker.unsubscribe(subscription)
@@ -1,19 +1,40 @@
-from fastapi import APIRouter, Depends, BackgroundTasks # BackgroundTasks good for events
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.services import event_service
-from app.schemas.event import Event, EventCreate
-from app.core.deps import get_optional_current_user
-from app.models.user import User as UserModel
+from app.schemas.event import Event, EventCreate, BulkEventResult
+from app.core.deps import Principal, get_optional_current_principal
 
 router = APIRouter()
 
-@router.post("/", response_model=Event)
+def _viewer_key(request: Request, current_user: Principal | None) -> str | None:
+    # Dedup identity: the user, else the client's session id. Anonymous requests without
+    # one are never deduplicated: an address can be shared by many viewers.
+    if current_user:
+        return f"user:{current_user.id}"
+    session_id = request.headers.get("X-Session-Id")
+    return f"session:{session_id}" if session_id else None
+
+@router.post("/", response_model=Event, status_code=status.HTTP_202_ACCEPTED)
 async def log_event(
     event_data: EventCreate,
-    current_user: UserModel | None = Depends(get_optional_current_user),
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    current_user: Principal | None = Depends(get_optional_current_principal),
 ):
     # Events can be anonymous
-    user_id = current_user.id if current_user else None
-    return await event_service.log_event(db, event_data, user_id)
+    return await event_service.log_event(event_data, current_user, _viewer_key(request, current_user))
+
+@router.post("/bulk", response_model=BulkEventResult)
+async def log_events_bulk(
+    request: Request,
+    current_user: Principal | None = Depends(get_optional_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Accepts a JSON array of events, or NDJSON (one event per line) when sent with
+    Content-Type application/x-ndjson. Each event may carry its own occurred_at.
+    """
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    return await event_service.log_events_bulk(
+        db, request.stream(), ndjson, current_user, _viewer_key(request, current_user)
+    )
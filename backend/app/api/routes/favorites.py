@@ -5,8 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
 from app.core.database import get_db
-from app.core.deps import get_current_user
-from app.models.user import User as UserModel
+from app.core.deps import Principal, get_current_principal
 from app.models.favorite import Favorite
 from app.schemas.favorite import Favorite as FavoriteSchema
 from app.models.listing import Listing
@@ -16,7 +15,7 @@ router = APIRouter()
 @router.post("/{listing_id}", response_model=FavoriteSchema, status_code=status.HTTP_201_CREATED)
 async def create_favorite(
     listing_id: uuid.UUID,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     # Check if listing exists
@@ -38,7 +37,7 @@ async def create_favorite(
 @router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_favorite(
     listing_id: uuid.UUID,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     query = select(Favorite).where(Favorite.user_id == current_user.id, Favorite.listing_id == listing_id)
@@ -53,7 +52,7 @@ async def delete_favorite(
 
 @router.get("/", response_model=List[FavoriteSchema])
 async def get_favorites(
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     query = select(Favorite).where(Favorite.user_id == current_user.id).options(selectinload(Favorite.listing).selectinload(Listing.images))
@@ -2,8 +2,7 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.core.deps import get_current_user
-from app.models.user import User as UserModel
+from app.core.deps import Principal, get_current_principal
 from app.schemas.listing import Listing, ListingCreate, ListingUpdate
 from app.services import listing_service
 
@@ -12,7 +11,7 @@ router = APIRouter()
 @router.post("/", response_model=Listing, status_code=status.HTTP_201_CREATED)
 async def create_listing(
     listing_data: ListingCreate,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     return await listing_service.create_listing(db, listing_data, current_user.id)
@@ -21,14 +20,14 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Header
 from app.core import security
 # ... imports ...
-from app.core.deps import get_current_user, get_optional_current_user
+from app.core.deps import Principal, get_current_principal, get_optional_current_principal
 
 # Removed local get_optional_current_user
 
 @router.get("/{id}", response_model=Listing)
 async def get_listing(
     id: uuid.UUID,
-    current_user: Optional[UserModel] = Depends(get_optional_current_user),
+    current_user: Optional[Principal] = Depends(get_optional_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     listing = await listing_service.get_listing(db, id)
@@ -48,7 +47,7 @@ async def get_listing(
 async def update_listing(
     id: uuid.UUID,
     listing_update: ListingUpdate,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     return await listing_service.update_listing(db, id, listing_update, current_user.id)
@@ -56,7 +55,7 @@ async def update_listing(
 @router.post("/{id}/publish", response_model=Listing)
 async def publish_listing(
     id: uuid.UUID,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     return await listing_service.publish_listing(db, id, current_user.id)
@@ -64,7 +63,7 @@ async def publish_listing(
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_listing(
     id: uuid.UUID,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     await listing_service.delete_listing(db, id, current_user.id)
@@ -76,7 +75,7 @@ from app.services import media_service
 async def add_image(
     id: uuid.UUID,
     image_data: ListingImageCreate,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     return await media_service.add_image_to_listing(db, id, image_data, current_user.id)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.deps import get_current_user
+from app.core.principal_cache import principal_cache
 from app.models.user import User as UserModel
 from app.schemas.user import User, UserUpdate
 
@@ -26,6 +27,7 @@ async def update_user_me(
     # Ignore display_name for now as it's not in the model per previous thought
     
     db.add(current_user)
+    await principal_cache.publish_invalidation(db, current_user.id)
     await db.commit()
     await db.refresh(current_user)
     return current_user
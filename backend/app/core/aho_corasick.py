@@ -0,0 +1,55 @@
+from collections import deque
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+class AhoCorasick:
+    """
+    Automaton over a fixed set of literal patterns. One pass over a text finds every
+    occurrence of every pattern, in time linear in the text length plus the number
+    of matches, however many patterns there are. Immutable once built.
+    """
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] += (index,)
+
+        # Breadth-first, so each state's failure link (longest proper suffix that is
+        # also a trie path) is known before its children's
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (end offset, pattern index) for every occurrence, overlapping ones included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for position, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                yield position + 1, index
@@ -0,0 +1,68 @@
+import hashlib
+import math
+import time
+from typing import List
+
+class BloomFilter:
+    """Fixed-size set membership with false positives at about `error_rate` once `capacity` keys are added."""
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: bytes) -> List[int]:
+        # Double hashing over one 128-bit digest instead of k independent hashes
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def contains(self, positions: List[int]) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions: List[int]):
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+class RotatingBloomFilter:
+    """
+    Time-windowed "seen recently" set in constant memory: two Bloom filter
+    generations, rotated every `window` seconds (or early once the current one
+    reaches capacity). A key added at time t is reported as seen for at least
+    `window` seconds and at most twice that.
+    """
+    def __init__(self, window: float, capacity: int, error_rate: float):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clear()
+
+    def clear(self):
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._previous = BloomFilter(self.capacity, self.error_rate)
+        self._rotated_at = time.monotonic()
+
+    def _maybe_rotate(self):
+        elapsed = time.monotonic() - self._rotated_at
+        if elapsed >= 2 * self.window:
+            self.clear()
+        elif elapsed >= self.window or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+
+    def seen(self, key: str) -> bool:
+        """Return True if `key` was added within the window; otherwise add it and return False."""
+        self._maybe_rotate()
+        positions = self._current.positions(key.encode())
+        if self._current.contains(positions) or self._previous.contains(positions):
+            return True
+        self._current.add(positions)
+        return False
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._current.bits) + len(self._previous.bits)
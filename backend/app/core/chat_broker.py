@@ -0,0 +1,153 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.pg_listener import notify, pg_listener
+from app.core.principal_cache import INVALIDATE_CHANNEL
+
+CHAT_CHANNEL = "chat_events"
+# pg_notify rejects payloads of 8000 bytes or more; a 2000-character message body can
+# exceed that in multi-byte text, so oversized events go out without the body
+MAX_NOTIFY_BYTES = 7900
+
+Event = Dict[str, Any]
+# Queued to tell a connection to re-check its user (ban) before sending anything else
+RECHECK: Event = {"type": "recheck"}
+
+class Subscription:
+    """One WebSocket connection's queue of events. Never blocks the publisher."""
+    def __init__(self, user_id: uuid.UUID, max_queue: int):
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue()
+        self.closed = False
+
+    def put(self, event: Event):
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            # A client this far behind is better resynced over HTTP than fed a backlog
+            metrics.inc("chat.overflowed")
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    def recheck(self):
+        if not self.closed:
+            self.queue.put_nowait(RECHECK)
+
+    def close(self):
+        """Ask the connection to close (1013) so the client reconnects and catches up over HTTP."""
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait(None)
+
+class ChatBroker:
+    """
+    In-process pub/sub of chat events (new messages, read receipts) to the WebSocket
+    connections of their participants, keyed by user id.
+
+    Publishing follows pg notify semantics: events reach subscribers only once the
+    publishing transaction commits. With fanout "postgres" they travel as
+    notifications, so every worker's broker delivers to its own connections; with
+    "memory" they are delivered in this process only, which suits a single worker.
+    """
+    def __init__(self, fanout: str, max_queue: int, max_connections_per_user: int):
+        self.fanout = fanout
+        self.max_queue = max_queue
+        self.max_connections_per_user = max_connections_per_user
+        self._subscriptions: Dict[uuid.UUID, Set[Subscription]] = {}
+        self.connections = 0
+
+    def subscribe(self, user_id: uuid.UUID) -> Optional[Subscription]:
+        """A new subscription, or None if the user already has the most connections allowed."""
+        subscriptions = self._subscriptions.setdefault(user_id, set())
+        if len(subscriptions) >= self.max_connections_per_user:
+            return None
+        subscription = Subscription(user_id, self.max_queue)
+        subscriptions.add(subscription)
+        self.connections += 1
+        metrics.set_gauge("chat.connections", self.connections)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.discard(subscription)
+            self.connections -= 1
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+            metrics.set_gauge("chat.connections", self.connections)
+
+    def deliver(self, user_ids: Iterable[uuid.UUID], event: Event):
+        for user_id in user_ids:
+            for subscription in self._subscriptions.get(user_id, ()):
+                subscription.put(event)
+                metrics.inc("chat.delivered")
+
+    def on_notify(self, payload: str):
+        data = json.loads(payload)
+        self.deliver([uuid.UUID(user_id) for user_id in data["to"]], data["event"])
+
+    def on_invalidate(self, payload: str):
+        # A user changed (e.g. was banned): their connections re-check before the next send
+        try:
+            users = [uuid.UUID(payload)]
+        except ValueError:
+            users = list(self._subscriptions)
+        for user_id in users:
+            for subscription in self._subscriptions.get(user_id, ()):
+                subscription.recheck()
+
+    def on_listener_disconnect(self):
+        # Notifications sent while the listener is down are lost for good; closing makes
+        # clients reconnect (once it is back) and catch up over HTTP instead
+        if self.fanout == "postgres":
+            for subscriptions in self._subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.close()
+
+    async def publish(self, db: AsyncSession, user_ids: Iterable[uuid.UUID], event: Event):
+        """Send a JSON-ready event to every connection of user_ids when db's transaction commits."""
+        user_ids = list(user_ids)
+        if self.fanout == "postgres":
+            to = [str(user_id) for user_id in user_ids]
+            payload = json.dumps({"to": to, "event": event})
+            if len(payload.encode()) > MAX_NOTIFY_BYTES:
+                # Clients fetch the message itself over HTTP
+                payload = json.dumps({"to": to, "event": {**event, "body": None, "truncated": True}})
+            await notify(db, CHAT_CHANNEL, payload)
+            return
+
+        pending: Optional[List[Tuple[List[uuid.UUID], Event]]] = db.info.get("chat_pending")
+        if pending is None:
+            pending = db.info["chat_pending"] = []
+            sa_event.listen(db.sync_session, "after_commit", self._deliver_pending)
+            sa_event.listen(db.sync_session, "after_rollback", self._discard_pending)
+        pending.append((user_ids, event))
+
+    def _deliver_pending(self, session):
+        pending = session.info.get("chat_pending", [])
+        for user_ids, event in pending:
+            self.deliver(user_ids, event)
+        pending.clear()
+
+    def _discard_pending(self, session):
+        session.info.get("chat_pending", []).clear()
+
+    def clear(self):
+        self._subscriptions.clear()
+        self.connections = 0
+
+chat_broker = ChatBroker(
+    fanout=settings.CHAT_FANOUT,
+    max_queue=settings.CHAT_WS_QUEUE_MAX,
+    max_connections_per_user=settings.CHAT_WS_MAX_CONNECTIONS_PER_USER,
+)
+pg_listener.subscribe(CHAT_CHANNEL, chat_broker.on_notify)
+pg_listener.subscribe(INVALIDATE_CHANNEL, chat_broker.on_invalidate)
+pg_listener.on_disconnect(chat_broker.on_listener_disconnect)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -11,6 +11,112 @@ class Settings(BaseSettings):
     
     DATABASE_URL: str # set in env or .env
     
+    # Password hashing executor ("thread" or "process")
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    # Argon2 cost, written by `python -m app.scripts.calibrate_argon2 --write-env .env`
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None # KiB
+    ARGON2_PARALLELISM: Optional[int] = None
+
+    # Principal cache for auth dependencies (0 disables)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
+    # Access tokens carrying role/region/ban_epoch claims, checked against the revocation list
+    ACCESS_TOKEN_CLAIMS_ENABLED: bool = False
+    REVOCATION_REFRESH_SECONDS: int = 5
+
+    # Refresh-token maintenance (MAX_SESSIONS_PER_USER=0 disables the cap)
+    MAX_SESSIONS_PER_USER: int = 10
+    REFRESH_TOKEN_REAP_INTERVAL_SECONDS: int = 300
+    REFRESH_TOKEN_REAP_BATCH_SIZE: int = 500
+    REFRESH_TOKEN_REAP_MAX_BATCHES: int = 20
+
+    # Login/signup rate limiting (backend "memory" per worker, or "postgres" shared)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_EVICT_INTERVAL_SECONDS: int = 60
+    LOGIN_IP_BURST: int = 30
+    LOGIN_IP_PER_MINUTE: float = 30
+    LOGIN_EMAIL_BURST: int = 10
+    LOGIN_EMAIL_PER_MINUTE: float = 5
+    SIGNUP_IP_BURST: int = 10
+    SIGNUP_IP_PER_MINUTE: float = 5
+    # Reverse proxies in front of the app that append to X-Forwarded-For (the Heroku
+    # router is one; the Procfile sets 1). The client IP is the entry that many hops
+    # from the right; anything further left is client-supplied. 0 uses the peer address.
+    TRUSTED_PROXY_HOPS: int = 0
+
+    # Event ingestion buffer and batch flusher
+    EVENT_BUFFER_MAX: int = 10000
+    EVENT_BATCH_SIZE: int = 500
+    EVENT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENT_ENQUEUE_TIMEOUT_MS: int = 50
+    # Consecutive failed flushes of a batch (connection errors etc.) before it is dropped
+    EVENT_FLUSH_MAX_RETRIES: int = 5
+    EVENT_BULK_MAX_EVENTS: int = 5000
+    EVENT_BULK_MAX_ITEM_BYTES: int = 16384
+    EVENT_CLIENT_TS_MAX_AGE_HOURS: int = 72
+    # Repeat events of these types from the same viewer and listing within the window are dropped
+    EVENT_DEDUP_TYPES: List[str] = ["view_listing"]
+    EVENT_DEDUP_WINDOW_SECONDS: int = 1800
+    EVENT_DEDUP_CAPACITY: int = 500000
+    EVENT_DEDUP_ERROR_RATE: float = 0.001
+
+    # Events table partitioning ("month" or "day") and retention (0 keeps everything)
+    EVENT_PARTITION_GRANULARITY: str = "month"
+    EVENT_PARTITIONS_AHEAD: int = 3
+    EVENT_RETENTION_DAYS: int = 0
+    EVENT_PARTITION_MAINTENANCE_SECONDS: int = 3600
+
+    # Admin metrics materialized views (refreshed concurrently in the background)
+    METRIC_VIEWS_REFRESH_SECONDS: int = 300
+    METRICS_CACHE_TTL_SECONDS: float = 30
+    METRICS_CACHE_STALE_SECONDS: float = 300
+    METRICS_CACHE_MAX_ENTRIES: int = 512
+    METRICS_QUERY_TIMEOUT_MS: int = 5000
+    # Time series bounds: hourly buckets cover at most this many days, and group_by
+    # keeps the largest groups, summing the rest into an "Other" series
+    METRICS_SERIES_MAX_HOURLY_DAYS: int = 31
+    METRICS_SERIES_MAX_GROUPS: int = 25
+
+    # Bulk moderation: most ids accepted per request (filters are not capped)
+    MODERATION_BULK_MAX_TARGETS: int = 10000
+
+    # Listing content screening on publish/update (rules in screening_rules, hot-reloaded)
+    SCREENING_ENABLED: bool = True
+    SCREENING_WORKERS: int = 2
+    SCREENING_QUEUE_MAX: int = 1000
+    SCREENING_RULES_REFRESH_SECONDS: int = 300
+
+    # Near-duplicate listing detection (MinHash LSH over live listings, in memory per worker)
+    DUPLICATES_ENABLED: bool = True
+    DUPLICATES_THRESHOLD: float = 0.8
+    DUPLICATES_NUM_PERM: int = 128
+    DUPLICATES_BANDS: int = 16
+    DUPLICATES_REBUILD_SECONDS: int = 3600
+    DUPLICATES_CLUSTERS_CACHE_TTL_SECONDS: float = 600
+
+    # Real-time chat over WebSockets. CHAT_FANOUT "postgres" carries events between
+    # workers with LISTEN/NOTIFY; "memory" keeps them in-process (single worker only)
+    CHAT_FANOUT: str = "postgres"
+    CHAT_WS_QUEUE_MAX: int = 256
+    CHAT_WS_MAX_CONNECTIONS_PER_USER: int = 5
+    # Time a new connection has to send its auth frame
+    CHAT_WS_AUTH_TIMEOUT_SECONDS: float = 10.0
+
+    # Admin data export
+    EXPORT_CHUNK_ROWS: int = 5000
+    EXPORT_GZIP_LEVEL: int = 6
+
+    # Signup-cohort retention (batch computed, cached per worker)
+    RETENTION_CHUNK_ROWS: int = 50000
+    RETENTION_CACHE_TTL_SECONDS: float = 3600
+    RETENTION_CACHE_STALE_SECONDS: float = 86400
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
 
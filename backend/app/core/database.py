@@ -1,9 +1,16 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import metrics
 
 engine = create_async_engine(settings.DATABASE_URL, echo=False, future=True)
 
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # Per-worker statement counter; diff snapshots over time to get DB QPS
+    metrics.inc("db.statements")
+
 SessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
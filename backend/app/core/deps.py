@@ -8,6 +8,10 @@ from sqlalchemy import select
 from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.metrics import metrics
+from app.core.principal import Principal
+from app.core.principal_cache import principal_cache
+from app.core.revocation import revocation_list
 from app.models.user import User
 import uuid
 
@@ -15,6 +19,17 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
+async def _load_user(db: AsyncSession, user_id: uuid.UUID) -> User | None:
+    user = await principal_cache.get(db, user_id)
+    if user is not None:
+        return user
+    generation = principal_cache.generation()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
+    if user is not None:
+        principal_cache.put(user, generation)
+    return user
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(reusable_oauth2)
@@ -31,11 +46,12 @@ async def get_current_user(
     if user_id is None:
         raise HTTPException(status_code=404, detail="User not found")
         
-    result = await db.execute(select(User).where(User.id == uuid.UUID(str(user_id))))
-    user = result.scalars().first()
+    user = await _load_user(db, uuid.UUID(str(user_id)))
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user.is_banned:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is banned")
     return user
 
 async def get_optional_current_user(
@@ -55,18 +71,87 @@ async def get_optional_current_user(
     except (JWTError, ValidationError, ValueError):
         return None
         
-    result = await db.execute(select(User).where(User.id == uuid.UUID(str(user_id))))
-    return result.scalars().first()
+    user = await _load_user(db, uuid.UUID(str(user_id)))
+    # Banned callers are treated as anonymous, as get_optional_current_principal does
+    return user if user is not None and not user.is_banned else None
 
-async def get_current_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
-    if current_user.role != "admin":
+async def _resolve_principal(db: AsyncSession, payload: dict) -> Principal | None:
+    user_id = uuid.UUID(str(payload["sub"]))
+    # Claim tokens skip the database while the revocation list vouches for them
+    if "ban_epoch" in payload:
+        verdict = revocation_list.check(user_id, payload["ban_epoch"])
+        if verdict == revocation_list.BANNED:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is banned")
+        if verdict == revocation_list.OK:
+            metrics.inc("auth.principal.from_claims")
+            return Principal(
+                id=user_id,
+                role=payload.get("role", "user"),
+                region=payload.get("region"),
+                city=payload.get("city"),
+                is_banned=False,
+            )
+    metrics.inc("auth.principal.from_db")
+    user = await _load_user(db, user_id)
+    if user is None:
+        return None
+    if user.is_banned:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is banned")
+    return Principal.from_user(user)
+
+async def get_current_principal(
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(reusable_oauth2)
+) -> Principal:
+    return await authenticate_token(db, token)
+
+async def authenticate_token(db: AsyncSession, token: str) -> Principal:
+    """Principal for a bearer token; also used where no Authorization header is available (WebSockets)."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except (JWTError, ValidationError):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
         )
-    if current_user.is_banned:
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    principal = await _resolve_principal(db, payload)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+async def get_optional_current_principal(
+    db: AsyncSession = Depends(get_db),
+    authorization: str | None = Header(default=None)
+) -> Principal | None:
+    if not authorization:
+        return None
+    try:
+        scheme, token = authorization.split()
+        if scheme.lower() != 'bearer':
+            return None
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if payload.get("sub") is None:
+            return None
+    except (JWTError, ValidationError, ValueError):
+        return None
+
+    try:
+        return await _resolve_principal(db, payload)
+    except HTTPException:
+        return None
+
+async def get_current_admin(
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(reusable_oauth2)
+) -> Principal:
+    # Always from the users row (through principal_cache), never from token claims:
+    # only ban/unban bump ban_epoch, so a claimed role would outlive a demotion
+    user = await get_current_user(db, token)
+    if user.role != "admin":
         raise HTTPException(
-             status_code=status.HTTP_403_FORBIDDEN, detail="User is banned"
+            status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
         )
-    return current_user
+    return Principal.from_user(user)
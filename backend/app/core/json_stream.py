@@ -0,0 +1,91 @@
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+class StreamFormatError(ValueError):
+    pass
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Yield non-empty lines of a newline-delimited body as they arrive."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (newline := buffer.find(b"\n", start)) >= 0:
+            line = buffer[start:newline]
+            start = newline + 1
+            # Checked per line too: a whole line can arrive in a single chunk
+            if len(line) > max_line_bytes:
+                raise StreamFormatError(f"Line exceeds {max_line_bytes} bytes")
+            if line.strip():
+                yield line
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            raise StreamFormatError(f"Line exceeds {max_line_bytes} bytes")
+    if len(buffer) > max_line_bytes:
+        raise StreamFormatError(f"Line exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield buffer
+
+async def iter_json_array(chunks: AsyncIterator[bytes], max_item_bytes: int) -> AsyncIterator[Any]:
+    """
+    Yield the objects of a top-level JSON array one at a time, keeping only the
+    unparsed tail in memory. Items must be JSON objects.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    state = "open"  # open -> first -> separator <-> item -> closed
+
+    async def _chunks():
+        async for chunk in chunks:
+            yield utf8.decode(chunk)
+        yield utf8.decode(b"", final=True)
+
+    async for text in _chunks():
+        buffer += text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if state == "open":
+                if char != "[":
+                    raise StreamFormatError("Expected a JSON array")
+                pos += 1
+                state = "first"
+            elif state in ("first", "item"):
+                if state == "first" and char == "]":
+                    pos += 1
+                    state = "closed"
+                    continue
+                if char != "{":
+                    raise StreamFormatError("Array items must be JSON objects")
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if len(buffer) - pos > max_item_bytes:
+                        raise StreamFormatError(f"Item exceeds {max_item_bytes} bytes")
+                    break  # incomplete object, wait for more data
+                # Complete objects are checked as well, whatever the chunking
+                if end - pos > max_item_bytes:
+                    raise StreamFormatError(f"Item exceeds {max_item_bytes} bytes")
+                pos = end
+                state = "separator"
+                yield item
+            elif state == "separator":
+                if char == ",":
+                    state = "item"
+                elif char == "]":
+                    state = "closed"
+                else:
+                    raise StreamFormatError("Expected ',' or ']'")
+                pos += 1
+            else:
+                raise StreamFormatError("Unexpected data after end of array")
+        buffer = buffer[pos:]
+
+    if state != "closed":
+        raise StreamFormatError("Truncated JSON array")
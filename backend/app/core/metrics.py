@@ -0,0 +1,54 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store (counters, gauges and timing summaries).
+    Values are per worker process; they are exposed via GET /admin/system/metrics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def inc(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0}
+                self._summaries[name] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["last"] = value
+            if value > summary["max"]:
+                summary["max"] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summaries = {
+                name: {**s, "avg": s["sum"] / s["count"] if s["count"] else 0.0}
+                for name, s in self._summaries.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+metrics = MetricsRegistry()
@@ -0,0 +1,140 @@
+import re
+import zlib
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def shingles(text: str, k: int = 5) -> Set[str]:
+    """Character k-grams of the text with case, punctuation and spacing normalized away."""
+    normalized = _NON_WORD.sub(" ", text.casefold()).strip()
+    if len(normalized) <= k:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+class MinHasher:
+    """
+    MinHash signatures of num_perm uint32 values. The fraction of positions where
+    two signatures agree estimates the Jaccard similarity of their shingle sets.
+    Signatures are only comparable between hashers with the same num_perm and seed.
+    """
+    # Shingles hashed per block: bounds the (block x num_perm) uint64 scratch matrix to 256 KiB
+    BLOCK = 256
+
+    def __init__(self, num_perm: int = 128, seed: int = 1, k: int = 5, max_chars: int = 20000):
+        self.num_perm = num_perm
+        self.k = k
+        # Only the start of a long text is hashed; near-duplicates already agree there
+        self.max_chars = max_chars
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing of 32-bit shingle hashes: ((a * x + b) mod 2**64) >> 32, a odd
+        self._a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature of the text, or None when it has nothing to shingle."""
+        grams = shingles(text[:self.max_chars], self.k)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+        # Running min over fixed-size blocks, in place, and shifted after the min (the
+        # shift is monotonic): this is the hot path
+        minimum = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(hashes), self.BLOCK):
+            values = np.multiply.outer(hashes[start:start + self.BLOCK], self._a)
+            values += self._b
+            np.minimum(minimum, values.min(axis=0), out=minimum)
+        return (minimum >> np.uint64(32)).astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class MinHashLSH:
+    """
+    Banded index over MinHash signatures: signatures agreeing on all rows of any
+    band share a bucket, so a lookup costs `bands` dict probes however many keys
+    are indexed. Pairs of similarity s collide with probability
+    1 - (1 - s**rows)**bands; candidates are then checked against their signatures.
+    """
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        # Band hashes rather than band bytes as keys; collisions only add candidates
+        self._buckets: List[Dict[int, Set[Hashable]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.signatures
+
+    def _band_hashes(self, signature: np.ndarray) -> Iterator[Tuple[int, int]]:
+        for band in range(self.bands):
+            yield band, hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def insert(self, key: Hashable, signature: np.ndarray):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band, band_hash in self._band_hashes(signature):
+            self._buckets[band].setdefault(band_hash, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_hash in self._band_hashes(signature):
+            bucket = self._buckets[band][band_hash]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band][band_hash]
+
+    def query(self, signature: np.ndarray, threshold: float) -> List[Tuple[Hashable, float]]:
+        """Indexed keys whose estimated similarity to the signature is at least threshold, most similar first."""
+        candidates: Set[Hashable] = set()
+        for band, band_hash in self._band_hashes(signature):
+            candidates.update(self._buckets[band].get(band_hash, ()))
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((match for match in matches if match[1] >= threshold), key=lambda m: m[1], reverse=True)
+
+    def clusters(self, threshold: float) -> List[List[Hashable]]:
+        """
+        Groups of indexed keys connected by pairs at or above threshold (at least two
+        keys each). Only pairs sharing a bucket are compared, and within a bucket each
+        key is checked against one member per group already found there, so a bucket
+        of exact reposts costs a linear number of comparisons.
+        """
+        parent: Dict[Hashable, Hashable] = {}
+
+        def find(key: Hashable) -> Hashable:
+            root = key
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while key != root:
+                parent[key], key = root, parent.get(key, key)
+            return root
+
+        for buckets in self._buckets:
+            for bucket in buckets.values():
+                if len(bucket) < 2:
+                    continue
+                representatives: List[Hashable] = []
+                for key in bucket:
+                    root = find(key)
+                    if any(find(rep) == root for rep in representatives):
+                        continue
+                    for rep in representatives:
+                        if similarity(self.signatures[key], self.signatures[rep]) >= threshold:
+                            parent[root] = find(rep)
+                            break
+                    else:
+                        representatives.append(key)
+
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for key in set(parent) | set(parent.values()):
+            groups.setdefault(find(key), []).append(key)
+        return [members for members in groups.values() if len(members) > 1]
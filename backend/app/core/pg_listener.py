@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _asyncpg_dsn(url: str) -> str:
+    # SQLAlchemy URL (postgresql+asyncpg://...) -> plain libpq DSN for asyncpg.connect
+    return url.replace("+asyncpg", "", 1)
+
+class PgNotificationListener:
+    """
+    Holds one dedicated asyncpg connection that LISTENs on registered channels and
+    dispatches payloads to in-process callbacks. Used for cross-worker invalidation
+    and fan-out; callbacks must be cheap and non-blocking.
+    """
+    def __init__(self, dsn: str, reconnect_delay: float = 2.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._callbacks: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._disconnect_hooks: List[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+        self._conn: asyncpg.Connection | None = None
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        self._callbacks[channel].append(callback)
+
+    def on_disconnect(self, hook: Callable[[], None]):
+        self._disconnect_hooks.append(hook)
+
+    def _dispatch(self, connection, pid, channel: str, payload: str):
+        for callback in self._callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception("Notification callback failed for channel %s", channel)
+
+    def _mark_disconnected(self):
+        if self.connected:
+            self.connected = False
+            for hook in self._disconnect_hooks:
+                hook()
+
+    async def _run(self):
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(self.dsn)
+                self._conn.add_termination_listener(lambda conn: lost.set())
+                for channel in self._callbacks:
+                    await self._conn.add_listener(channel, self._dispatch)
+                self.connected = True
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("LISTEN connection failed, retrying in %ss", self.reconnect_delay)
+            finally:
+                self._mark_disconnected()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+async def notify(db: AsyncSession, channel: str, payload: str):
+    # Delivered by Postgres only when the surrounding transaction commits
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+async def notify_many(db: AsyncSession, channel: str, payloads: List[str]):
+    # One round trip for any number of notifications; same commit-time delivery as notify
+    await db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": channel, "payloads": payloads},
+    )
+
+pg_listener = PgNotificationListener(_asyncpg_dsn(settings.DATABASE_URL))
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+import uuid
+from app.models.user import User
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller as needed for authorization; built from token claims or the users row."""
+    id: uuid.UUID
+    role: str
+    region: str | None
+    city: str | None
+    is_banned: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, role=user.role, region=user.region, city=user.city, is_banned=user.is_banned)
@@ -0,0 +1,97 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.pg_listener import notify, notify_many, pg_listener
+from app.models.user import User
+
+INVALIDATE_CHANNEL = "principal_invalidate"
+
+class PrincipalCache:
+    """
+    Short-TTL, size-bounded LRU of user rows keyed by user id, used by the auth
+    dependencies to skip the per-request users lookup.
+
+    Entries are column snapshots, never shared ORM instances. Invalidations are
+    broadcast with pg_notify so every worker drops the entry once the writing
+    transaction commits; while the LISTEN connection is down the cache is bypassed.
+    """
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[uuid.UUID, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0 and pg_listener.connected
+
+    def generation(self) -> int:
+        return self._generation
+
+    async def get(self, db: AsyncSession, user_id: uuid.UUID) -> User | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(user_id)
+        if entry is None:
+            metrics.inc("principal_cache.miss")
+            return None
+        expires_at, values = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            metrics.inc("principal_cache.miss")
+            return None
+        self._entries.move_to_end(user_id)
+        metrics.inc("principal_cache.hit")
+        user = User(**values)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    def put(self, user: User, generation: int):
+        # Skip if an invalidation happened while the row was being loaded
+        if not self.enabled or generation != self._generation:
+            return
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, values)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("principal_cache.size", len(self._entries))
+
+    def invalidate(self, user_id: uuid.UUID):
+        self._generation += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def _on_notification(self, payload: str):
+        try:
+            self.invalidate(uuid.UUID(payload))
+        except ValueError:
+            self.clear()
+
+    async def publish_invalidation(self, db: AsyncSession, user_id: uuid.UUID):
+        """Drop the entry locally and queue a cross-worker invalidation on the current transaction."""
+        self.invalidate(user_id)
+        await notify(db, INVALIDATE_CHANNEL, str(user_id))
+
+    async def publish_invalidations(self, db: AsyncSession, user_ids: List[uuid.UUID]):
+        """publish_invalidation for many users in one statement."""
+        for user_id in user_ids:
+            self.invalidate(user_id)
+        if user_ids:
+            await notify_many(db, INVALIDATE_CHANNEL, [str(user_id) for user_id in user_ids])
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
+pg_listener.subscribe(INVALIDATE_CHANNEL, principal_cache._on_notification)
+pg_listener.on_disconnect(principal_cache.clear)
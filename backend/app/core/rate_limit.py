@@ -0,0 +1,154 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.tasks import register_periodic_task
+
+@dataclass(frozen=True)
+class BucketRule:
+    name: str
+    burst: int
+    per_minute: float
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+    @property
+    def idle_seconds(self) -> float:
+        # Time after which an untouched bucket is full again and can be forgotten
+        return self.burst / self.rate if self.rate > 0 else 3600.0
+
+class MemoryBucketStore:
+    """
+    Token buckets in an insertion-ordered dict of key -> (tokens, last_refill), kept in
+    LRU order so the least recently used key is dropped when max_keys is reached.
+    Per worker process.
+    """
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rule: BucketRule) -> float:
+        """Consume one token; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        entry = self._buckets.pop(key, None)
+        if entry is None:
+            if len(self._buckets) >= self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+            tokens = float(rule.burst)
+        else:
+            tokens = min(float(rule.burst), entry[0] + (now - entry[1]) * rule.rate)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            return (1.0 - tokens) / rule.rate if rule.rate > 0 else 60.0
+        self._buckets[key] = (tokens - 1.0, now)
+        return 0.0
+
+    def evict(self, max_idle: float):
+        cutoff = time.monotonic() - max_idle
+        stale = [key for key, (_, last) in self._buckets.items() if last < cutoff]
+        for key in stale:
+            del self._buckets[key]
+        metrics.set_gauge("rate_limit.keys", len(self._buckets))
+
+    def reset(self):
+        self._buckets.clear()
+
+class PostgresBucketStore:
+    """Buckets in the UNLOGGED rate_limit_buckets table, shared by all workers; one upsert per check."""
+    async def take(self, key: str, rule: BucketRule) -> float:
+        async with SessionLocal() as db:
+            result = await db.execute(text("""
+                INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+                VALUES (:key, :burst - 1, NOW())
+                ON CONFLICT (key) DO UPDATE SET
+                    tokens = LEAST(:burst, rate_limit_buckets.tokens
+                        + EXTRACT(EPOCH FROM NOW() - rate_limit_buckets.updated_at) * :rate) - 1,
+                    updated_at = NOW()
+                WHERE LEAST(:burst, rate_limit_buckets.tokens
+                        + EXTRACT(EPOCH FROM NOW() - rate_limit_buckets.updated_at) * :rate) >= 1
+                RETURNING tokens
+            """), {"key": key, "burst": rule.burst, "rate": rule.rate})
+            allowed = result.first() is not None
+            await db.commit()
+        if allowed:
+            return 0.0
+        return 1.0 / rule.rate if rule.rate > 0 else 60.0
+
+    async def evict(self, max_idle: float):
+        async with SessionLocal() as db:
+            await db.execute(
+                text("DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - make_interval(secs => :idle)"),
+                {"idle": max_idle},
+            )
+            await db.commit()
+
+    def reset(self):
+        pass
+
+class RateLimiter:
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.memory = MemoryBucketStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+        self.postgres = PostgresBucketStore()
+        self.rules: List[BucketRule] = []
+
+    @property
+    def store(self):
+        return self.postgres if self.backend == "postgres" else self.memory
+
+    def rule(self, name: str, burst: int, per_minute: float) -> BucketRule:
+        rule = BucketRule(name, burst, per_minute)
+        self.rules.append(rule)
+        return rule
+
+    async def hit(self, rule: BucketRule, key: str):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        retry_after = await self.store.take(f"{rule.name}:{key}", rule)
+        if retry_after > 0:
+            metrics.inc(f"rate_limit.rejected.{rule.name}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+    async def evict(self):
+        max_idle = max((r.idle_seconds for r in self.rules), default=3600.0)
+        if self.backend == "postgres":
+            await self.postgres.evict(max_idle)
+        else:
+            self.memory.evict(max_idle)
+
+    def reset(self):
+        self.memory.reset()
+
+rate_limiter = RateLimiter(backend=settings.RATE_LIMIT_BACKEND)
+
+LOGIN_PER_IP = rate_limiter.rule("login_ip", settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_MINUTE)
+LOGIN_PER_EMAIL = rate_limiter.rule("login_email", settings.LOGIN_EMAIL_BURST, settings.LOGIN_EMAIL_PER_MINUTE)
+SIGNUP_PER_IP = rate_limiter.rule("signup_ip", settings.SIGNUP_IP_BURST, settings.SIGNUP_IP_PER_MINUTE)
+
+def client_ip(request: Request) -> str:
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+        if forwarded:
+            # Only the entries our own proxies appended can be trusted
+            return forwarded[-min(hops, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+async def limit_login(request: Request, email: str):
+    await rate_limiter.hit(LOGIN_PER_IP, client_ip(request))
+    await rate_limiter.hit(LOGIN_PER_EMAIL, email.lower())
+
+async def limit_signup(request: Request):
+    await rate_limiter.hit(SIGNUP_PER_IP, client_ip(request))
+
+register_periodic_task("rate_limit_eviction", settings.RATE_LIMIT_EVICT_INTERVAL_SECONDS, rate_limiter.evict)
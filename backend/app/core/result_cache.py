@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Size-bounded LRU of computed results with stale-while-revalidate.
+
+    Fresh entries (younger than ttl) are returned as is. Stale ones (up to
+    ttl + stale_ttl) are returned immediately while a single background task
+    recomputes them. Misses are single-flight: concurrent callers for the same
+    key await one computation instead of each running it. Per worker process.
+    """
+    def __init__(self, name: str, ttl_seconds: float, stale_seconds: float, max_entries: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Bumped by clear(): computations started before it must not store their result
+        self._generation = 0
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.inc(f"{self.name}.evicted")
+
+    def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            generation = self._generation
+
+            async def _run():
+                try:
+                    value = await compute()
+                    if generation == self._generation:
+                        self._store(key, value)
+                    return value
+                finally:
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+            task = asyncio.create_task(_run())
+            self._inflight[key] = task
+        return task
+
+    def _revalidate(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        if key in self._inflight:
+            return
+        metrics.inc(f"{self.name}.revalidate")
+        task = self._compute(key, compute)
+
+        def _log_failure(done: asyncio.Task):
+            if not done.cancelled() and done.exception() is not None:
+                metrics.inc(f"{self.name}.revalidate_failures")
+                logger.warning("Background refresh of %s failed; serving stale", key, exc_info=done.exception())
+        task.add_done_callback(_log_failure)
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                metrics.inc(f"{self.name}.hit")
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                metrics.inc(f"{self.name}.stale_hit")
+                self._revalidate(key, compute)
+                return entry[1]
+            del self._entries[key]
+        metrics.inc(f"{self.name}.miss")
+        # shield: one caller giving up must not cancel the computation for the others
+        return await asyncio.shield(self._compute(key, compute))
+
+    def clear(self):
+        """
+        Drop every entry. Computations still running finish for the callers already
+        waiting on them, but their results are not stored, and later callers start
+        a fresh one.
+        """
+        self._generation += 1
+        self._entries.clear()
+        self._inflight.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.pg_listener import pg_listener
+from app.core.principal_cache import INVALIDATE_CHANNEL
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+class RevocationList:
+    """
+    In-memory map of user_id -> (ban_epoch, is_banned) for every user whose ban_epoch
+    was ever bumped. Claim tokens are trusted only while this list is fresh and the
+    token's ban_epoch matches; otherwise the caller falls back to a database lookup.
+    Reloaded every REVOCATION_REFRESH_SECONDS, and immediately on principal_invalidate.
+    """
+    OK = "ok"
+    BANNED = "banned"
+    UNKNOWN = "unknown"
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.loaded_at: float | None = None
+        self._entries: Dict[uuid.UUID, Tuple[int, bool]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < 3 * self.refresh_seconds
+
+    def check(self, user_id: uuid.UUID, ban_epoch: int) -> str:
+        if not self.fresh:
+            return self.UNKNOWN
+        current_epoch, is_banned = self._entries.get(user_id, (0, False))
+        if is_banned:
+            return self.BANNED
+        if current_epoch != ban_epoch:
+            return self.UNKNOWN
+        return self.OK
+
+    async def refresh(self):
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.ban_epoch, User.is_banned).where(User.ban_epoch > 0)
+            )
+            self._entries = {row.id: (row.ban_epoch, row.is_banned) for row in result}
+        self.loaded_at = time.monotonic()
+        metrics.set_gauge("revocation_list.size", len(self._entries))
+
+    def _on_notification(self, payload: str):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Revocation list refresh failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.loaded_at = None
+
+revocation_list = RevocationList(refresh_seconds=settings.REVOCATION_REFRESH_SECONDS)
+pg_listener.subscribe(INVALIDATE_CHANNEL, revocation_list._on_notification)
@@ -1,18 +1,36 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
-from jose import jwt
+from typing import Any, Callable, Union
+from fastapi import HTTPException, status
+from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import metrics
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+def _argon2_options() -> dict:
+    # Calibrated per host by app/scripts/calibrate_argon2.py; unset keeps passlib defaults
+    options = {}
+    if settings.ARGON2_TIME_COST:
+        options["argon2__time_cost"] = settings.ARGON2_TIME_COST
+    if settings.ARGON2_MEMORY_COST:
+        options["argon2__memory_cost"] = settings.ARGON2_MEMORY_COST
+    if settings.ARGON2_PARALLELISM:
+        options["argon2__parallelism"] = settings.ARGON2_PARALLELISM
+    return options
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **_argon2_options())
+
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, claims: dict | None = None) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
+
     to_encode = {"exp": expire, "sub": str(subject)}
+    if claims:
+        to_encode.update(claims)
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -21,3 +39,64 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+class PasswordHashExecutor:
+    """
+    Runs argon2 hashing/verification on a bounded pool so the event loop keeps serving
+    other requests during login bursts. Once `workers + max_queue` calls are in flight,
+    new calls are rejected with 503 instead of queueing without limit.
+    """
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self._executor: Executor | None = None
+        self._in_flight = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+        return self._executor
+
+    def _update_gauges(self):
+        metrics.set_gauge("password_hash.in_flight", self._in_flight)
+        metrics.set_gauge("password_hash.queue_depth", max(0, self._in_flight - self.workers))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.capacity:
+            metrics.inc("password_hash.rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+            self._update_gauges()
+            metrics.observe("password_hash.seconds", time.perf_counter() - start)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_executor = PasswordHashExecutor(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """Runs an async job every `interval` seconds in the background; failures are logged, not raised."""
+    def __init__(self, name: str, interval: float, job: Callable[[], Awaitable[object]]):
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self):
+        start = time.perf_counter()
+        try:
+            await self.job()
+        except Exception:
+            metrics.inc(f"tasks.{self.name}.failures")
+            logger.exception("Periodic task %s failed", self.name)
+        finally:
+            metrics.observe(f"tasks.{self.name}.seconds", time.perf_counter() - start)
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+periodic_tasks: List[PeriodicTask] = []
+
+def register_periodic_task(name: str, interval: float, job: Callable[[], Awaitable[object]]) -> PeriodicTask:
+    task = PeriodicTask(name, interval, job)
+    periodic_tasks.append(task)
+    return task
@@ -0,0 +1,56 @@
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+def dense_matrix(keys: Sequence[str], offsets: np.ndarray, values: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scatter sparse (key, bucket offset, value) rows into a dense keys x buckets
+    matrix, so buckets with no rows become 0. Returns (sorted keys, matrix).
+    """
+    labels, key_index = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+    matrix = np.zeros((len(labels), n_buckets), dtype=np.int64)
+    np.add.at(matrix, (key_index, offsets), values)
+    return labels, matrix
+
+def fold_keys(keys: Sequence[str], weights: np.ndarray, limit: int, other: str) -> np.ndarray:
+    """
+    The keys with every key outside the `limit` heaviest (by summed weight) replaced
+    by `other`, so a dense matrix built from them has at most limit + 1 rows.
+    """
+    labels, key_index = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+    if len(labels) <= limit:
+        return labels[key_index]
+    totals = np.bincount(key_index, weights=weights, minlength=len(labels))
+    kept = np.zeros(len(labels), dtype=bool)
+    kept[np.argsort(-totals, kind="stable")[:limit]] = True
+    return np.where(kept[key_index], labels[key_index], other)
+
+def moving_average(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` buckets along the last axis; the first points average what is available."""
+    sums = np.cumsum(matrix, axis=-1, dtype=np.float64)
+    sums[..., window:] = sums[..., window:] - sums[..., :-window]
+    return sums / np.minimum(np.arange(1, matrix.shape[-1] + 1), window)
+
+def lagged_change(matrix: np.ndarray, lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (absolute, relative) change against the value `lag` buckets earlier. NaN where
+    there is no earlier bucket, and for the relative change where it was 0.
+    """
+    delta = np.full(matrix.shape, np.nan)
+    ratio = np.full(matrix.shape, np.nan)
+    if lag < matrix.shape[-1]:
+        previous = matrix[..., :-lag].astype(np.float64)
+        delta[..., lag:] = matrix[..., lag:] - previous
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio[..., lag:] = np.where(previous > 0, delta[..., lag:] / previous, np.nan)
+    return delta, ratio
+
+def to_json(array: np.ndarray, decimals: Optional[int] = None) -> List[Any]:
+    """Nested lists with NaN as None, which JSON cannot represent otherwise."""
+    if decimals is not None:
+        array = np.round(array, decimals)
+    if array.dtype.kind != "f":
+        return array.tolist()
+    out = array.astype(object)
+    out[np.isnan(array)] = None
+    return out.tolist()
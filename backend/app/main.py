@@ -1,11 +1,40 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.security import password_executor
+from app.core.metrics import metrics
+from app.core.pg_listener import pg_listener
+from app.core.revocation import revocation_list
+from app.core.tasks import periodic_tasks
+from app.services.event_service import event_ingestor
+from app.services.screening_service import content_screener
+from app.services import event_partition_service  # noqa: F401  registers partition maintenance
 from app.api.router import api_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pg_listener.start()
+    if settings.ACCESS_TOKEN_CLAIMS_ENABLED:
+        await revocation_list.start()
+    for task in periodic_tasks:
+        task.start()
+    await event_ingestor.start()
+    await content_screener.start()
+    yield
+    await content_screener.stop()
+    await event_ingestor.stop()
+    for task in periodic_tasks:
+        await task.stop()
+    await revocation_list.stop()
+    await pg_listener.stop()
+    password_executor.shutdown()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 from fastapi.staticfiles import StaticFiles
@@ -23,6 +52,14 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    metrics.inc("http.requests")
+    metrics.observe("http.request.seconds", time.perf_counter() - start)
+    return response
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
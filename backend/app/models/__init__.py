@@ -6,3 +6,9 @@ from .favorite import Favorite
 from .event import Event
 from .conversation import Conversation
 from .message import Message
+from .rate_limit import RateLimitBucket
+from .event_rollup import EventRollupHourly
+from .metric_view import MetricViewRefresh
+from .active_user_sketch import ActiveUserSketch
+from .screening_rule import ScreeningRule
+from .moderation import ModerationAction
@@ -0,0 +1,18 @@
+from datetime import date
+from sqlalchemy import BigInteger, Date, Index, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class ActiveUserSketch(Base):
+    """HyperLogLog sketch of the distinct users active per UTC day and region, merged on ingest (active_user_service)."""
+    __tablename__ = "active_user_sketches"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    region: Mapped[str | None] = mapped_column(String, nullable=True)
+    # zlib-compressed registers, see HyperLogLog.to_bytes
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ux_active_user_sketches_day_region", "day", "region", unique=True, postgresql_nulls_not_distinct=True),
+    )
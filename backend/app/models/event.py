@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Any
-from sqlalchemy import String, DateTime, ForeignKey, func, Index, text
+from sqlalchemy import String, DateTime, ForeignKey, func, Index, text, DDL, event as sa_event
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.core.database import Base
@@ -15,9 +15,20 @@ class Event(Base):
     listing_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("listings.id", ondelete="SET NULL"), nullable=True, index=True)
     region: Mapped[str | None] = mapped_column(String, nullable=True)
     city: Mapped[str | None] = mapped_column(String, nullable=True)
+    category: Mapped[str | None] = mapped_column(String, nullable=True) # listing category at ingest time
     metadata_: Mapped[dict[str, Any]] = mapped_column("metadata", JSONB, nullable=False, default={})
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Partition key, so it is part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
 
     __table_args__ = (
         Index("ix_events_type_created_at_desc", "event_type", text("created_at DESC")),
+        # Range-partitioned by time; partitions are managed by services/event_partition_service.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
+
+# Catch-all for rows outside any period partition (e.g. before the first one exists)
+sa_event.listen(
+    Event.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT"),
+)
@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import BigInteger, String, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+class EventRollupHourly(Base):
+    """Event counts per hour and dimension set, maintained by the ingestion path (event_service)."""
+    __tablename__ = "event_rollups_hourly"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    event_type: Mapped[str] = mapped_column(String, nullable=False)
+    region: Mapped[str | None] = mapped_column(String, nullable=True)
+    city: Mapped[str | None] = mapped_column(String, nullable=True)
+    category: Mapped[str | None] = mapped_column(String, nullable=True)
+    listing_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # Duplicates dropped at ingest (see EVENT_DEDUP_*); not part of count
+    suppressed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Upsert target; NULL dimensions (no region, no listing) must still collide
+        Index(
+            "ux_event_rollups_hourly_key",
+            "hour", "event_type", "region", "city", "category", "listing_id",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import String, DateTime, DDL, event
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class MetricViewRefresh(Base):
+    """Last successful refresh of each admin metrics materialized view, shared by all workers."""
+    __tablename__ = "metric_view_refreshes"
+
+    view_name: Mapped[str] = mapped_column(String, primary_key=True)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+# Daily-grain aggregates behind AdminMetricsService; the `days` window and filters are
+# applied when querying, so one view serves every parameter combination.
+# Each needs a unique index over plain columns for REFRESH ... CONCURRENTLY.
+MATERIALIZED_VIEWS = {
+    "mv_user_signups_daily": (
+        """
+        SELECT (created_at AT TIME ZONE 'UTC')::date AS day, region, city, COUNT(*) AS users
+        FROM users
+        GROUP BY 1, 2, 3
+        """,
+        ["day", "region", "city"],
+    ),
+    "mv_listing_stats_daily": (
+        """
+        SELECT (l.created_at AT TIME ZONE 'UTC')::date AS day, u.region, u.city, l.category, l.status,
+               COUNT(*) AS listings
+        FROM listings l
+        JOIN users u ON l.seller_id = u.id
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+        ["day", "region", "city", "category", "status"],
+    ),
+    "mv_event_activity_daily": (
+        """
+        SELECT (hour AT TIME ZONE 'UTC')::date AS day, event_type, region, city, category,
+               SUM(count)::bigint AS events, SUM(suppressed)::bigint AS suppressed
+        FROM event_rollups_hourly
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+        ["day", "event_type", "region", "city", "category"],
+    ),
+}
+
+# Keep create_all/drop_all (tests, scripts) working with views that depend on the tables
+for _name, (_query, _key) in MATERIALIZED_VIEWS.items():
+    event.listen(Base.metadata, "after_create", DDL(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {_name} AS {_query}"))
+    event.listen(Base.metadata, "after_create", DDL(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{_name} ON {_name} ({', '.join(_key)}) NULLS NOT DISTINCT"
+    ))
+    event.listen(Base.metadata, "before_drop", DDL(f"DROP MATERIALIZED VIEW IF EXISTS {_name}"))
@@ -10,13 +10,17 @@ class ModerationAction(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     admin_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    action: Mapped[str] = mapped_column(String, nullable=False) # hide_listing, ban_user, unban_user
+    action: Mapped[str] = mapped_column(String, nullable=False) # hide_listing, ban_user, unban_user, flag_listing
     target_type: Mapped[str] = mapped_column(String, nullable=False) # listing, user
     target_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     reason: Mapped[str] = mapped_column(String, nullable=False, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    # Every audit log read is newest first with id as tie-breaker, so each index ends
+    # in (created_at DESC, id DESC) and serves keyset pages without a sort
     __table_args__ = (
-        Index("ix_moderation_actions_action_created_at_desc", "action", text("created_at DESC")),
-        Index("ix_moderation_actions_target", "target_type", "target_id"),
+        Index("ix_moderation_actions_created_at_id_desc", text("created_at DESC"), text("id DESC")),
+        Index("ix_moderation_actions_action_created_at_desc", "action", text("created_at DESC"), text("id DESC")),
+        Index("ix_moderation_actions_admin_created_at_desc", "admin_id", text("created_at DESC"), text("id DESC")),
+        Index("ix_moderation_actions_target", "target_type", "target_id", text("created_at DESC"), text("id DESC")),
     )
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import String, Float, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    # UNLOGGED: bucket state is disposable, so skip WAL for the hot upsert path
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
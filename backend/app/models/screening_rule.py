@@ -0,0 +1,22 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import String, DateTime, func, CheckConstraint, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+class ScreeningRule(Base):
+    """Blocklist entry checked against listing text on publish/update (screening_service)."""
+    __tablename__ = "screening_rules"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind: Mapped[str] = mapped_column(String, nullable=False) # term (whole words, case-insensitive), regex
+    pattern: Mapped[str] = mapped_column(String, nullable=False)
+    action: Mapped[str] = mapped_column(String, nullable=False) # flag, hide
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("kind IN ('term', 'regex')", name="check_valid_kind"),
+        CheckConstraint("action IN ('flag', 'hide')", name="check_valid_action"),
+        UniqueConstraint("kind", "pattern", name="uq_screening_rules_kind_pattern"),
+    )
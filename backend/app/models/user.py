@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, func, CheckConstraint
+from sqlalchemy import String, DateTime, func, CheckConstraint, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.core.database import Base
@@ -13,12 +13,14 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String, nullable=False)
     role: Mapped[str] = mapped_column(String, nullable=False, default="user") # 'user', 'admin'
     is_banned: Mapped[bool] = mapped_column(default=False, nullable=False)
+    ban_epoch: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False) # bumped on ban/unban, revokes claim tokens
     city: Mapped[str | None] = mapped_column(String, nullable=True)
     region: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     __table_args__ = (
         CheckConstraint("role IN ('user', 'admin')", name="check_valid_role"),
+        Index("ix_users_revoked", "id", "ban_epoch", "is_banned", postgresql_where=text("ban_epoch > 0")),
     )
 
     # Relationships
@@ -8,6 +8,14 @@ class EventCreate(BaseModel):
     listing_id: Optional[uuid.UUID] = None
     metadata: Dict[str, Any] = {}
 
+class BulkEventCreate(EventCreate):
+    occurred_at: Optional[datetime] = None # client-side timestamp, kept as created_at
+
+class BulkEventResult(BaseModel):
+    accepted: int
+    dropped: int
+    suppressed: int = 0 # repeat views within the dedup window
+
 class Event(EventCreate):
     id: uuid.UUID
     user_id: Optional[uuid.UUID] = None
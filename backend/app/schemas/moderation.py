@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel
+import uuid
+
+class ModerationAction(BaseModel):
+    id: uuid.UUID
+    admin_id: Optional[uuid.UUID] = None
+    admin_email: Optional[str] = None
+    action: str
+    target_type: str
+    target_id: uuid.UUID
+    reason: str
+    created_at: datetime
+
+class ModerationActionPage(BaseModel):
+    items: List[ModerationAction]
+    # Pass back as ?cursor= for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+class ModerationTargetHistory(ModerationActionPage):
+    target_type: Literal["listing", "user"]
+    target_id: uuid.UUID
+    # Current listing or user summary; None if it no longer exists
+    target: Optional[Dict[str, Any]] = None
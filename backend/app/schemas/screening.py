@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field
+import uuid
+
+class ScreeningRuleBase(BaseModel):
+    kind: Literal["term", "regex"] = "term"
+    pattern: str = Field(..., min_length=1, max_length=500)
+    action: Literal["flag", "hide"] = "flag"
+
+class ScreeningRuleCreate(ScreeningRuleBase):
+    pass
+
+class ScreeningRule(ScreeningRuleBase):
+    id: uuid.UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
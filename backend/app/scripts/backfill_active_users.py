@@ -0,0 +1,62 @@
+"""
+Build the active_user_sketches rows (DAU/WAU/MAU) for events recorded before the
+sketches existed, one UTC day at a time.
+
+Usage:
+    python -m app.scripts.backfill_active_users --since 2026-01-01
+
+Each day is read in chunks (a range scan that touches one events partition) and
+merged into the stored sketches in its own transaction, so memory stays bounded by
+the chunk size and the script can be stopped and resumed with --since. Merging is
+idempotent: re-running over days already covered, or over days that ingest has
+been merging into since the migration, changes nothing.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import text
+from app.core.database import SessionLocal
+from app.services.active_user_service import merge_active_user_sketches
+
+CHUNK_ROWS = 50000
+
+DAY_USERS_SQL = text("""
+    SELECT DISTINCT region, user_id
+    FROM events
+    WHERE created_at >= :start AND created_at < :end AND user_id IS NOT NULL
+""")
+
+async def backfill_day(day: date) -> int:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    updated = 0
+    async with SessionLocal() as db:
+        result = await db.stream(DAY_USERS_SQL, {"start": start, "end": start + timedelta(days=1)})
+        async for rows in result.partitions(CHUNK_ROWS):
+            updated += await merge_active_user_sketches(db, [
+                {"user_id": user_id, "region": region, "created_at": start} for region, user_id in rows
+            ])
+        await db.commit()
+    return updated
+
+async def main_async(since: date | None, until: date | None):
+    async with SessionLocal() as db:
+        first, last = (await db.execute(text("SELECT MIN(created_at), MAX(created_at) FROM events"))).one()
+    if first is None:
+        print("No events")
+        return
+    day = max(since or date.min, first.astimezone(timezone.utc).date())
+    end = min(until or date.max, last.astimezone(timezone.utc).date())
+    while day <= end:
+        updated = await backfill_day(day)
+        print(f"{day}: {updated} sketches updated")
+        day += timedelta(days=1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="first UTC day (default: oldest event)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last UTC day (default: newest event)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.since, args.until))
+
+if __name__ == "__main__":
+    main()
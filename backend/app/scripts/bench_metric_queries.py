@@ -0,0 +1,89 @@
+"""
+Compare admin metric queries with values formatted into the SQL text against the
+bound-parameter statements AdminMetricsService uses, on a single connection.
+
+Usage:
+    python -m app.scripts.bench_metric_queries --iterations 300
+
+Formatted SQL is new statement text for every days/region value, so each call
+pays an extra prepare round trip plus parse and analysis in Postgres, and the
+texts churn asyncpg's per-connection statement cache. The bound statement is
+prepared once per connection and reused. Postgres may still plan each execution
+for its actual values (custom plans) when the optional-filter predicates make a
+generic plan look costlier; the generic/custom columns show which it chose.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+from app.services.admin_metrics_service import AdminMetricsService
+
+REGIONS = [None, "North", "South", "East", "West", "Central", "Coast"]
+
+PREPARED_STATS = text("""
+    SELECT COUNT(*), COALESCE(SUM(generic_plans), 0), COALESCE(SUM(custom_plans), 0)
+    FROM pg_prepared_statements
+""")
+
+def formatted_activity(days: int, region: str | None):
+    # The query shape before parameterization: values spliced into the SQL text
+    region_clause = f"AND region = '{region}'" if region else ""
+    return text(f"""
+        SELECT event_type, SUM(count)::bigint as count, SUM(suppressed)::bigint as suppressed
+        FROM event_rollups_hourly
+        WHERE hour >= date_trunc('hour', NOW() - interval '{days} days', 'UTC')
+        {region_clause}
+        GROUP BY event_type
+        ORDER BY count DESC
+    """)
+
+async def run(mode: str, iterations: int) -> dict:
+    # Fresh connection per mode so its prepared statements are counted in isolation
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    timings = []
+    async with AsyncSession(engine) as db:
+        service = AdminMetricsService(db, live=True)
+        for i in range(iterations):
+            # Every (days, region) pair is distinct, as across real dashboard traffic
+            days, region = i // len(REGIONS) + 1, REGIONS[i % len(REGIONS)]
+            start = time.perf_counter()
+            if mode == "formatted":
+                (await db.execute(formatted_activity(days, region))).all()
+            else:
+                await service.get_activity(days, region)
+            timings.append((time.perf_counter() - start) * 1000)
+        statements, generic, custom = (await db.execute(PREPARED_STATS)).one()
+    await engine.dispose()
+    # Skip the first calls, which pay connection warm-up in both modes
+    steady = timings[min(10, len(timings) // 2):]
+    return {
+        "mode": mode,
+        "median_ms": statistics.median(steady),
+        "p95_ms": statistics.quantiles(steady, n=20)[-1] if len(steady) >= 20 else max(steady),
+        "prepared": statements,
+        "generic_plans": generic,
+        "custom_plans": custom,
+    }
+
+async def main_async(iterations: int):
+    print(f"{iterations} get_activity calls per mode, distinct days x {len(REGIONS)} region filters\n")
+    print(f"{'mode':<14}{'median ms':>10}{'p95 ms':>10}{'prepared':>10}{'generic':>10}{'custom':>10}")
+    for mode in ("formatted", "parameterized"):
+        r = await run(mode, iterations)
+        print(f"{r['mode']:<14}{r['median_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+              f"{r['prepared']:>10}{r['generic_plans']:>10}{r['custom_plans']:>10}")
+    print("\nprepared = statements held by the connection (including the stats query);")
+    print("generic/custom = executions run on a cached generic plan vs planned for their values.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.iterations))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark argon2 parameters on this host and pick the strongest set that fits the latency budget.
+
+Usage:
+    python -m app.scripts.calibrate_argon2 --target-ms 250 --write-env .env
+
+Existing hashes are upgraded to the new parameters on each user's next successful login.
+"""
+import argparse
+import os
+import statistics
+import time
+from passlib.hash import argon2
+
+MEMORY_COSTS_KIB = [19456, 32768, 47104, 65536, 131072]
+MAX_TIME_COST = 6
+SAMPLE_PASSWORD = "calibration-password-123"
+
+def bench(time_cost: int, memory_cost: int, parallelism: int, rounds: int) -> float:
+    hasher = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def calibrate(target_ms: float, parallelism: int, rounds: int) -> dict | None:
+    best = None
+    for memory_cost in MEMORY_COSTS_KIB:
+        for time_cost in range(2, MAX_TIME_COST + 1):
+            elapsed = bench(time_cost, memory_cost, parallelism, rounds)
+            print(f"m={memory_cost:>6} KiB t={time_cost} p={parallelism}: {elapsed:7.1f} ms")
+            if elapsed > target_ms:
+                break
+            if best is None or memory_cost * time_cost > best["memory_cost"] * best["time_cost"]:
+                best = {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism, "ms": elapsed}
+        if time_cost == 2 and elapsed > target_ms:
+            # Even the cheapest time cost is over budget; more memory only gets slower
+            break
+    return best
+
+def write_env(path: str, values: dict):
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = [line for line in f.read().splitlines() if line.split("=", 1)[0] not in values]
+    lines += [f"{key}={value}" for key, value in values.items()]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="latency budget for one hash")
+    parser.add_argument("--parallelism", type=int, default=min(os.cpu_count() or 1, 4))
+    parser.add_argument("--rounds", type=int, default=5, help="samples per parameter set (median is used)")
+    parser.add_argument("--write-env", metavar="PATH", help="store the result in this env file")
+    args = parser.parse_args()
+
+    best = calibrate(args.target_ms, args.parallelism, args.rounds)
+    if best is None:
+        print(f"No parameter set fits within {args.target_ms} ms; keeping current settings.")
+        return
+
+    values = {
+        "ARGON2_TIME_COST": best["time_cost"],
+        "ARGON2_MEMORY_COST": best["memory_cost"],
+        "ARGON2_PARALLELISM": best["parallelism"],
+    }
+    print(f"Selected {values} ({best['ms']:.1f} ms per hash)")
+    if args.write_env:
+        write_env(args.write_env, values)
+        print(f"Written to {args.write_env}")
+
+if __name__ == "__main__":
+    main()
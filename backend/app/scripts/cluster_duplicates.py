@@ -0,0 +1,46 @@
+"""
+Cluster the whole live catalog into groups of near-duplicate listings, as the
+/admin/moderation/duplicates queue does, and print them largest first.
+
+Usage:
+    python -m app.scripts.cluster_duplicates --min-size 3 --flag
+
+With --flag, every listing but the oldest in each group is recorded as a
+flag_listing moderation action ("duplicate of <oldest id>"). Flags already
+recorded are not repeated, so the script can run on a schedule.
+"""
+import argparse
+import asyncio
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.duplicate_service import cluster_catalog
+from app.services.moderation_service import ModerationService
+
+async def main_async(min_size: int, flag: bool):
+    result = await cluster_catalog()
+    clusters = [cluster for cluster in result["clusters"] if cluster["size"] >= min_size]
+    print(f"{result['listings']} live listings, {len(clusters)} groups of {min_size}+ "
+          f"at similarity >= {settings.DUPLICATES_THRESHOLD}\n")
+    flagged = 0
+    async with SessionLocal() as db:
+        service = ModerationService(db, None)
+        for cluster in clusters:
+            original, *copies = cluster["listings"]
+            print(f"{cluster['size']} listings from {cluster['sellers']} seller(s)")
+            for listing in cluster["listings"]:
+                print(f"  {listing['id']}  {listing['created_at']:%Y-%m-%d %H:%M}  {listing['title'][:60]}")
+            if flag:
+                for listing in copies:
+                    flagged += await service.flag_listing(listing["id"], f"duplicate of {original['id']}")
+    if flag:
+        print(f"\n{flagged} new flags recorded")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-size", type=int, default=2)
+    parser.add_argument("--flag", action="store_true", help="flag all but the oldest listing of each group")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.min_size, args.flag))
+
+if __name__ == "__main__":
+    main()
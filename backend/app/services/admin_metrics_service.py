@@ -1,38 +1,103 @@
+import asyncio
+import logging
+import time
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from datetime import timedelta
-from typing import List, Dict, Any, Optional
+from sqlalchemy.exc import DBAPIError
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.result_cache import ResultCache
+from app.core.tasks import register_periodic_task
+from app.core import timeseries
+from app.models.metric_view import MATERIALIZED_VIEWS
+
+logger = logging.getLogger(__name__)
+
+def _since_day(days: int) -> date:
+    # Materialized views are daily, so windows start at a UTC day boundary
+    return datetime.now(timezone.utc).date() - timedelta(days=days)
+
+SERIES_INTERVALS = {"day": timedelta(days=1), "hour": timedelta(hours=1)}
+OTHER_SERIES = "Other"
+
+# Every statement below is fixed text with bound parameters: optional filters are
+# written as (:x IS NULL OR col = :x) and windows as make_interval(days => :days),
+# so each metric is one prepared statement and plan per connection whatever the
+# arguments (see app/scripts/bench_metric_queries.py).
 
 class AdminMetricsService:
-    def __init__(self, db: AsyncSession):
+    """
+    Dashboard aggregations. By default they read the daily materialized views
+    (refreshed by refresh_metric_views); live=True queries the base tables instead.
+    """
+    def __init__(self, db: AsyncSession, live: bool = False):
         self.db = db
+        self.live = live
+        self.views_used: set[str] = set()
+
+    async def freshness(self) -> datetime:
+        """Point in time the results reflect: the oldest refresh among the views read, or now if live."""
+        if self.live or not self.views_used:
+            return datetime.now(timezone.utc)
+        refreshed_at = await self.db.scalar(
+            text("SELECT MIN(refreshed_at) FROM metric_view_refreshes WHERE view_name = ANY(:views)"),
+            {"views": sorted(self.views_used)},
+        )
+        return refreshed_at or datetime.now(timezone.utc)
+
+    async def _fetch(self, query: str, params: Dict[str, Any], views: Tuple[str, ...] = ()):
+        self.views_used.update(views)
+        result = await self.db.execute(text(query), params)
+        return [dict(row._mapping) for row in result]
 
     async def get_users_by_region(self, days: int, region: Optional[str] = None):
-        interval_query = f"interval '{days} days'"
-        # Construct WHERE clause for region
-        region_clause = "AND region = :region" if region else ""
-        
-        query = text(f"""
+        if not self.live:
+            return await self._fetch("""
+                SELECT
+                    COALESCE(region, 'Unknown') as region,
+                    COALESCE(city, 'Unknown') as city,
+                    SUM(users)::bigint as user_count,
+                    COALESCE(SUM(users) FILTER (WHERE day >= :since), 0)::bigint as new_users
+                FROM mv_user_signups_daily
+                WHERE (CAST(:region AS text) IS NULL OR region = :region)
+                GROUP BY region, city
+                ORDER BY user_count DESC
+            """, {"since": _since_day(days), "region": region}, views=("mv_user_signups_daily",))
+
+        return await self._fetch("""
             SELECT 
                 COALESCE(region, 'Unknown') as region, 
                 COALESCE(city, 'Unknown') as city, 
                 COUNT(*) as user_count,
-                COUNT(*) FILTER (WHERE created_at >= NOW() - {interval_query}) as new_users
+                COUNT(*) FILTER (WHERE created_at >= NOW() - make_interval(days => :days)) as new_users
             FROM users
-            WHERE 1=1 {region_clause}
+            WHERE (CAST(:region AS text) IS NULL OR region = :region)
             GROUP BY region, city
             ORDER BY user_count DESC
-        """)
-        
-        params = {"region": region} if region else {}
-        result = await self.db.execute(query, params)
-        return [dict(row._mapping) for row in result]
+        """, {"days": days, "region": region})
 
     async def get_listings_by_region(self, days: int, region: Optional[str] = None):
-        interval_query = f"interval '{days} days'"
-        region_clause = "AND u.region = :region" if region else ""
-        
-        query = text(f"""
+        if not self.live:
+            return await self._fetch("""
+                SELECT
+                    COALESCE(region, 'Unknown') as region,
+                    COALESCE(city, 'Unknown') as city,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'live'), 0)::bigint as live_count,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'draft'), 0)::bigint as draft_count,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'sold'), 0)::bigint as sold_count,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'hidden'), 0)::bigint as hidden_count,
+                    COALESCE(SUM(listings) FILTER (WHERE day >= :since), 0)::bigint as new_listings
+                FROM mv_listing_stats_daily
+                WHERE (CAST(:region AS text) IS NULL OR region = :region)
+                GROUP BY region, city
+                ORDER BY live_count DESC
+            """, {"since": _since_day(days), "region": region}, views=("mv_listing_stats_daily",))
+
+        return await self._fetch("""
             SELECT 
                 COALESCE(u.region, 'Unknown') as region,
                 COALESCE(u.city, 'Unknown') as city,
@@ -40,141 +105,419 @@ class AdminMetricsService:
                 COUNT(*) FILTER (WHERE l.status = 'draft') as draft_count,
                 COUNT(*) FILTER (WHERE l.status = 'sold') as sold_count,
                 COUNT(*) FILTER (WHERE l.status = 'hidden') as hidden_count,
-                COUNT(*) FILTER (WHERE l.created_at >= NOW() - {interval_query}) as new_listings
+                COUNT(*) FILTER (WHERE l.created_at >= NOW() - make_interval(days => :days)) as new_listings
             FROM listings l
             JOIN users u ON l.seller_id = u.id
-            WHERE 1=1 {region_clause}
+            WHERE (CAST(:region AS text) IS NULL OR u.region = :region)
             GROUP BY u.region, u.city
             ORDER BY live_count DESC
-        """)
-        
-        params = {"region": region} if region else {}
-        result = await self.db.execute(query, params)
-        return [dict(row._mapping) for row in result]
+        """, {"days": days, "region": region})
 
     async def get_listings_by_category(self, days: int, region: Optional[str] = None):
-        interval_query = f"interval '{days} days'"
-        region_clause = "AND u.region = :region" if region else ""
-        
-        query = text(f"""
+        if not self.live:
+            return await self._fetch("""
+                SELECT
+                    category,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'live'), 0)::bigint as live_count,
+                    COALESCE(SUM(listings) FILTER (WHERE status = 'sold'), 0)::bigint as sold_count,
+                    COALESCE(SUM(listings) FILTER (WHERE day >= :since), 0)::bigint as new_listings
+                FROM mv_listing_stats_daily
+                WHERE (CAST(:region AS text) IS NULL OR region = :region)
+                GROUP BY category
+                ORDER BY live_count DESC
+            """, {"since": _since_day(days), "region": region}, views=("mv_listing_stats_daily",))
+
+        return await self._fetch("""
             SELECT 
                 l.category,
                 COUNT(*) FILTER (WHERE l.status = 'live') as live_count,
                 COUNT(*) FILTER (WHERE l.status = 'sold') as sold_count,
-                COUNT(*) FILTER (WHERE l.created_at >= NOW() - {interval_query}) as new_listings
+                COUNT(*) FILTER (WHERE l.created_at >= NOW() - make_interval(days => :days)) as new_listings
             FROM listings l
             JOIN users u ON l.seller_id = u.id
-            WHERE 1=1 {region_clause}
+            WHERE (CAST(:region AS text) IS NULL OR u.region = :region)
             GROUP BY l.category
             ORDER BY live_count DESC
-        """)
-        
-        params = {"region": region} if region else {}
-        result = await self.db.execute(query, params)
-        return [dict(row._mapping) for row in result]
+        """, {"days": days, "region": region})
 
     async def get_activity(self, days: int, region: Optional[str] = None, city: Optional[str] = None):
-        interval_query = f"interval '{days} days'"
-        where_clauses = []
-        params = {}
-        
-        if region:
-            where_clauses.append("region = :region")
-            params["region"] = region
-        if city:
-            where_clauses.append("city = :city")
-            params["city"] = city
-            
-        where_sql = "AND " + " AND ".join(where_clauses) if where_clauses else ""
-        
-        query = text(f"""
+        params = {"region": region, "city": city}
+        if not self.live:
+            return await self._fetch("""
+                SELECT
+                    event_type,
+                    SUM(events)::bigint as count,
+                    SUM(suppressed)::bigint as suppressed
+                FROM mv_event_activity_daily
+                WHERE day >= :since
+                AND (CAST(:region AS text) IS NULL OR region = :region)
+                AND (CAST(:city AS text) IS NULL OR city = :city)
+                GROUP BY event_type
+                ORDER BY count DESC
+            """, {**params, "since": _since_day(days)}, views=("mv_event_activity_daily",))
+
+        # Served from the hourly rollups rather than raw events
+        return await self._fetch("""
             SELECT 
                 event_type,
-                COUNT(*) as count
-            FROM events
-            WHERE created_at >= NOW() - {interval_query}
-            {where_sql}
+                SUM(count)::bigint as count,
+                SUM(suppressed)::bigint as suppressed
+            FROM event_rollups_hourly
+            WHERE hour >= date_trunc('hour', NOW() - make_interval(days => :days), 'UTC')
+            AND (CAST(:region AS text) IS NULL OR region = :region)
+            AND (CAST(:city AS text) IS NULL OR city = :city)
             GROUP BY event_type
             ORDER BY count DESC
-        """)
-        
-        result = await self.db.execute(query, params)
-        return [dict(row._mapping) for row in result]
+        """, {**params, "days": days})
 
     async def get_supply_demand(self, days: int, region: Optional[str] = None, category: Optional[str] = None):
-        interval_query = f"interval '{days} days'"
-        
         # Supply: New LIVE listings in period
         # Demand: View Listing events in period
-        
-        # We need to compute supply and demand per (region, category)
-        # Note: Event does rely on listing_id to get category if not stored in metadata.
-        # But events table has region/city directly populated (assumed from task desc "events.region").
-        # However, for demand we want to know what category was viewed. 
-        # Ideally events have metadata -> category, OR we join listing.
-        
-        # Let's try joining listing for events to get category.
-        
-        params = {}
-        filters = []
-        if region:
-            filters.append("u.region = :region")
-            params["region"] = region
-            
-        # This is a complex query. Let's simplify: 
-        # Return summary by Category (and Region if provided, or grouped by region)
-        # Task says: Resp [{region, category, supply, demand, ratio}]
-        
-        # Supply CTE
-        supply_query = f"""
-            SELECT 
-                u.region,
-                l.category,
-                COUNT(*) as supply_count
-            FROM listings l
-            JOIN users u ON l.seller_id = u.id
-            WHERE l.created_at >= NOW() - {interval_query}
-            AND l.status = 'live'
-            GROUP BY u.region, l.category
+        # Both per (region, category), filtered inside the CTEs. Events are enriched at
+        # ingest with the viewer's region and the listing's category, so demand needs
+        # no join to listings.
+        params = {"region": region, "category": category}
+        if not self.live:
+            return await self._fetch(_SUPPLY_DEMAND_SQL.format(
+                supply="""
+                    SELECT region, category, SUM(listings) as supply_count
+                    FROM mv_listing_stats_daily
+                    WHERE day >= :since
+                    AND status = 'live'
+                    AND (CAST(:region AS text) IS NULL OR region = :region)
+                    AND (CAST(:category AS text) IS NULL OR category = :category)
+                    GROUP BY region, category
+                """,
+                demand="""
+                    SELECT region, category, SUM(events) as demand_count
+                    FROM mv_event_activity_daily
+                    WHERE event_type = 'view_listing'
+                    AND category IS NOT NULL
+                    AND day >= :since
+                    AND (CAST(:region AS text) IS NULL OR region = :region)
+                    AND (CAST(:category AS text) IS NULL OR category = :category)
+                    GROUP BY region, category
+                """,
+            ), {**params, "since": _since_day(days)}, views=("mv_listing_stats_daily", "mv_event_activity_daily"))
+
+        return await self._fetch(_SUPPLY_DEMAND_SQL.format(
+            supply="""
+                SELECT u.region, l.category, COUNT(*) as supply_count
+                FROM listings l
+                JOIN users u ON l.seller_id = u.id
+                WHERE l.created_at >= NOW() - make_interval(days => :days)
+                AND l.status = 'live'
+                AND (CAST(:region AS text) IS NULL OR u.region = :region)
+                AND (CAST(:category AS text) IS NULL OR l.category = :category)
+                GROUP BY u.region, l.category
+            """,
+            # From the hourly rollups, which carry the listing category
+            demand="""
+                SELECT r.region, r.category, SUM(r.count) as demand_count
+                FROM event_rollups_hourly r
+                WHERE r.event_type = 'view_listing'
+                AND r.category IS NOT NULL
+                AND r.hour >= date_trunc('hour', NOW() - make_interval(days => :days), 'UTC')
+                AND (CAST(:region AS text) IS NULL OR r.region = :region)
+                AND (CAST(:category AS text) IS NULL OR r.category = :category)
+                GROUP BY r.region, r.category
+            """,
+        ), {**params, "days": days})
+
+    async def get_event_series(self, days: int, interval: str = "day", group_by: Optional[str] = None, window: int = 7,
+                               region: Optional[str] = None, city: Optional[str] = None,
+                               category: Optional[str] = None, event_type: Optional[str] = None):
+        filters = """
+            AND (CAST(:region AS text) IS NULL OR region = :region)
+            AND (CAST(:city AS text) IS NULL OR city = :city)
+            AND (CAST(:category AS text) IS NULL OR category = :category)
+            AND (CAST(:event_type AS text) IS NULL OR event_type = :event_type)
         """
-        
-        # Demand CTE (views)
-        demand_query = f"""
-            SELECT 
-                e.region,
-                l.category,
-                COUNT(*) as demand_count
-            FROM events e
-            JOIN listings l ON e.listing_id = l.id
-            WHERE e.event_type = 'view_listing'
-            AND e.created_at >= NOW() - {interval_query}
-            GROUP BY e.region, l.category
+        return await self._series(
+            days, interval, group_by, window,
+            {"region": region, "city": city, "category": category, "event_type": event_type},
+            view=("mv_event_activity_daily", f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM CAST(day AS timestamp))::bigint as bucket,
+                       SUM(events)::bigint as value
+                FROM mv_event_activity_daily
+                WHERE day >= :start_day {filters}
+                GROUP BY 1, 2
+            """),
+            live=f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM date_trunc(CAST(:interval AS text), hour, 'UTC'))::bigint as bucket,
+                       SUM(count)::bigint as value
+                FROM event_rollups_hourly
+                WHERE hour >= :start AND hour < :end {filters}
+                GROUP BY 1, 2
+            """,
+        )
+
+    async def get_user_series(self, days: int, interval: str = "day", group_by: Optional[str] = None, window: int = 7,
+                              region: Optional[str] = None, city: Optional[str] = None):
+        filters = """
+            AND (CAST(:region AS text) IS NULL OR region = :region)
+            AND (CAST(:city AS text) IS NULL OR city = :city)
         """
-        
-        # Combine
-        full_query = text(f"""
-            WITH supply AS ({supply_query}),
-                 demand AS ({demand_query})
-            SELECT 
-                COALESCE(s.region, d.region) as region,
-                COALESCE(s.category, d.category) as category,
-                COALESCE(s.supply_count, 0) as supply_count,
-                COALESCE(d.demand_count, 0) as demand_count,
-                CASE 
-                    WHEN COALESCE(s.supply_count, 0) = 0 THEN 0 
-                    ELSE COALESCE(d.demand_count, 0)::float / s.supply_count 
-                END as demand_per_supply
-            FROM supply s
-            FULL OUTER JOIN demand d ON s.region = d.region AND s.category = d.category
-            WHERE 1=1
-            { 'AND ' + ' AND '.join(filters).replace('u.region', 'COALESCE(s.region, d.region)') if filters else '' }
-            ORDER BY demand_per_supply DESC
-        """)
-
-        # Adjustment: filtering in the final WHERE clause requires careful alias usage.
-        # If region is passed, we filter the result.
-        
-        # Re-map params
-        
-        result = await self.db.execute(full_query, params)
-        return [dict(row._mapping) for row in result]
+        return await self._series(
+            days, interval, group_by, window, {"region": region, "city": city},
+            view=("mv_user_signups_daily", f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM CAST(day AS timestamp))::bigint as bucket,
+                       SUM(users)::bigint as value
+                FROM mv_user_signups_daily
+                WHERE day >= :start_day {filters}
+                GROUP BY 1, 2
+            """),
+            live=f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM date_trunc(CAST(:interval AS text), created_at, 'UTC'))::bigint as bucket,
+                       COUNT(*) as value
+                FROM users
+                WHERE created_at >= :start AND created_at < :end {filters}
+                GROUP BY 1, 2
+            """,
+        )
+
+    async def get_listing_series(self, days: int, interval: str = "day", group_by: Optional[str] = None, window: int = 7,
+                                 region: Optional[str] = None, city: Optional[str] = None, category: Optional[str] = None):
+        filters = """
+            AND (CAST(:region AS text) IS NULL OR region = :region)
+            AND (CAST(:city AS text) IS NULL OR city = :city)
+            AND (CAST(:category AS text) IS NULL OR category = :category)
+        """
+        return await self._series(
+            days, interval, group_by, window, {"region": region, "city": city, "category": category},
+            view=("mv_listing_stats_daily", f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM CAST(day AS timestamp))::bigint as bucket,
+                       SUM(listings)::bigint as value
+                FROM mv_listing_stats_daily
+                WHERE day >= :start_day {filters}
+                GROUP BY 1, 2
+            """),
+            live=f"""
+                SELECT {_SERIES_KEY}, EXTRACT(EPOCH FROM date_trunc(CAST(:interval AS text), l.created_at, 'UTC'))::bigint as bucket,
+                       COUNT(*) as value
+                FROM listings l
+                JOIN users u ON l.seller_id = u.id
+                WHERE l.created_at >= :start AND l.created_at < :end {filters}
+                GROUP BY 1, 2
+            """,
+        )
+
+    async def _series(self, days: int, interval: str, group_by: Optional[str], window: int,
+                      params: Dict[str, Any], view: Tuple[str, str], live: str) -> Dict[str, Any]:
+        """
+        Per-bucket counts over the last `days` (ending with the current bucket), one
+        series per `group_by` value plus an "all" total, with a trailing moving
+        average and week-over-week change. SQL returns only non-empty buckets; the
+        rest (gap filling and derived series) is vectorized NumPy over the whole
+        keys x buckets matrix.
+        """
+        step = SERIES_INTERVALS[interval]
+        lag = int(timedelta(days=7) / step)
+        visible = int(timedelta(days=days) / step)
+        # Enough history before the first visible bucket for its moving average and
+        # week-over-week change; it is fetched and then sliced off
+        history = max(lag, window - 1)
+        now = datetime.now(timezone.utc)
+        end = now.replace(minute=0, second=0, microsecond=0)
+        if interval == "day":
+            end = end.replace(hour=0)
+        start = end - step * (visible - 1 + history)
+
+        params = {**params, "group_by": group_by}
+        if not self.live and interval == "day":
+            view_name, query = view
+            self.views_used.add(view_name)
+            params["start_day"] = start.date()
+        else:
+            # The daily views cannot serve hourly buckets
+            query = live
+            params.update(interval=interval, start=start, end=end + step)
+        rows = (await self.db.execute(text(query), params)).all()
+
+        keys = [row[0] for row in rows]
+        buckets = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+        offsets = (buckets - int(start.timestamp())) // int(step.total_seconds())
+        if group_by:
+            # Ranked by their visible total; the history buckets only feed the derived series
+            keys = timeseries.fold_keys(keys, np.where(offsets >= history, values, 0),
+                                        settings.METRICS_SERIES_MAX_GROUPS, OTHER_SERIES)
+        labels, matrix = timeseries.dense_matrix(keys, offsets, values, visible + history)
+        if group_by:
+            labels = np.concatenate([["all"], labels])
+            matrix = np.vstack([matrix.sum(axis=0, keepdims=True), matrix])
+        elif not len(labels):
+            labels, matrix = np.array(["all"]), np.zeros((1, visible + history), dtype=np.int64)
+
+        averages = timeseries.moving_average(matrix, window)[:, history:]
+        change, change_ratio = timeseries.lagged_change(matrix, lag)
+        matrix = matrix[:, history:]
+        first = np.datetime64(start.replace(tzinfo=None), "s") + np.timedelta64(int(step.total_seconds()) * history, "s")
+        axis = first + np.arange(visible) * np.timedelta64(int(step.total_seconds()), "s")
+
+        # Largest series first, after the "all" total and before "Other"
+        order = np.argsort(-matrix.sum(axis=1), kind="stable")
+        if group_by:
+            order = order[order != 0]
+            other = labels[order] == OTHER_SERIES
+            order = np.concatenate([[0], order[~other], order[other]])
+        return {
+            "interval": interval,
+            "window": window,
+            "buckets": np.datetime_as_string(axis, unit="s", timezone="UTC").tolist(),
+            "series": [
+                {
+                    "key": label,
+                    "total": total,
+                    "values": values,
+                    "moving_average": average,
+                    "wow_change": delta,
+                    "wow_change_ratio": ratio,
+                }
+                for label, total, values, average, delta, ratio in zip(
+                    labels[order].tolist(),
+                    matrix[order].sum(axis=1).tolist(),
+                    timeseries.to_json(matrix[order]),
+                    timeseries.to_json(averages[order], 3),
+                    timeseries.to_json(change[order][:, history:]),
+                    timeseries.to_json(change_ratio[order][:, history:], 4),
+                )
+            ],
+        }
+
+# Series key column: the group_by dimension, or one series when not grouping
+_SERIES_KEY = """
+    COALESCE(CASE CAST(:group_by AS text) WHEN 'region' THEN region WHEN 'city' THEN city ELSE 'all' END,
+             'Unknown') as key
+"""
+
+_SUPPLY_DEMAND_SQL = """
+    WITH supply AS ({supply}),
+         demand AS ({demand})
+    SELECT 
+        COALESCE(s.region, d.region) as region,
+        COALESCE(s.category, d.category) as category,
+        COALESCE(s.supply_count, 0)::bigint as supply_count,
+        COALESCE(d.demand_count, 0)::bigint as demand_count,
+        CASE 
+            WHEN COALESCE(s.supply_count, 0) = 0 THEN 0 
+            ELSE COALESCE(d.demand_count, 0)::float / s.supply_count 
+        END as demand_per_supply
+    FROM supply s
+    FULL OUTER JOIN demand d ON s.region = d.region AND s.category = d.category
+    ORDER BY demand_per_supply DESC
+"""
+
+metrics_cache = ResultCache(
+    "admin_metrics_cache",
+    ttl_seconds=settings.METRICS_CACHE_TTL_SECONDS,
+    stale_seconds=settings.METRICS_CACHE_STALE_SECONDS,
+    max_entries=settings.METRICS_CACHE_MAX_ENTRIES,
+)
+
+async def cached_metric(method: str, days: int, **filters: Any) -> Tuple[Any, datetime]:
+    """
+    (rows, freshness) of AdminMetricsService.<method> over the materialized views,
+    through metrics_cache. Computed on its own session so a background revalidation
+    does not depend on the request that triggered it.
+    """
+    async def compute():
+        return await _run_metric(method, days, live=False, **filters)
+
+    key = (method, days, *sorted(filters.items()))
+    return await metrics_cache.get(key, compute)
+
+async def _run_metric(method: str, days: int, live: bool, **filters: Any) -> Tuple[Any, datetime]:
+    # Own pooled connection, bounded by a transaction-local statement timeout
+    async with SessionLocal() as db:
+        await db.execute(
+            text("SELECT set_config('statement_timeout', :ms, true)"),
+            {"ms": str(settings.METRICS_QUERY_TIMEOUT_MS)},
+        )
+        service = AdminMetricsService(db, live=live)
+        rows = await getattr(service, method)(days, **filters)
+        return rows, await service.freshness()
+
+# Time series -> (AdminMetricsService method, filters it accepts)
+SERIES_METRICS = {
+    "events": ("get_event_series", ("region", "city", "category", "event_type")),
+    "users": ("get_user_series", ("region", "city")),
+    "listings": ("get_listing_series", ("region", "city", "category")),
+}
+
+# Dashboard section -> (AdminMetricsService method, filters it accepts)
+DASHBOARD_METRICS = {
+    "users_by_region": ("get_users_by_region", ("region",)),
+    "listings_by_region": ("get_listings_by_region", ("region",)),
+    "listings_by_category": ("get_listings_by_category", ("region",)),
+    "activity": ("get_activity", ("region", "city")),
+    "supply_demand": ("get_supply_demand", ("region", "category")),
+}
+
+async def get_dashboard(days: int, live: bool = False, **filters: Optional[str]) -> Dict[str, Any]:
+    """
+    All dashboard metrics at once, each on its own connection and run concurrently,
+    so the response takes as long as the slowest query rather than the sum. A metric
+    that fails or hits METRICS_QUERY_TIMEOUT_MS is reported in `errors` and the
+    others are still returned.
+    """
+    async def run(name: str, method: str, accepted: Tuple[str, ...]):
+        kwargs = {key: filters.get(key) for key in accepted}
+        start = time.perf_counter()
+        try:
+            if live:
+                return name, await _run_metric(method, days, live=True, **kwargs), None
+            return name, await cached_metric(method, days, **kwargs), None
+        except DBAPIError as e:
+            timed_out = getattr(e.orig, "sqlstate", None) == "57014"
+            metrics.inc(f"admin_dashboard.{name}.{'timeouts' if timed_out else 'failures'}")
+            logger.warning("Dashboard metric %s failed", name, exc_info=not timed_out)
+            return name, None, "timeout" if timed_out else "error"
+        finally:
+            metrics.observe(f"admin_dashboard.{name}.seconds", time.perf_counter() - start)
+
+    results = await asyncio.gather(*(run(name, *spec) for name, spec in DASHBOARD_METRICS.items()))
+    dashboard: Dict[str, Any] = {"metrics": {}, "errors": {}, "refreshed_at": None}
+    freshness = []
+    for name, result, error in results:
+        if error:
+            dashboard["metrics"][name] = None
+            dashboard["errors"][name] = error
+        else:
+            dashboard["metrics"][name] = result[0]
+            freshness.append(result[1])
+    if freshness:
+        dashboard["refreshed_at"] = min(freshness)
+    return dashboard
+
+async def refresh_metric_views() -> List[str]:
+    """
+    REFRESH ... CONCURRENTLY each metrics view, so dashboard readers are never blocked.
+    An advisory lock and the shared refresh timestamp keep multiple workers from
+    refreshing the same view at once or more often than the configured interval.
+    """
+    refreshed = []
+    for name in MATERIALIZED_VIEWS:
+        start = time.perf_counter()
+        async with SessionLocal() as db:
+            if not await db.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": name}):
+                continue
+            recent = await db.scalar(text("""
+                SELECT refreshed_at > NOW() - make_interval(secs => :secs)
+                FROM metric_view_refreshes WHERE view_name = :name
+            """), {"name": name, "secs": settings.METRIC_VIEWS_REFRESH_SECONDS / 2})
+            if recent:
+                continue
+            await db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+            await db.execute(text("""
+                INSERT INTO metric_view_refreshes (view_name, refreshed_at) VALUES (:name, NOW())
+                ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+            """), {"name": name})
+            await db.commit()
+        metrics.observe(f"metric_views.{name}.refresh_seconds", time.perf_counter() - start)
+        refreshed.append(name)
+    if refreshed:
+        metrics_cache.clear()
+    return refreshed
+
+register_periodic_task("metric_view_refresh", settings.METRIC_VIEWS_REFRESH_SECONDS, refresh_metric_views)
@@ -1,13 +1,16 @@
 from datetime import datetime, timedelta, timezone
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text
 from fastapi import HTTPException, status
 from app.models.user import User
 from app.models.refresh_token import RefreshToken
 from app.schemas.auth import Signup, Login, Token
 from app.core import security
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.tasks import register_periodic_task
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     result = await db.execute(select(User).where(User.email == email))
@@ -24,7 +27,7 @@ async def signup(db: AsyncSession, signup_data: Signup) -> dict:
     
     new_user = User(
         email=email,
-        password_hash=security.get_password_hash(signup_data.password),
+        password_hash=await security.get_password_hash_async(signup_data.password),
         city=signup_data.city,
         region=signup_data.region,
         role="user"
@@ -38,17 +41,26 @@ async def signup(db: AsyncSession, signup_data: Signup) -> dict:
 async def login(db: AsyncSession, login_data: Login) -> dict:
     email = login_data.email.lower()
     user = await get_user_by_email(db, email)
-    if not user or not security.verify_password(login_data.password, user.password_hash):
+    if not user or not await security.verify_password_async(login_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
+    # Move hashes made with outdated argon2 parameters to the current cost
+    if security.pwd_context.needs_update(user.password_hash):
+        user.password_hash = await security.get_password_hash_async(login_data.password)
+        db.add(user)
+        metrics.inc("auth.password_rehashed")
     return await create_tokens(db, user)
 
 async def create_tokens(db: AsyncSession, user: User) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = None
+    if settings.ACCESS_TOKEN_CLAIMS_ENABLED:
+        # Lets the auth dependencies authorize without loading the users row
+        claims = {"role": user.role, "region": user.region, "city": user.city, "ban_epoch": user.ban_epoch}
     access_token = security.create_access_token(
-        subject=user.id, expires_delta=access_token_expires
+        subject=user.id, expires_delta=access_token_expires, claims=claims
     )
     
     refresh_token_str = security.create_access_token(
@@ -58,10 +70,13 @@ async def create_tokens(db: AsyncSession, user: User) -> dict:
     # Store refresh token in DB
     refresh_token = RefreshToken(
         user_id=user.id,
-        token_hash=security.get_password_hash(refresh_token_str), # Store hashed
+        token_hash=await security.get_password_hash_async(refresh_token_str), # Store hashed
         expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     )
     db.add(refresh_token)
+    if settings.MAX_SESSIONS_PER_USER > 0:
+        await db.flush()
+        await _evict_oldest_sessions(db, user.id)
     await db.commit()
     await db.refresh(user)
     
@@ -89,15 +104,17 @@ async def refresh_token(db: AsyncSession, token: str) -> dict:
     # We decode it, get 'sub' (User ID). Then we check the user's active refresh tokens.
     # We verify if the incoming token matches any of the stored hashes for that user.
     
-    result = await db.execute(select(RefreshToken).where(RefreshToken.user_id == uuid.UUID(str(user_id))))
+    result = await db.execute(select(RefreshToken).where(
+        RefreshToken.user_id == uuid.UUID(str(user_id)),
+        RefreshToken.expires_at > datetime.now(timezone.utc),
+    ))
     user_tokens = result.scalars().all()
     
     valid_token_record = None
     for rt in user_tokens:
-        if security.verify_password(token, rt.token_hash):
-            if rt.expires_at > datetime.now(timezone.utc):
-                valid_token_record = rt
-                break
+        if await security.verify_password_async(token, rt.token_hash):
+            valid_token_record = rt
+            break
     
     if not valid_token_record:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
@@ -120,8 +137,60 @@ async def logout(db: AsyncSession, token: str):
          user_tokens = result.scalars().all()
          
          for rt in user_tokens:
-             if security.verify_password(token, rt.token_hash):
+             if await security.verify_password_async(token, rt.token_hash):
                  await db.delete(rt)
                  break
              
          await db.commit()
+
+async def _evict_oldest_sessions(db: AsyncSession, user_id: uuid.UUID):
+    # Keep only the newest MAX_SESSIONS_PER_USER refresh tokens for this user
+    result = await db.execute(text("""
+        DELETE FROM refresh_tokens
+        WHERE id IN (
+            SELECT id FROM refresh_tokens
+            WHERE user_id = :user_id
+            ORDER BY created_at DESC, expires_at DESC
+            OFFSET :cap
+        )
+    """), {"user_id": user_id, "cap": settings.MAX_SESSIONS_PER_USER})
+    if result.rowcount:
+        metrics.inc("refresh_tokens.evicted", result.rowcount)
+
+async def reap_expired_refresh_tokens() -> int:
+    """
+    Deletes expired refresh tokens in small batches, one short transaction each,
+    so row locks are held briefly and concurrent logins are never blocked for long.
+    """
+    batch_size = settings.REFRESH_TOKEN_REAP_BATCH_SIZE
+    reaped = 0
+    for _ in range(settings.REFRESH_TOKEN_REAP_MAX_BATCHES):
+        async with SessionLocal() as db:
+            await db.execute(text("SET LOCAL lock_timeout = '500ms'"))
+            result = await db.execute(text("""
+                DELETE FROM refresh_tokens
+                WHERE id IN (
+                    SELECT id FROM refresh_tokens
+                    WHERE expires_at < NOW()
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+            """), {"batch_size": batch_size})
+            await db.commit()
+        reaped += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    async with SessionLocal() as db:
+        estimate = await db.scalar(text(
+            "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = 'refresh_tokens'::regclass"
+        ))
+    metrics.inc("refresh_tokens.reaped", reaped)
+    metrics.set_gauge("refresh_tokens.table_rows_estimate", estimate or 0)
+    return reaped
+
+register_periodic_task(
+    "refresh_token_reaper",
+    settings.REFRESH_TOKEN_REAP_INTERVAL_SECONDS,
+    reap_expired_refresh_tokens,
+)
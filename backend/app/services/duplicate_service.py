@@ -0,0 +1,199 @@
+import asyncio
+import base64
+import logging
+import time
+import uuid
+from concurrent.futures import Executor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.minhash import MinHasher, MinHashLSH
+from app.core.pg_listener import notify, pg_listener
+from app.core.result_cache import ResultCache
+from app.core.tasks import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+SIGNATURES_CHANNEL = "listing_signatures"
+
+LIVE_LISTINGS_SQL = text("SELECT id, title, description FROM listings WHERE status = 'live'")
+LOAD_CHUNK_ROWS = 5000
+
+def _encode(listing_id: uuid.UUID, signature: Optional[np.ndarray]) -> str:
+    # "<id>:<base64 signature>", or "<id>:" to drop it; 128 values fit well within pg_notify's 8000 bytes
+    encoded = base64.b64encode(signature.tobytes()).decode() if signature is not None else ""
+    return f"{listing_id}:{encoded}"
+
+def _decode(payload: str) -> Tuple[uuid.UUID, Optional[np.ndarray]]:
+    listing_id, _, encoded = payload.partition(":")
+    signature = np.frombuffer(base64.b64decode(encoded), dtype=np.uint32) if encoded else None
+    return uuid.UUID(listing_id), signature
+
+class DuplicateDetector:
+    """
+    MinHash signatures of the title and description of every live listing, held in
+    an LSH index in each worker's memory. A check is one signature plus a few dict
+    probes, so it runs on every publish and update. The signature costs time linear
+    in the text (capped at the hasher's max_chars, some 20 ms at the cap) and is
+    computed on an executor, off the event loop.
+
+    Workers keep each other's index current through pg_notify (the signature is in
+    the payload), and every DUPLICATES_REBUILD_SECONDS the index is rebuilt from the
+    table to drop listings hidden or sold since. Matches are re-checked against the
+    table before being reported, so a stale entry never causes a flag.
+    """
+    def __init__(self, num_perm: int, bands: int, threshold: float):
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.threshold = threshold
+        self.index = MinHashLSH(num_perm, bands)
+        self._pending: Optional[List[Tuple[uuid.UUID, Optional[np.ndarray]]]] = None
+        self._rebuild_lock: asyncio.Lock | None = None
+
+    def _apply(self, listing_id: uuid.UUID, signature: Optional[np.ndarray]):
+        if signature is None:
+            self.index.remove(listing_id)
+        else:
+            self.index.insert(listing_id, signature)
+        # Replayed onto the new index if a rebuild is loading rows meanwhile
+        if self._pending is not None:
+            self._pending.append((listing_id, signature))
+
+    def on_notify(self, payload: str):
+        self._apply(*_decode(payload))
+
+    async def check(self, db: AsyncSession, listing_id: uuid.UUID, title: str, description: str,
+                    live: bool, executor: Optional[Executor] = None) -> List[Tuple[uuid.UUID, float]]:
+        """
+        Live listings whose text is near-identical to this one (estimated Jaccard
+        similarity of shingles at least DUPLICATES_THRESHOLD), most similar first.
+        The listing is indexed when live and dropped from the index otherwise. The
+        signature is computed on `executor` (default: the loop's).
+        """
+        if not settings.DUPLICATES_ENABLED:
+            return []
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        signature = await loop.run_in_executor(executor, self.hasher.signature, f"{title}\n{description}")
+        matches = []
+        if signature is not None:
+            matches = [match for match in self.index.query(signature, self.threshold) if match[0] != listing_id]
+        indexed = signature if live else None
+        metrics.observe("duplicates.check_seconds", time.perf_counter() - start)
+
+        if indexed is not None or listing_id in self.index:
+            self._apply(listing_id, indexed)
+            await notify(db, SIGNATURES_CHANNEL, _encode(listing_id, indexed))
+        if matches:
+            result = await db.execute(
+                text("SELECT id FROM listings WHERE id = ANY(CAST(:ids AS uuid[])) AND status = 'live'"),
+                {"ids": [match_id for match_id, _ in matches]},
+            )
+            live_ids = set(result.scalars())
+            matches = [match for match in matches if match[0] in live_ids]
+        await db.commit()
+        return matches
+
+    async def _load_index(self) -> MinHashLSH:
+        """Fresh index of every live listing; signatures are computed off the event loop."""
+        index = MinHashLSH(self.hasher.num_perm, self.bands)
+        loop = asyncio.get_running_loop()
+
+        def add_rows(rows):
+            for listing_id, title, description in rows:
+                signature = self.hasher.signature(f"{title}\n{description}")
+                if signature is not None:
+                    index.insert(listing_id, signature)
+
+        async with SessionLocal() as db:
+            result = await db.stream(LIVE_LISTINGS_SQL)
+            async for rows in result.partitions(LOAD_CHUNK_ROWS):
+                await loop.run_in_executor(None, add_rows, rows)
+        return index
+
+    async def rebuild(self):
+        if self._rebuild_lock is None:
+            self._rebuild_lock = asyncio.Lock()
+        async with self._rebuild_lock:
+            start = time.perf_counter()
+            self._pending = []
+            try:
+                index = await self._load_index()
+                # No await from here on: nothing can slip in between the replay and the swap
+                for listing_id, signature in self._pending:
+                    if signature is None:
+                        index.remove(listing_id)
+                    else:
+                        index.insert(listing_id, signature)
+                self.index = index
+            finally:
+                self._pending = None
+            metrics.set_gauge("duplicates.indexed", len(index))
+            metrics.observe("duplicates.rebuild_seconds", time.perf_counter() - start)
+
+    def clear(self):
+        self.index = MinHashLSH(self.hasher.num_perm, self.bands)
+
+duplicate_detector = DuplicateDetector(
+    num_perm=settings.DUPLICATES_NUM_PERM,
+    bands=settings.DUPLICATES_BANDS,
+    threshold=settings.DUPLICATES_THRESHOLD,
+)
+pg_listener.subscribe(SIGNATURES_CHANNEL, duplicate_detector.on_notify)
+register_periodic_task("duplicate_index_rebuild", settings.DUPLICATES_REBUILD_SECONDS, duplicate_detector.rebuild)
+
+# --- Batch clustering ---
+
+async def cluster_catalog() -> Dict[str, Any]:
+    """
+    Groups of near-duplicate listings across the whole live catalog, largest first,
+    each ordered oldest first (the likely original). Built from a fresh index rather
+    than the worker's live one, so it is exact as of the scan.
+    """
+    start = time.perf_counter()
+    index = await duplicate_detector._load_index()
+    loop = asyncio.get_running_loop()
+    clusters = await loop.run_in_executor(None, index.clusters, duplicate_detector.threshold)
+
+    listings: Dict[uuid.UUID, Dict[str, Any]] = {}
+    if clusters:
+        async with SessionLocal() as db:
+            result = await db.execute(text("""
+                SELECT id, seller_id, title, price, created_at
+                FROM listings
+                WHERE id = ANY(CAST(:ids AS uuid[])) AND status = 'live'
+            """), {"ids": [listing_id for cluster in clusters for listing_id in cluster]})
+            listings = {row.id: dict(row._mapping) for row in result}
+
+    groups = []
+    for cluster in clusters:
+        members = sorted((listings[key] for key in cluster if key in listings), key=lambda l: l["created_at"])
+        if len(members) > 1:
+            groups.append({
+                "size": len(members),
+                "sellers": len({member["seller_id"] for member in members}),
+                "listings": members,
+            })
+    groups.sort(key=lambda group: group["size"], reverse=True)
+    metrics.observe("duplicates.cluster_seconds", time.perf_counter() - start)
+    return {
+        "generated_at": datetime.now(timezone.utc),
+        "listings": len(index),
+        "clusters": groups,
+    }
+
+cluster_cache = ResultCache(
+    "duplicate_cluster_cache",
+    ttl_seconds=settings.DUPLICATES_CLUSTERS_CACHE_TTL_SECONDS,
+    stale_seconds=settings.DUPLICATES_CLUSTERS_CACHE_TTL_SECONDS * 6,
+    max_entries=1,
+)
+
+async def cached_clusters() -> Dict[str, Any]:
+    """cluster_catalog through cluster_cache: the catalog is scanned at most once per TTL per worker."""
+    return await cluster_cache.get("catalog", cluster_catalog)
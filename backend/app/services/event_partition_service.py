@@ -0,0 +1,149 @@
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.tasks import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "events_default"
+MAINTENANCE_LOCK = "event_partition_maintenance"
+# events_pYYYYMM for monthly partitions, events_pYYYYMMDD for daily ones
+_PARTITION_NAME = re.compile(r"^events_p(\d{4})(\d{2})(\d{2})?$")
+
+def period_start(day: date, granularity: str) -> date:
+    return day if granularity == "day" else day.replace(day=1)
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "day":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def partition_name(start: date, granularity: str) -> str:
+    return f"events_p{start:%Y%m%d}" if granularity == "day" else f"events_p{start:%Y%m}"
+
+def partition_range(name: str) -> Optional[Tuple[date, date]]:
+    """[start, end) covered by a partition, derived from its name; None for the default partition."""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    year, month, day = match.groups()
+    if day:
+        start = date(int(year), int(month), int(day))
+        return start, next_period(start, "day")
+    start = date(int(year), int(month), 1)
+    return start, next_period(start, "month")
+
+def _bound(day: date) -> str:
+    # Partition bounds are UTC midnights
+    return f"'{day.isoformat()} 00:00:00+00'"
+
+async def list_event_partitions(db: AsyncSession) -> List[str]:
+    result = await db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'events'::regclass
+        ORDER BY c.relname
+    """))
+    return list(result.scalars())
+
+async def _create_partition(name: str, start: date, end: date):
+    # Built detached and then attached, so rows that already landed in the default
+    # partition for this range are moved over in the same transaction.
+    async with SessionLocal() as db:
+        await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+        await db.execute(text(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        # ATTACH needs this lock anyway; taking it before moving rows stops inserts from
+        # landing in the default partition for this range in between, which would fail
+        # the ATTACH's check of the default partition
+        await db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+        await db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= {_bound(start)} AND created_at < {_bound(end)}
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """))
+        await db.execute(text(
+            f"ALTER TABLE events ATTACH PARTITION {name} FOR VALUES FROM ({_bound(start)}) TO ({_bound(end)})"
+        ))
+        await db.commit()
+
+async def ensure_event_partitions(today: Optional[date] = None) -> List[str]:
+    """Create the current partition and EVENT_PARTITIONS_AHEAD future ones; returns the names created."""
+    granularity = settings.EVENT_PARTITION_GRANULARITY
+    today = today or datetime.now(timezone.utc).date()
+    async with SessionLocal() as db:
+        existing = [r for r in map(partition_range, await list_event_partitions(db)) if r]
+
+    created = []
+    start = period_start(today, granularity)
+    for _ in range(settings.EVENT_PARTITIONS_AHEAD + 1):
+        end = next_period(start, granularity)
+        # Skip ranges already covered, e.g. by monthly partitions after switching to daily
+        if not any(lo < end and start < hi for lo, hi in existing):
+            name = partition_name(start, granularity)
+            await _create_partition(name, start, end)
+            existing.append((start, end))
+            created.append(name)
+        start = end
+    return created
+
+async def drop_expired_event_partitions(today: Optional[date] = None) -> List[str]:
+    """
+    Retention without bulk DELETEs: partitions entirely older than EVENT_RETENTION_DAYS
+    are detached and dropped, which is a catalog change instead of a table rewrite.
+    """
+    if settings.EVENT_RETENTION_DAYS <= 0:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=settings.EVENT_RETENTION_DAYS)
+    async with SessionLocal() as db:
+        names = await list_event_partitions(db)
+
+    dropped = []
+    for name in names:
+        bounds = partition_range(name)
+        if bounds is None or bounds[1] > cutoff:
+            continue
+        async with SessionLocal() as db:
+            await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+            await db.execute(text(f"ALTER TABLE events DETACH PARTITION {name}"))
+            await db.execute(text(f"DROP TABLE {name}"))
+            await db.commit()
+        dropped.append(name)
+
+    # Stray old rows that fell into the default partition
+    async with SessionLocal() as db:
+        await db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < {_bound(cutoff)}"))
+        await db.commit()
+    return dropped
+
+async def maintain_event_partitions():
+    # Runs in every worker: one at a time does the work, the others skip this round.
+    # The advisory lock lives as long as lock_db's transaction, on its own connection.
+    async with SessionLocal() as lock_db:
+        if not await lock_db.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": MAINTENANCE_LOCK}):
+            return
+        created = await ensure_event_partitions()
+        dropped = await drop_expired_event_partitions()
+    if created or dropped:
+        logger.info("Event partitions created: %s, dropped: %s", created, dropped)
+    async with SessionLocal() as db:
+        count = len(await list_event_partitions(db))
+    metrics.inc("events.partitions_created", len(created))
+    metrics.inc("events.partitions_dropped", len(dropped))
+    metrics.set_gauge("events.partitions", count)
+
+register_periodic_task(
+    "event_partition_maintenance",
+    settings.EVENT_PARTITION_MAINTENANCE_SECONDS,
+    maintain_event_partitions,
+)
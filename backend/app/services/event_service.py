@@ -1,15 +1,368 @@
+import asyncio
+import json
+import logging
+import time
 import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.event import Event
-from app.schemas.event import EventCreate
-
-async def log_event(db: AsyncSession, event_data: EventCreate, user_id: uuid.UUID | None = None) -> Event:
-    new_event = Event(
-        **event_data.model_dump(),
-        user_id=user_id,
-        # Enrich with geo info if we had request context, for now user_id and data sufficient
+from app.core.bloom import RotatingBloomFilter
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.principal import Principal
+from app.core.json_stream import StreamFormatError, iter_json_array, iter_ndjson
+from app.core.metrics import metrics
+from app.schemas.event import EventCreate, BulkEventCreate
+from app.services.active_user_service import merge_active_user_sketches
+
+logger = logging.getLogger(__name__)
+
+# One statement for any batch size: columns are shipped as arrays and expanded with
+# unnest. Rows whose listing/user vanished are skipped instead of failing the batch.
+# The same listings probe stamps the listing category, so enrichment costs no extra
+# queries. The hourly rollups are bumped in the same statement, so they never drift
+# from the raw table; groups are upserted in key order to keep lock order stable.
+# Rows flagged as suppressed duplicates only count towards rollups.suppressed.
+# The rows that survived the checks come back, for the active-user sketches.
+INSERT_EVENTS_SQL = text("""
+    WITH batch AS (
+        SELECT e.*, l.category
+        FROM unnest(
+            CAST(:ids AS uuid[]), CAST(:user_ids AS uuid[]), CAST(:event_types AS text[]),
+            CAST(:listing_ids AS uuid[]), CAST(:regions AS text[]), CAST(:cities AS text[]),
+            CAST(:metadata AS jsonb[]), CAST(:created_ats AS timestamptz[]), CAST(:suppressed AS boolean[])
+        ) AS e(id, user_id, event_type, listing_id, region, city, metadata, created_at, suppressed)
+        LEFT JOIN listings l ON l.id = e.listing_id
+        WHERE (e.listing_id IS NULL OR l.id IS NOT NULL)
+          AND (e.user_id IS NULL OR EXISTS (SELECT 1 FROM users u WHERE u.id = e.user_id))
+    ), inserted AS (
+        INSERT INTO events (id, user_id, event_type, listing_id, region, city, category, metadata, created_at)
+        SELECT id, user_id, event_type, listing_id, region, city, category, metadata, created_at
+        FROM batch
+        WHERE NOT suppressed
+    ), rolled_up AS (
+        INSERT INTO event_rollups_hourly AS r (hour, event_type, region, city, category, listing_id, count, suppressed)
+        SELECT date_trunc('hour', created_at, 'UTC'), event_type, region, city, category, listing_id,
+               COUNT(*) FILTER (WHERE NOT suppressed), COUNT(*) FILTER (WHERE suppressed)
+        FROM batch
+        GROUP BY 1, 2, 3, 4, 5, 6
+        ORDER BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT (hour, event_type, region, city, category, listing_id)
+        DO UPDATE SET count = r.count + EXCLUDED.count, suppressed = r.suppressed + EXCLUDED.suppressed
     )
-    db.add(new_event)
+    SELECT user_id, region, created_at, suppressed FROM batch
+""")
+
+async def insert_event_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """Set-based insert of event rows (as built by build_event_row); returns events written."""
+    if not rows:
+        return 0
+    result = await db.execute(INSERT_EVENTS_SQL, {
+        "ids": [r["id"] for r in rows],
+        "user_ids": [r["user_id"] for r in rows],
+        "event_types": [r["event_type"] for r in rows],
+        "listing_ids": [r["listing_id"] for r in rows],
+        "regions": [r["region"] for r in rows],
+        "cities": [r["city"] for r in rows],
+        "metadata": [json.dumps(r["metadata"]) for r in rows],
+        "created_ats": [r["created_at"] for r in rows],
+        "suppressed": [r["suppressed"] for r in rows],
+    })
+    kept = [row._asdict() for row in result]
+    # Distinct-user sketches move with the events, in the same transaction; built
+    # from the rows that passed the checks (suppressed repeats are activity too)
+    await merge_active_user_sketches(db, kept)
+    return sum(1 for row in kept if not row["suppressed"])
+
+def _is_rejected_row(error: DBAPIError) -> bool:
+    # SQLSTATE classes 22 (data exception) and 23 (integrity constraint violation): a row
+    # the database will refuse however often it is retried. asyncpg surfaces the former
+    # as a plain DBAPIError, so go by the code rather than the exception type.
+    return str(getattr(error.orig, "sqlstate", None) or "")[:2] in ("22", "23")
+
+class EventIngestor:
+    """
+    Buffers analytics events in memory and writes them in set-based INSERT batches
+    from a background flusher, triggered by batch size or EVENT_FLUSH_INTERVAL_SECONDS.
+    When the buffer is full, producers wait up to EVENT_ENQUEUE_TIMEOUT_MS for space
+    and are then rejected with 503. The buffer is drained on shutdown.
+
+    Rows the database rejects (constraint or data errors) are isolated row by row
+    and dropped; a batch failing for any other reason (e.g. a lost connection) is
+    kept for the next flush, up to EVENT_FLUSH_MAX_RETRIES times in a row.
+    """
+    def __init__(self, max_buffer: int, batch_size: int, flush_interval: float, enqueue_timeout: float,
+                 max_retries: int):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self._failures = 0
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock: asyncio.Lock | None = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def submit(self, row: Dict[str, Any]):
+        if len(self._buffer) >= self.max_buffer:
+            deadline = time.monotonic() + self.enqueue_timeout
+            while len(self._buffer) >= self.max_buffer and time.monotonic() < deadline:
+                await asyncio.sleep(0.005)
+            if len(self._buffer) >= self.max_buffer:
+                metrics.inc("events.rejected")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Event buffer full, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+        self._buffer.append(row)
+        metrics.inc("events.enqueued")
+        metrics.set_gauge("events.buffer_depth", len(self._buffer))
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write everything currently buffered; returns the number of rows persisted."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        written = 0
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    written += await self._write(batch)
+                    self._failures = 0
+                except Exception:
+                    metrics.inc("events.flush_failures")
+                    self._failures += 1
+                    if self._failures > self.max_retries:
+                        self._failures = 0
+                        metrics.inc("events.dropped_failed", len(batch))
+                        logger.exception("Dropping %d events after %d failed flushes", len(batch), self.max_retries + 1)
+                        continue
+                    # Keep the rows for the next attempt, in their original order
+                    self._buffer.extendleft(reversed(batch))
+                    raise
+                finally:
+                    metrics.set_gauge("events.buffer_depth", len(self._buffer))
+        return written
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        start = time.perf_counter()
+        try:
+            async with SessionLocal() as db:
+                written = await insert_event_rows(db, batch)
+                await db.commit()
+        except DBAPIError as e:
+            if not _is_rejected_row(e):
+                raise
+            # A row the database rejects would fail every retry; isolate and drop it
+            written = await self._write_rowwise(batch)
+        kept = sum(1 for row in batch if not row["suppressed"])
+        if written < kept:
+            metrics.inc("events.dropped_invalid", kept - written)
+        metrics.observe("events.flush_batch_size", written)
+        metrics.observe("events.flush_seconds", time.perf_counter() - start)
+        metrics.inc("events.flushed", written)
+        return written
+
+    async def _write_rowwise(self, batch: List[Dict[str, Any]]) -> int:
+        written = 0
+        async with SessionLocal() as db:
+            for row in batch:
+                try:
+                    async with db.begin_nested():
+                        written += await insert_event_rows(db, [row])
+                except DBAPIError as e:
+                    if not _is_rejected_row(e):
+                        raise
+                    metrics.inc("events.dropped_rejected")
+                    logger.warning("Dropping event %s (%s): %s", row["id"], row["event_type"], e.orig)
+            await db.commit()
+        return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Event flush failed; %d events kept in buffer", len(self._buffer))
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Graceful shutdown: drain whatever is still buffered
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Dropping %d buffered events on shutdown", len(self._buffer))
+        self._wakeup = None
+        self._flush_lock = None
+
+event_ingestor = EventIngestor(
+    max_buffer=settings.EVENT_BUFFER_MAX,
+    batch_size=settings.EVENT_BATCH_SIZE,
+    flush_interval=settings.EVENT_FLUSH_INTERVAL_SECONDS,
+    enqueue_timeout=settings.EVENT_ENQUEUE_TIMEOUT_MS / 1000,
+    max_retries=settings.EVENT_FLUSH_MAX_RETRIES,
+)
+
+# Per worker; a viewer hitting several workers may get one event through on each
+view_deduplicator = RotatingBloomFilter(
+    window=settings.EVENT_DEDUP_WINDOW_SECONDS,
+    capacity=settings.EVENT_DEDUP_CAPACITY,
+    error_rate=settings.EVENT_DEDUP_ERROR_RATE,
+)
+
+def is_duplicate(event_data: EventCreate, viewer: str | None) -> bool:
+    if viewer is None or event_data.event_type not in settings.EVENT_DEDUP_TYPES:
+        return False
+    if not view_deduplicator.seen(f"{viewer}|{event_data.event_type}|{event_data.listing_id}"):
+        return False
+    metrics.inc(f"events.suppressed.{event_data.event_type}")
+    return True
+
+def bulk_duplicates(items: List[Tuple[EventCreate, datetime]], viewer: str | None, now: datetime) -> List[bool]:
+    """
+    is_duplicate for (event, occurred_at) pairs, judged by when the events occurred
+    rather than when they arrived: a repeat is suppressed if the same view was kept
+    less than the window earlier. Only events inside the window of `now` are also
+    checked against (and recorded in) view_deduplicator, which works in arrival time.
+    """
+    suppressed = [False] * len(items)
+    if viewer is None:
+        return suppressed
+    window = timedelta(seconds=settings.EVENT_DEDUP_WINDOW_SECONDS)
+    last_kept: Dict[str, datetime] = {}
+    for i in sorted(range(len(items)), key=lambda i: items[i][1]):
+        event_data, occurred_at = items[i]
+        if event_data.event_type not in settings.EVENT_DEDUP_TYPES:
+            continue
+        key = f"{viewer}|{event_data.event_type}|{event_data.listing_id}"
+        kept = last_kept.get(key)
+        if kept is not None and occurred_at - kept < window:
+            suppressed[i] = True
+        elif now - occurred_at < window and view_deduplicator.seen(key):
+            suppressed[i] = True
+        else:
+            last_kept[key] = occurred_at
+            continue
+        metrics.inc(f"events.suppressed.{event_data.event_type}")
+    return suppressed
+
+def build_event_row(
+    event_data: EventCreate,
+    user: Principal | None = None,
+    created_at: datetime | None = None,
+    suppressed: bool = False,
+) -> Dict[str, Any]:
+    # Geo comes from the caller's principal (token claims or the principal cache),
+    # so it costs no lookup here; the listing category is stamped at insert time.
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user.id if user else None,
+        "event_type": event_data.event_type,
+        "listing_id": event_data.listing_id,
+        "region": user.region if user else None,
+        "city": user.city if user else None,
+        # Suppressed rows are only counted, so don't hold on to their payload
+        "metadata": {} if suppressed else event_data.metadata,
+        "created_at": created_at or datetime.now(timezone.utc),
+        "suppressed": suppressed,
+    }
+
+async def log_event(
+    event_data: EventCreate,
+    user: Principal | None = None,
+    viewer: str | None = None,
+) -> Dict[str, Any]:
+    # Accepted once buffered; persisted by the background flusher
+    row = build_event_row(event_data, user, suppressed=is_duplicate(event_data, viewer))
+    await event_ingestor.submit(row)
+    return row
+
+def _client_timestamp(occurred_at: datetime | None, now: datetime) -> datetime:
+    # Keep the client's clock, but never in the future or beyond the accepted age
+    if occurred_at is None:
+        return now
+    if occurred_at.tzinfo is None:
+        occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+    oldest = now - timedelta(hours=settings.EVENT_CLIENT_TS_MAX_AGE_HOURS)
+    return min(max(occurred_at, oldest), now)
+
+async def log_events_bulk(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    ndjson: bool,
+    user: Principal | None = None,
+    viewer: str | None = None,
+) -> dict:
+    """
+    Validate a streamed JSON array or NDJSON body item by item and write all events in
+    one set-based insert. The raw body is never held in memory, only the compact rows.
+    """
+    max_events = settings.EVENT_BULK_MAX_EVENTS
+    max_item_bytes = settings.EVENT_BULK_MAX_ITEM_BYTES
+
+    async def _items() -> AsyncIterator[BulkEventCreate]:
+        if ndjson:
+            async for line in iter_ndjson(chunks, max_item_bytes):
+                yield BulkEventCreate.model_validate_json(line)
+        else:
+            async for obj in iter_json_array(chunks, max_item_bytes):
+                yield BulkEventCreate.model_validate(obj)
+
+    now = datetime.now(timezone.utc)
+    items: List[Tuple[BulkEventCreate, datetime]] = []
+    try:
+        async for item in _items():
+            if len(items) >= max_events:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"At most {max_events} events per request",
+                )
+            items.append((item, _client_timestamp(item.occurred_at, now)))
+    except StreamFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid event at index {len(items)}: {e}",
+        )
+    rows = [
+        build_event_row(item, user, occurred_at, suppressed)
+        for (item, occurred_at), suppressed in zip(items, bulk_duplicates(items, viewer, now))
+    ]
+
+    start = time.perf_counter()
+    written = await insert_event_rows(db, rows)
     await db.commit()
-    await db.refresh(new_event)
-    return new_event
+    metrics.observe("events.bulk_batch_size", len(rows))
+    metrics.observe("events.bulk_insert_seconds", time.perf_counter() - start)
+    suppressed = sum(1 for row in rows if row["suppressed"])
+    return {"accepted": written, "dropped": len(rows) - suppressed - written, "suppressed": suppressed}
@@ -8,6 +8,7 @@ from app.models.listing import Listing
 from app.models.listing_image import ListingImage
 from app.schemas.listing import ListingCreate, ListingUpdate, ListingImageCreate
 from app.models.user import User
+from app.services.screening_service import content_screener
 
 async def create_listing(db: AsyncSession, listing_data: ListingCreate, user_id: uuid.UUID) -> Listing:
     new_listing = Listing(
@@ -44,6 +45,8 @@ async def update_listing(db: AsyncSession, listing_id: uuid.UUID, listing_update
     db.add(listing)
     await db.commit()
     await db.refresh(listing)
+    # Screened in the background once committed; may be flagged or hidden shortly after
+    await content_screener.submit(listing.id)
     return listing
 
 async def publish_listing(db: AsyncSession, listing_id: uuid.UUID, user_id: uuid.UUID) -> Listing:
@@ -58,6 +61,7 @@ async def publish_listing(db: AsyncSession, listing_id: uuid.UUID, user_id: uuid
     db.add(listing)
     await db.commit()
     await db.refresh(listing)
+    await content_screener.submit(listing.id)
     return listing
 
 async def delete_listing(db: AsyncSession, listing_id: uuid.UUID, user_id: uuid.UUID):
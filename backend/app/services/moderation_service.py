@@ -1,15 +1,23 @@
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text, tuple_
+from app.core.config import settings
 from app.models.user import User
 from app.models.listing import Listing
 from app.models.moderation import ModerationAction
 from app.models.refresh_token import RefreshToken
+from app.core.principal import Principal
+from app.core.principal_cache import principal_cache
 import uuid
 
 class ModerationService:
-    def __init__(self, db: AsyncSession, admin_user: User):
+    def __init__(self, db: AsyncSession, admin_user: Principal | None):
         self.db = db
-        self.admin_id = admin_user.id
+        # None for automated actions (content screening); logged without an admin
+        self.admin_id = admin_user.id if admin_user else None
 
     async def hide_listing(self, listing_id: uuid.UUID, reason: str = ""):
         # Update listing status
@@ -37,6 +45,7 @@ class ModerationService:
         user = result.scalars().first()
         if user:
             user.is_banned = True
+            user.ban_epoch += 1
             self.db.add(user)
             
             # Invalidate tokens
@@ -47,6 +56,7 @@ class ModerationService:
             # Let's delete them.
             # Using execute delete is cleaner for bulk
             await self._delete_refresh_tokens(user_id)
+            await principal_cache.publish_invalidation(self.db, user_id)
             
             # Log action
             action = ModerationAction(
@@ -66,7 +76,9 @@ class ModerationService:
         user = result.scalars().first()
         if user:
             user.is_banned = False
+            user.ban_epoch += 1
             self.db.add(user)
+            await principal_cache.publish_invalidation(self.db, user_id)
             
             action = ModerationAction(
                 admin_id=self.admin_id,
@@ -80,9 +92,231 @@ class ModerationService:
             return True
         return False
         
+    async def flag_listing(self, listing_id: uuid.UUID, reason: str = "") -> bool:
+        """Record a listing for moderator review without changing it; the same flag is not recorded twice."""
+        result = await self.db.execute(text("""
+            INSERT INTO moderation_actions (id, admin_id, action, target_type, target_id, reason)
+            SELECT gen_random_uuid(), CAST(:admin_id AS uuid), 'flag_listing', 'listing',
+                   CAST(:listing_id AS uuid), CAST(:reason AS text)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM moderation_actions
+                WHERE target_type = 'listing' AND target_id = CAST(:listing_id AS uuid)
+                AND action = 'flag_listing' AND reason = CAST(:reason AS text)
+            )
+        """), {"admin_id": self.admin_id, "listing_id": listing_id, "reason": reason})
+        await self.db.commit()
+        return result.rowcount > 0
+
+    # --- Bulk actions ---
+    # Each runs as a few set-based statements in a single transaction, whatever the
+    # number of targets: one UPDATE ... RETURNING, one multi-row insert into
+    # moderation_actions, and for bans one DELETE of the users' refresh tokens.
+    # Targets already in the requested state are skipped and not logged again.
+
+    def _check_bulk_size(self, ids: Optional[List[uuid.UUID]]):
+        limit = settings.MODERATION_BULK_MAX_TARGETS
+        if ids is not None and len(ids) > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {limit} targets per request",
+            )
+
+    async def _log_actions(self, action: str, target_type: str, target_ids: List[uuid.UUID], reason: str):
+        if not target_ids:
+            return
+        await self.db.execute(text("""
+            INSERT INTO moderation_actions (id, admin_id, action, target_type, target_id, reason)
+            SELECT gen_random_uuid(), :admin_id, :action, :target_type, target_id, :reason
+            FROM unnest(CAST(:target_ids AS uuid[])) AS target_id
+        """), {
+            "admin_id": self.admin_id, "action": action, "target_type": target_type,
+            "target_ids": target_ids, "reason": reason,
+        })
+
+    async def _hide_listings(self, reason: str, listing_ids: Optional[List[uuid.UUID]] = None,
+                             seller_ids: Optional[List[uuid.UUID]] = None, status: Optional[str] = None,
+                             category: Optional[str] = None) -> List[uuid.UUID]:
+        result = await self.db.execute(text("""
+            UPDATE listings SET status = 'hidden', updated_at = NOW()
+            WHERE status <> 'hidden'
+            AND (CAST(:listing_ids AS uuid[]) IS NULL OR id = ANY(CAST(:listing_ids AS uuid[])))
+            AND (CAST(:seller_ids AS uuid[]) IS NULL OR seller_id = ANY(CAST(:seller_ids AS uuid[])))
+            AND (CAST(:status AS text) IS NULL OR status = :status)
+            AND (CAST(:category AS text) IS NULL OR category = :category)
+            RETURNING id
+        """), {"listing_ids": listing_ids, "seller_ids": seller_ids, "status": status, "category": category})
+        hidden = list(result.scalars())
+        await self._log_actions("hide_listing", "listing", hidden, reason)
+        return hidden
+
+    async def hide_listings(self, listing_ids: Optional[List[uuid.UUID]] = None, seller_id: Optional[uuid.UUID] = None,
+                            status: Optional[str] = None, category: Optional[str] = None,
+                            reason: str = "") -> Dict[str, Any]:
+        """Hide the listings matching all given criteria: explicit ids and/or a seller, status or category filter."""
+        if listing_ids is None and seller_id is None and category is None:
+            raise HTTPException(status_code=400, detail="Give listing_ids or a seller_id/category filter")
+        self._check_bulk_size(listing_ids)
+        hidden = await self._hide_listings(
+            reason, listing_ids=listing_ids, seller_ids=[seller_id] if seller_id else None,
+            status=status, category=category,
+        )
+        await self.db.commit()
+        return {"hidden": len(hidden), "listing_ids": hidden}
+
+    async def ban_users(self, user_ids: List[uuid.UUID], reason: str = "", hide_listings: bool = False) -> Dict[str, Any]:
+        """Ban users, end their sessions and optionally hide their live listings, all in one transaction."""
+        self._check_bulk_size(user_ids)
+        result = await self.db.execute(text("""
+            UPDATE users SET is_banned = true, ban_epoch = ban_epoch + 1
+            WHERE id = ANY(CAST(:user_ids AS uuid[])) AND NOT is_banned
+            RETURNING id
+        """), {"user_ids": user_ids})
+        banned = list(result.scalars())
+        hidden: List[uuid.UUID] = []
+        if banned:
+            await self.db.execute(
+                text("DELETE FROM refresh_tokens WHERE user_id = ANY(CAST(:user_ids AS uuid[]))"),
+                {"user_ids": banned},
+            )
+            await self._log_actions("ban_user", "user", banned, reason)
+            if hide_listings:
+                hidden = await self._hide_listings(reason, seller_ids=banned, status="live")
+            await principal_cache.publish_invalidations(self.db, banned)
+        await self.db.commit()
+        return {"banned": len(banned), "user_ids": banned, "listings_hidden": len(hidden)}
+
+    async def unban_users(self, user_ids: List[uuid.UUID], reason: str = "") -> Dict[str, Any]:
+        self._check_bulk_size(user_ids)
+        result = await self.db.execute(text("""
+            UPDATE users SET is_banned = false, ban_epoch = ban_epoch + 1
+            WHERE id = ANY(CAST(:user_ids AS uuid[])) AND is_banned
+            RETURNING id
+        """), {"user_ids": user_ids})
+        unbanned = list(result.scalars())
+        await self._log_actions("unban_user", "user", unbanned, reason)
+        await principal_cache.publish_invalidations(self.db, unbanned)
+        await self.db.commit()
+        return {"unbanned": len(unbanned), "user_ids": unbanned}
+
     async def _delete_refresh_tokens(self, user_id: uuid.UUID):
         # We can just fetch user.refresh_tokens and clear if loaded, or use delete stmt
         # Using sql delete
         from sqlalchemy import delete
         stmt = delete(RefreshToken).where(RefreshToken.user_id == user_id)
         await self.db.execute(stmt)
+
+# --- Audit log ---
+# Newest first, paged by keyset on (created_at, id) rather than OFFSET, so page N
+# costs the same as page 1 however large moderation_actions grows. Every index on
+# the table ends in (created_at DESC, id DESC) to serve these pages without a sort.
+
+def encode_cursor(created_at: datetime, action_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{action_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        created_at, action_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(action_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _page(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    # One row past the limit is fetched only to tell whether another page exists
+    items = rows[:limit]
+    has_more = len(rows) > limit
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]["created_at"], items[-1]["id"]) if has_more else None,
+    }
+
+async def list_actions(db: AsyncSession, limit: int = 50, cursor: Optional[str] = None,
+                       action: Optional[str] = None, target_type: Optional[str] = None,
+                       target_id: Optional[uuid.UUID] = None, admin_id: Optional[uuid.UUID] = None) -> Dict[str, Any]:
+    """
+    A page of the audit log, optionally filtered. Only the filters given become
+    predicates (rather than `:x IS NULL OR ...`), so each combination gets a plan
+    that walks the matching index in order and stops after limit + 1 rows.
+    """
+    if target_id is not None and target_type is None:
+        raise HTTPException(status_code=400, detail="target_id requires target_type")
+    query = (
+        select(
+            ModerationAction.id, ModerationAction.admin_id, User.email.label("admin_email"),
+            ModerationAction.action, ModerationAction.target_type, ModerationAction.target_id,
+            ModerationAction.reason, ModerationAction.created_at,
+        )
+        .outerjoin(User, User.id == ModerationAction.admin_id)
+        .order_by(ModerationAction.created_at.desc(), ModerationAction.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(tuple_(ModerationAction.created_at, ModerationAction.id) < tuple_(*decode_cursor(cursor)))
+    if action is not None:
+        query = query.where(ModerationAction.action == action)
+    if target_type is not None:
+        query = query.where(ModerationAction.target_type == target_type)
+    if target_id is not None:
+        query = query.where(ModerationAction.target_id == target_id)
+    if admin_id is not None:
+        query = query.where(ModerationAction.admin_id == admin_id)
+    result = await db.execute(query)
+    return _page([dict(row._mapping) for row in result], limit)
+
+# The target is the driving row, so it comes back even without history, and its
+# history page is a lateral index scan joined onto it: one round trip in all
+TARGET_HISTORY_SQL = text("""
+    SELECT l.title AS listing_title, l.status AS listing_status, l.price AS listing_price,
+           l.seller_id AS listing_seller_id, seller.email AS listing_seller_email,
+           u.email AS user_email, u.role AS user_role, u.is_banned AS user_is_banned,
+           u.created_at AS user_created_at,
+           h.id, h.admin_id, admin.email AS admin_email, h.action, h.reason, h.created_at
+    FROM (SELECT CAST(:target_type AS text) AS type, CAST(:target_id AS uuid) AS id) t
+    LEFT JOIN listings l ON t.type = 'listing' AND l.id = t.id
+    LEFT JOIN users seller ON seller.id = l.seller_id
+    LEFT JOIN users u ON t.type = 'user' AND u.id = t.id
+    LEFT JOIN LATERAL (
+        SELECT a.id, a.admin_id, a.action, a.reason, a.created_at
+        FROM moderation_actions a
+        WHERE a.target_type = t.type AND a.target_id = t.id
+        AND (CAST(:cursor_at AS timestamptz) IS NULL
+             OR (a.created_at, a.id) < (CAST(:cursor_at AS timestamptz), CAST(:cursor_id AS uuid)))
+        ORDER BY a.created_at DESC, a.id DESC
+        LIMIT :limit
+    ) h ON true
+    LEFT JOIN users admin ON admin.id = h.admin_id
+    ORDER BY h.created_at DESC, h.id DESC
+""")
+
+async def get_target_history(db: AsyncSession, target_type: str, target_id: uuid.UUID,
+                             limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """A listing or user as it is now, with a page of the actions taken on it."""
+    cursor_at, cursor_id = decode_cursor(cursor) if cursor is not None else (None, None)
+    rows = (await db.execute(TARGET_HISTORY_SQL, {
+        "target_type": target_type, "target_id": target_id,
+        "cursor_at": cursor_at, "cursor_id": cursor_id, "limit": limit + 1,
+    })).mappings().all()
+
+    first = rows[0]
+    target = None
+    if target_type == "listing" and first["listing_title"] is not None:
+        target = {
+            "title": first["listing_title"], "status": first["listing_status"], "price": first["listing_price"],
+            "seller_id": first["listing_seller_id"], "seller_email": first["listing_seller_email"],
+        }
+    elif target_type == "user" and first["user_email"] is not None:
+        target = {
+            "email": first["user_email"], "role": first["user_role"],
+            "is_banned": first["user_is_banned"], "created_at": first["user_created_at"],
+        }
+    history = [
+        {
+            "id": row["id"], "admin_id": row["admin_id"], "admin_email": row["admin_email"],
+            "action": row["action"], "target_type": target_type, "target_id": target_id,
+            "reason": row["reason"], "created_at": row["created_at"],
+        }
+        for row in rows if row["id"] is not None
+    ]
+    if target is None and not history and cursor is None:
+        raise HTTPException(status_code=404, detail=f"{target_type.capitalize()} not found")
+    return {"target_type": target_type, "target_id": target_id, "target": target, **_page(history, limit)}
+
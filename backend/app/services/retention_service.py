@@ -0,0 +1,119 @@
+import time
+from itertools import chain
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.result_cache import ResultCache
+
+# Users who signed up in the window, numbered densely so activity rows can carry a
+# small integer instead of a UUID. Both queries below run in one snapshot, so the
+# numbering is the same for each.
+COHORT_USERS_CTE = """
+    WITH cohort_users AS (
+        SELECT id,
+               (row_number() OVER (ORDER BY created_at, id) - 1)::int AS idx,
+               (((created_at AT TIME ZONE 'UTC')::date - CAST(:start AS date)) / 7)::int AS cohort
+        FROM users
+        WHERE created_at >= :start_ts AND created_at < :end_ts
+        AND (CAST(:region AS text) IS NULL OR region = :region)
+    )
+"""
+
+COHORTS_SQL = text(COHORT_USERS_CTE + """
+    SELECT cohort FROM cohort_users ORDER BY idx
+""")
+
+# Distinct (user, day) pairs: the events scan is pruned to the window's partitions
+# and never ships more than one row per user and day
+ACTIVITY_SQL = text(COHORT_USERS_CTE + """
+    SELECT u.idx, (d.day - CAST(:start AS date))::int AS day
+    FROM (
+        SELECT DISTINCT user_id, (created_at AT TIME ZONE 'UTC')::date AS day
+        FROM events
+        WHERE created_at >= :start_ts AND created_at < :end_ts AND user_id IS NOT NULL
+    ) d
+    JOIN cohort_users u ON u.id = d.user_id
+""")
+
+# One bit per week in a uint64 per user
+MAX_WEEKS = 52
+
+async def compute_retention(weeks: int, region: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Weekly signup-cohort retention over the last `weeks` complete weeks (Monday to
+    Sunday, UTC): for each cohort, how many of its users were active in each week
+    since signup. Activity arrives as compact (user, day) integer pairs in chunks of
+    RETENTION_CHUNK_ROWS and is folded into a per-user week bitset; the cohort x week
+    matrix is then a handful of vectorized shifts and bincounts.
+    """
+    if not 1 <= weeks <= MAX_WEEKS:
+        raise ValueError(f"weeks must be between 1 and {MAX_WEEKS}")
+    started = time.perf_counter()
+    today = datetime.now(timezone.utc).date()
+    end = today - timedelta(days=today.weekday())
+    start = end - timedelta(weeks=weeks)
+    params = {
+        "start": start,
+        "start_ts": datetime(start.year, start.month, start.day, tzinfo=timezone.utc),
+        "end_ts": datetime(end.year, end.month, end.day, tzinfo=timezone.utc),
+        "region": region,
+    }
+
+    activity_rows = 0
+    async with SessionLocal() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        chunks: List[np.ndarray] = []
+        result = await db.stream(COHORTS_SQL, params)
+        async for rows in result.partitions(settings.RETENTION_CHUNK_ROWS):
+            chunks.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        cohorts = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+        active = np.zeros(len(cohorts), dtype=np.uint64)
+        result = await db.stream(ACTIVITY_SQL, params)
+        async for rows in result.partitions(settings.RETENTION_CHUNK_ROWS):
+            pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+            np.bitwise_or.at(active, pairs[:, 0], np.left_shift(np.uint64(1), (pairs[:, 1] // 7).astype(np.uint64)))
+            activity_rows += len(rows)
+
+    # Week k after signup for every user at once: shift each bitset by its cohort
+    since_signup = active >> cohorts.astype(np.uint64)
+    sizes = np.bincount(cohorts, minlength=weeks)
+    retained = np.zeros((weeks, weeks), dtype=np.int64)
+    for k in range(weeks):
+        in_week = ((since_signup >> np.uint64(k)) & np.uint64(1)).astype(np.float64)
+        retained[:, k] = np.bincount(cohorts, weights=in_week, minlength=weeks)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.where(sizes[:, None] > 0, retained / sizes[:, None], 0.0)
+
+    metrics.inc("retention.activity_rows", activity_rows)
+    metrics.observe("retention.compute_seconds", time.perf_counter() - started)
+    return {
+        "start": start,
+        "end": end,
+        "generated_at": datetime.now(timezone.utc),
+        # Cohort c has been observed for weeks - c weeks
+        "cohorts": [
+            {
+                "week_start": start + timedelta(weeks=c),
+                "users": int(sizes[c]),
+                "retained": retained[c, :weeks - c].tolist(),
+                "retention": np.round(rates[c, :weeks - c], 4).tolist(),
+            }
+            for c in range(weeks)
+        ],
+    }
+
+retention_cache = ResultCache(
+    "retention_cache",
+    ttl_seconds=settings.RETENTION_CACHE_TTL_SECONDS,
+    stale_seconds=settings.RETENTION_CACHE_STALE_SECONDS,
+    max_entries=64,
+)
+
+async def cached_retention(weeks: int, region: Optional[str] = None) -> Dict[str, Any]:
+    """compute_retention through retention_cache: recomputed at most once per TTL per parameter set."""
+    return await retention_cache.get((weeks, region), lambda: compute_retention(weeks, region))
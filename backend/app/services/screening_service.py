@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.aho_corasick import AhoCorasick
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.pg_listener import notify, pg_listener
+from app.core.tasks import register_periodic_task
+from app.models.screening_rule import ScreeningRule
+from app.schemas.screening import ScreeningRuleCreate
+from app.services.duplicate_service import duplicate_detector
+from app.services.moderation_service import ModerationService
+
+logger = logging.getLogger(__name__)
+
+RULES_CHANNEL = "screening_rules_changed"
+
+# (id, kind, pattern, action)
+RuleRow = Tuple[uuid.UUID, str, str, str]
+
+# Constructs that change meaning, or stop compiling, once a pattern is one branch of
+# a combined alternation: global inline flags, named groups and backreferences
+_UNSHAREABLE = re.compile(r"\(\?[aiLmsux]+\)|\(\?P?<(?![=!])|\(\?P=|(?<!\\)(?:\\\\)*\\[1-9]")
+
+def regex_error(pattern: str) -> Optional[str]:
+    """Why `pattern` cannot be a screening rule, or None if it can."""
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        return str(e)
+    if _UNSHAREABLE.search(pattern):
+        return "inline global flags, named groups and backreferences are not supported"
+    try:
+        re.compile(f"(?P<r0>{pattern})|(?P<r1>x)", re.IGNORECASE)
+    except re.error as e:
+        return str(e)
+    return None
+
+class RuleSet:
+    """
+    Compiled screening rules. Terms share one Aho-Corasick automaton, so a scan is
+    a single pass over the text whatever the size of the blocklist; regexes are
+    joined into one alternation per action. Immutable; reloads build a new one.
+
+    A rule that cannot be compiled is logged and skipped rather than failing the
+    whole set, so one bad row never stops screening.
+    """
+    def __init__(self, rules: Sequence[RuleRow]):
+        self.terms = [rule for rule in rules if rule[1] == "term"]
+        folded = [rule[2].casefold() for rule in self.terms]
+        self.automaton = AhoCorasick(folded)
+        self._term_lengths = [len(term) for term in folded]
+        self.skipped = 0
+        self.regexes: List[Tuple[re.Pattern, List[RuleRow]]] = []
+        for action in ("hide", "flag"):
+            patterns = []
+            for rule in rules:
+                if rule[1] == "regex" and rule[3] == action:
+                    error = regex_error(rule[2])
+                    if error is None:
+                        patterns.append(rule)
+                    else:
+                        self.skipped += 1
+                        logger.warning("Skipping screening rule %s %r: %s", rule[0], rule[2], error)
+            if patterns:
+                # One alternation per action, so a flag rule matching first cannot mask a hide rule
+                self.regexes.extend(self._compile(patterns))
+
+    @staticmethod
+    def _compile(patterns: List[RuleRow]) -> List[Tuple[re.Pattern, List[RuleRow]]]:
+        combined = "|".join(f"(?P<r{i}>{rule[2]})" for i, rule in enumerate(patterns))
+        try:
+            return [(re.compile(combined, re.IGNORECASE), patterns)]
+        except re.error:
+            # Each pattern compiled alone already; one pass per rule beats no screening
+            logger.exception("Combined screening regex failed to compile, scanning rules one by one")
+            return [(re.compile(f"(?P<r0>{rule[2]})", re.IGNORECASE), [rule]) for rule in patterns]
+
+    def __len__(self) -> int:
+        return len(self.terms) + sum(len(patterns) for _, patterns in self.regexes)
+
+    def scan(self, content: str) -> List[RuleRow]:
+        """Rules matching `content`; terms only match whole words."""
+        matched: Dict[uuid.UUID, RuleRow] = {}
+        folded = content.casefold()
+        for end, index in self.automaton.iter(folded):
+            start = end - self._term_lengths[index]
+            if (start == 0 or not folded[start - 1].isalnum()) and (end == len(folded) or not folded[end].isalnum()):
+                rule = self.terms[index]
+                matched[rule[0]] = rule
+        for regex, patterns in self.regexes:
+            for match in regex.finditer(content):
+                rule = patterns[int(match.lastgroup[1:])]
+                matched[rule[0]] = rule
+        return list(matched.values())
+
+def validate_regex(pattern: str):
+    error = regex_error(pattern)
+    if error is not None:
+        raise HTTPException(status_code=422, detail=f"Invalid regex {pattern!r}: {error}")
+
+class ContentScreener:
+    """
+    Screens listing text after publish/update on SCREENING_WORKERS background tasks
+    fed by a bounded queue; when the queue is full the caller screens inline instead,
+    so a burst slows publishing down rather than skipping screening. Scans run on a
+    thread pool to keep long texts and large rule sets off the event loop.
+
+    Matches are recorded through ModerationService: "hide" rules hide the listing,
+    "flag" rules log it for review, as do near-duplicates of other live listings
+    (duplicate_service). The rule set is rebuilt when any worker changes the rules
+    (pg_notify), and checked every SCREENING_RULES_REFRESH_SECONDS.
+    """
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rules = RuleSet([])
+        self._version: Optional[Tuple[Any, ...]] = None
+        self._stale = True
+        self._reload_lock: asyncio.Lock | None = None
+        self._queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="screening")
+        return self._executor
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        return self._queue
+
+    def mark_stale(self, payload: str = ""):
+        self._stale = True
+
+    async def reload(self, force: bool = False):
+        """Rebuild the rule set if the rules changed since the last build (or always with force)."""
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            async with SessionLocal() as db:
+                version = tuple((await db.execute(
+                    text("SELECT COUNT(*), MAX(created_at) FROM screening_rules")
+                )).one())
+                if not force and not self._stale and version == self._version:
+                    return
+                self._stale = False
+                result = await db.execute(select(
+                    ScreeningRule.id, ScreeningRule.kind, ScreeningRule.pattern, ScreeningRule.action
+                ))
+                rows = [tuple(row) for row in result]
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            self.rules = await loop.run_in_executor(self._get_executor(), RuleSet, rows)
+            self._version = version
+            metrics.set_gauge("screening.rules", len(self.rules))
+            metrics.set_gauge("screening.rules_skipped", self.rules.skipped)
+            metrics.observe("screening.rules_build_seconds", time.perf_counter() - start)
+
+    async def screen(self, listing_id: uuid.UUID) -> Optional[str]:
+        """Screen one listing now (rules, then near-duplicates); returns "hide", "flag" or None."""
+        if self._stale:
+            try:
+                await self.reload()
+            except Exception:
+                # Screen with the rules we have; the periodic refresh retries the reload
+                metrics.inc("screening.reload_failures")
+                logger.exception("Reloading screening rules failed")
+        start = time.perf_counter()
+        async with SessionLocal() as db:
+            row = (await db.execute(
+                text("SELECT title, description, status FROM listings WHERE id = :id AND status <> 'hidden'"),
+                {"id": listing_id},
+            )).first()
+            if row is None:
+                return None
+            loop = asyncio.get_running_loop()
+            rules = self.rules
+            matched = await loop.run_in_executor(self._get_executor(), rules.scan, f"{row.title}\n{row.description}")
+            metrics.observe("screening.scan_seconds", time.perf_counter() - start)
+            action = None
+            service = ModerationService(db, None)
+            if matched:
+                action = "hide" if any(rule[3] == "hide" for rule in matched) else "flag"
+                reason = "screening: " + ", ".join(sorted(rule[2] for rule in matched))
+                if action == "hide":
+                    await service.hide_listings(listing_ids=[listing_id], reason=reason)
+                else:
+                    await service.flag_listing(listing_id, reason)
+                metrics.inc(f"screening.{action}")
+
+            # Hidden listings still go through the check, to leave the duplicate index
+            live = row.status == "live" and action != "hide"
+            duplicates = await duplicate_detector.check(
+                db, listing_id, row.title, row.description, live, self._get_executor()
+            )
+            if duplicates and action != "hide":
+                await service.flag_listing(listing_id, f"duplicate of {duplicates[0][0]}")
+                metrics.inc("duplicates.flagged")
+                action = "flag"
+        return action
+
+    async def submit(self, listing_id: uuid.UUID):
+        if not settings.SCREENING_ENABLED:
+            return
+        queue = self._get_queue()
+        if queue.full():
+            metrics.inc("screening.inline")
+            try:
+                await self.screen(listing_id)
+            except Exception:
+                # Screening never fails the publish or update that triggered it
+                metrics.inc("screening.failures")
+                logger.exception("Screening listing %s failed", listing_id)
+            return
+        queue.put_nowait(listing_id)
+        metrics.set_gauge("screening.queue_depth", queue.qsize())
+
+    async def drain(self):
+        """Screen everything still queued, in the caller's task."""
+        queue = self._get_queue()
+        while not queue.empty():
+            listing_id = queue.get_nowait()
+            try:
+                await self.screen(listing_id)
+            finally:
+                queue.task_done()
+
+    def clear(self):
+        """Forget queued listings and the compiled rules (they are reloaded on next use)."""
+        self._queue = None
+        self.rules = RuleSet([])
+        self._version = None
+        self._stale = True
+
+    async def _run(self):
+        queue = self._get_queue()
+        while True:
+            listing_id = await queue.get()
+            try:
+                await self.screen(listing_id)
+            except Exception:
+                metrics.inc("screening.failures")
+                logger.exception("Screening listing %s failed", listing_id)
+            finally:
+                queue.task_done()
+                metrics.set_gauge("screening.queue_depth", queue.qsize())
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        try:
+            await self.drain()
+        except Exception:
+            logger.exception("Dropping %d queued screenings on shutdown", self._get_queue().qsize())
+        self._queue = None
+        self._reload_lock = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+content_screener = ContentScreener(workers=settings.SCREENING_WORKERS, max_queue=settings.SCREENING_QUEUE_MAX)
+pg_listener.subscribe(RULES_CHANNEL, content_screener.mark_stale)
+register_periodic_task("screening_rules_refresh", settings.SCREENING_RULES_REFRESH_SECONDS, content_screener.reload)
+
+# --- Rule management ---
+
+async def list_rules(db: AsyncSession) -> List[ScreeningRule]:
+    result = await db.execute(select(ScreeningRule).order_by(ScreeningRule.created_at, ScreeningRule.pattern))
+    return list(result.scalars())
+
+async def add_rules(db: AsyncSession, rules: List[ScreeningRuleCreate]) -> int:
+    """Insert rules (existing kind/pattern pairs are skipped) and tell every worker to reload."""
+    for rule in rules:
+        if rule.kind == "regex":
+            validate_regex(rule.pattern)
+    if not rules:
+        return 0
+    result = await db.execute(text("""
+        INSERT INTO screening_rules (id, kind, pattern, action)
+        SELECT gen_random_uuid(), kind, pattern, action
+        FROM unnest(CAST(:kinds AS text[]), CAST(:patterns AS text[]), CAST(:actions AS text[])) AS r(kind, pattern, action)
+        ON CONFLICT (kind, pattern) DO NOTHING
+    """), {
+        "kinds": [rule.kind for rule in rules],
+        "patterns": [rule.pattern for rule in rules],
+        "actions": [rule.action for rule in rules],
+    })
+    await notify(db, RULES_CHANNEL, "")
+    await db.commit()
+    content_screener.mark_stale()
+    return result.rowcount
+
+async def delete_rule(db: AsyncSession, rule_id: uuid.UUID):
+    result = await db.execute(text("DELETE FROM screening_rules WHERE id = :id"), {"id": rule_id})
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    await notify(db, RULES_CHANNEL, "")
+    await db.commit()
+    content_screener.mark_stale()
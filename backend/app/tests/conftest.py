@@ -7,6 +7,13 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from app.core.database import Base, get_db
 from app.core.config import settings
 from app.main import app
+from app.core.rate_limit import rate_limiter
+from app.services.event_service import view_deduplicator
+from app.services.admin_metrics_service import metrics_cache
+from app.services.retention_service import retention_cache
+from app.services.screening_service import content_screener
+from app.services.duplicate_service import cluster_cache, duplicate_detector
+from app.core.chat_broker import chat_broker
 # Import models to register with Base
 from app.models.user import User
 from app.models.listing import Listing
@@ -51,6 +58,14 @@ async def client(db) -> AsyncGenerator[AsyncClient, None]:
         yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    rate_limiter.reset()
+    view_deduplicator.clear()
+    metrics_cache.clear()
+    retention_cache.clear()
+    content_screener.clear()
+    duplicate_detector.clear()
+    cluster_cache.clear()
+    chat_broker.clear()
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
         yield c
     app.dependency_overrides.clear()
@@ -0,0 +1,434 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import settings
+from app.core.result_cache import ResultCache
+from app.models.user import User
+from app.services import admin_metrics_service, duplicate_service, export_service, retention_service, screening_service
+
+@pytest_asyncio.fixture
+async def admin_headers(client: AsyncClient, db):
+    resp = await client.post("/api/v1/auth/signup", json={"email": "admin@example.com", "password": "pw"})
+    await db.execute(update(User).where(User.email == "admin@example.com").values(role="admin"))
+    await db.commit()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+@pytest.mark.asyncio
+async def test_export_events_streams_ndjson_and_csv(client: AsyncClient, admin_headers, db_engine, monkeypatch):
+    monkeypatch.setattr(export_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(export_service.settings, "EXPORT_CHUNK_ROWS", 7)
+    events = [{"event_type": "search", "metadata": {"n": i}} for i in range(20)]
+    await client.post("/api/v1/events/bulk", json=events)
+
+    resp = await client.get("/api/v1/admin/export/events", params={"start": "2000-01-01T00:00:00"}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/gzip"
+    assert resp.headers["content-disposition"].endswith('.ndjson.gz"')
+    rows = [json.loads(line) for line in gzip.decompress(resp.content).splitlines()]
+    assert sorted(r["metadata"]["n"] for r in rows) == list(range(20))
+
+    resp = await client.get(
+        "/api/v1/admin/export/events",
+        params={"start": "2000-01-01T00:00:00", "format": "csv", "compress": "false"},
+        headers=admin_headers,
+    )
+    reader = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(reader) == 20
+    assert reader[0]["event_type"] == "search"
+
+    resp = await client.get(
+        "/api/v1/admin/export/events",
+        params={"start": "2030-01-01T00:00:00", "end": "2020-01-01T00:00:00"},
+        headers=admin_headers,
+    )
+    assert resp.status_code == 400
+
+@pytest.mark.asyncio
+async def test_export_requires_admin(client: AsyncClient):
+    resp = await client.post("/api/v1/auth/signup", json={"email": "user@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    resp = await client.get("/api/v1/admin/export/listings", params={"start": "2000-01-01T00:00:00"}, headers=headers)
+    assert resp.status_code == 403
+
+@pytest.mark.asyncio
+async def test_metrics_served_from_materialized_views(client: AsyncClient, admin_headers, db_engine, monkeypatch):
+    monkeypatch.setattr(admin_metrics_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    await client.post("/api/v1/auth/signup", json={"email": "a@example.com", "password": "pw", "region": "North", "city": "Oslo"})
+
+    # Views were built before the signup; live=true bypasses them
+    resp = await client.get("/api/v1/admin/metrics/users-by-region", params={"region": "North"}, headers=admin_headers)
+    assert resp.json() == []
+    resp = await client.get("/api/v1/admin/metrics/users-by-region", params={"region": "North", "live": "true"}, headers=admin_headers)
+    assert resp.json() == [{"region": "North", "city": "Oslo", "user_count": 1, "new_users": 1}]
+
+    assert len(await admin_metrics_service.refresh_metric_views()) == 3
+    # Refreshed moments ago by "another worker", so this run skips all views
+    assert await admin_metrics_service.refresh_metric_views() == []
+
+    resp = await client.get("/api/v1/admin/metrics/users-by-region", params={"region": "North"}, headers=admin_headers)
+    assert resp.json() == [{"region": "North", "city": "Oslo", "user_count": 1, "new_users": 1}]
+    assert "X-Metrics-Refreshed-At" in resp.headers
+    for path in ("listings-by-region", "listings-by-category", "activity", "supply-demand"):
+        resp = await client.get(f"/api/v1/admin/metrics/{path}", headers=admin_headers)
+        assert resp.status_code == 200
+
+@pytest.mark.asyncio
+async def test_result_cache_single_flight_and_stale_while_revalidate():
+    cache = ResultCache("test_cache", ttl_seconds=60, stale_seconds=60, max_entries=2)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        call = len(calls)
+        await asyncio.sleep(0.01)
+        return call
+
+    assert await asyncio.gather(*(cache.get("k", compute) for _ in range(5))) == [1] * 5
+    assert len(calls) == 1
+
+    # Stale: the old value is served at once and one refresh runs in the background
+    cache.ttl_seconds = 0
+    assert await asyncio.gather(cache.get("k", compute), cache.get("k", compute)) == [1, 1]
+    await asyncio.sleep(0.05)
+    assert len(calls) == 2
+    cache.ttl_seconds = 60
+    assert await cache.get("k", compute) == 2
+
+    await cache.get("a", compute)
+    await cache.get("b", compute)
+    assert len(cache) == 2
+
+    # A computation that started before clear() serves its waiters but is not stored,
+    # and callers after the clear start a fresh one
+    before = asyncio.create_task(cache.get("c", compute))
+    await asyncio.sleep(0)
+    cache.clear()
+    after = await cache.get("c", compute)
+    assert await before == after - 1
+    assert await cache.get("c", compute) == after
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_caches_view_results(client: AsyncClient, admin_headers, db_engine, monkeypatch):
+    monkeypatch.setattr(admin_metrics_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    params = {"days": 7, "region": "South"}
+    first = await client.get("/api/v1/admin/metrics/activity", params=params, headers=admin_headers)
+    assert first.status_code == 200
+    assert len(admin_metrics_service.metrics_cache) == 1
+    second = await client.get("/api/v1/admin/metrics/activity", params=params, headers=admin_headers)
+    assert second.headers["X-Metrics-Refreshed-At"] == first.headers["X-Metrics-Refreshed-At"]
+    await client.get("/api/v1/admin/metrics/activity", params={"days": 7, "region": "South", "live": "true"}, headers=admin_headers)
+    assert len(admin_metrics_service.metrics_cache) == 1
+
+@pytest.mark.asyncio
+async def test_dashboard_runs_metrics_concurrently_with_partial_results(
+    client: AsyncClient, admin_headers, db_engine, monkeypatch
+):
+    monkeypatch.setattr(admin_metrics_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    resp = await client.get("/api/v1/admin/metrics/dashboard", params={"live": "true"}, headers=admin_headers)
+    body = resp.json()
+    assert set(body["metrics"]) == set(admin_metrics_service.DASHBOARD_METRICS)
+    assert body["errors"] == {}
+    assert body["metrics"]["users_by_region"][0]["user_count"] == 1
+
+    async def slow_activity(self, days, region=None, city=None):
+        await self.db.execute(text("SELECT pg_sleep(2)"))
+
+    monkeypatch.setattr(admin_metrics_service.AdminMetricsService, "get_activity", slow_activity)
+    monkeypatch.setattr(admin_metrics_service.settings, "METRICS_QUERY_TIMEOUT_MS", 200)
+    resp = await client.get("/api/v1/admin/metrics/dashboard", params={"live": "true"}, headers=admin_headers)
+    body = resp.json()
+    assert body["errors"] == {"activity": "timeout"}
+    assert body["metrics"]["activity"] is None
+    assert body["metrics"]["users_by_region"] is not None
+
+@pytest.mark.asyncio
+async def test_metric_series_gap_fill_and_week_over_week(client: AsyncClient, admin_headers, db, db_engine, monkeypatch):
+    monkeypatch.setattr(admin_metrics_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    for email, region, age in (("n1@example.com", "North", 0), ("n2@example.com", "North", 7), ("s@example.com", "South", 3)):
+        await client.post("/api/v1/auth/signup", json={"email": email, "password": "pw", "region": region})
+        await db.execute(text("UPDATE users SET created_at = NOW() - make_interval(days => :age) WHERE email = :email"),
+                         {"age": age, "email": email})
+    await db.commit()
+
+    params = {"days": 14, "group_by": "region", "live": "true"}
+    body = (await client.get("/api/v1/admin/metrics/series/users", params=params, headers=admin_headers)).json()
+    assert len(body["buckets"]) == 14 and body["buckets"][-1].endswith("T00:00:00Z")
+    assert [s["key"] for s in body["series"]] == ["all", "North", "South", "Unknown"]
+    total, north = body["series"][0], body["series"][1]
+    assert total["total"] == 4 and total["values"][-1] == 2 and total["values"][10] == 1
+    assert north["values"] == [0] * 6 + [1] + [0] * 6 + [1]
+    assert north["moving_average"][-1] == round(1 / 7, 3)
+    assert north["wow_change"][-1] == 0 and north["wow_change_ratio"][-1] == 0
+    assert north["wow_change_ratio"][-2] is None
+    # Beyond the group cap, the smaller groups are summed into one series
+    monkeypatch.setattr(settings, "METRICS_SERIES_MAX_GROUPS", 1)
+    body = (await client.get("/api/v1/admin/metrics/series/users", params=params, headers=admin_headers)).json()
+    assert [(s["key"], s["total"]) for s in body["series"]] == [("all", 4), ("North", 2), ("Other", 2)]
+
+    # Daily series come from the materialized views once refreshed; hourly ones from the tables
+    await admin_metrics_service.refresh_metric_views()
+    params = {"days": 14, "region": "North"}
+    body = (await client.get("/api/v1/admin/metrics/series/users", params=params, headers=admin_headers)).json()
+    assert body["series"][0]["values"] == north["values"]
+    body = (await client.get("/api/v1/admin/metrics/series/listings", params={"days": 2, "interval": "hour"}, headers=admin_headers)).json()
+    assert len(body["buckets"]) == 48 and body["series"][0]["total"] == 0
+    resp = await client.get("/api/v1/admin/metrics/series/events", params={"days": 400}, headers=admin_headers)
+    assert resp.status_code == 422
+    resp = await client.get("/api/v1/admin/metrics/series/events", params={"days": 32, "interval": "hour"}, headers=admin_headers)
+    assert resp.status_code == 422
+
+@pytest.mark.asyncio
+async def test_active_users_from_sketches(client: AsyncClient, admin_headers):
+    two_days_ago = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
+    for i, region in enumerate(("North", "North", "South")):
+        resp = await client.post("/api/v1/auth/signup", json={"email": f"u{i}@example.com", "password": "pw", "region": region})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+        events = [{"event_type": "search"}] * 3
+        if i == 0:
+            events.append({"event_type": "search", "occurred_at": two_days_ago})
+        await client.post("/api/v1/events/bulk", json=events, headers=headers)
+    # The same user again only re-merges registers that are already set
+    await client.post("/api/v1/events/bulk", json=[{"event_type": "search"}], headers=headers)
+    # Events dropped by the insert (unknown listing) don't make their user active
+    resp = await client.post("/api/v1/auth/signup", json={"email": "ghost@example.com", "password": "pw", "region": "West"})
+    ghost = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    resp = await client.post("/api/v1/events/bulk", json=[{"event_type": "view_listing", "listing_id": str(uuid.uuid4())}], headers=ghost)
+    assert resp.json()["dropped"] == 1
+
+    dau = (await client.get("/api/v1/admin/metrics/dau", headers=admin_headers)).json()
+    assert dau["active_users"] == 3 and dau["window_days"] == 1
+    assert dau["regions"] == [{"region": "North", "active_users": 2}, {"region": "South", "active_users": 1}]
+    assert 0 < dau["relative_error"] < 0.01
+    resp = await client.get("/api/v1/admin/metrics/dau", params={"day": two_days_ago[:10]}, headers=admin_headers)
+    assert resp.json()["active_users"] == 1
+    wau = (await client.get("/api/v1/admin/metrics/wau", params={"region": "North"}, headers=admin_headers)).json()
+    assert wau["active_users"] == 2
+    mau = (await client.get("/api/v1/admin/metrics/mau", headers=admin_headers)).json()
+    assert mau["active_users"] == 3
+
+@pytest.mark.asyncio
+async def test_weekly_cohort_retention(client: AsyncClient, admin_headers, db, db_engine, monkeypatch):
+    monkeypatch.setattr(retention_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(retention_service.settings, "RETENTION_CHUNK_ROWS", 2)
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=today.weekday(), weeks=3)
+    # Signup day and active days, as offsets from the first cohort's Monday
+    users = {"a@example.com": (1, [1, 8, 9, 16]), "b@example.com": (2, [2]), "c@example.com": (8, [15, 20])}
+    for email, (signup, active_days) in users.items():
+        await client.post("/api/v1/auth/signup", json={"email": email, "password": "pw"})
+        at = {"ts": datetime(start.year, start.month, start.day, 12, tzinfo=timezone.utc) + timedelta(days=signup)}
+        await db.execute(text("UPDATE users SET created_at = :ts WHERE email = :email"), {**at, "email": email})
+        for day in active_days:
+            await db.execute(text("""
+                INSERT INTO events (id, user_id, event_type, metadata, created_at)
+                SELECT gen_random_uuid(), id, 'search', '{}', :ts FROM users WHERE email = :email
+            """), {"ts": at["ts"] + timedelta(days=day - signup), "email": email})
+    await db.commit()
+
+    body = (await client.get("/api/v1/admin/metrics/retention", params={"weeks": 3}, headers=admin_headers)).json()
+    assert body["start"] == start.isoformat()
+    assert [(c["users"], c["retained"]) for c in body["cohorts"]] == [(2, [2, 1, 1]), (1, [0, 1]), (0, [0])]
+    assert body["cohorts"][0]["retention"] == [1.0, 0.5, 0.5]
+
+    # Served from the cache until it expires
+    again = (await client.get("/api/v1/admin/metrics/retention", params={"weeks": 3}, headers=admin_headers)).json()
+    assert again["generated_at"] == body["generated_at"]
+    resp = await client.get("/api/v1/admin/metrics/retention", params={"weeks": 60}, headers=admin_headers)
+    assert resp.status_code == 422
+
+@pytest.mark.asyncio
+async def test_bulk_moderation(client: AsyncClient, admin_headers, db, monkeypatch):
+    async def seller(email, listings):
+        resp = await client.post("/api/v1/auth/signup", json={"email": email, "password": "pw"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+        ids = []
+        for publish in listings:
+            listing = {"title": "Spam", "description": "", "category": "Women", "condition": "good", "price": 1.0}
+            ids.append((await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"])
+            if publish:
+                await client.post(f"/api/v1/listings/{ids[-1]}/publish", headers=headers)
+        return headers, ids
+
+    spam_headers, spam_ids = await seller("spam@example.com", [True, True, False])
+    _, other_ids = await seller("other@example.com", [True, True])
+    spam_id = (await db.execute(text("SELECT id FROM users WHERE email = 'spam@example.com'"))).scalar()
+    other_id = (await db.execute(text("SELECT id FROM users WHERE email = 'other@example.com'"))).scalar()
+
+    url = "/api/v1/admin/moderation/bulk"
+    resp = await client.post(f"{url}/hide-listings", json={"seller_id": str(spam_id), "status": "live", "reason": "spam"}, headers=admin_headers)
+    assert resp.json()["hidden"] == 2 and set(resp.json()["listing_ids"]) == set(spam_ids[:2])
+    # Already hidden listings are skipped
+    resp = await client.post(f"{url}/hide-listings", json={"listing_ids": spam_ids + other_ids[:1]}, headers=admin_headers)
+    assert resp.json()["hidden"] == 2
+    assert (await client.post(f"{url}/hide-listings", json={"reason": "x"}, headers=admin_headers)).status_code == 400
+
+    resp = await client.post(f"{url}/ban-users", json={"user_ids": [str(spam_id), str(other_id)], "hide_listings": True}, headers=admin_headers)
+    assert resp.json()["banned"] == 2 and resp.json()["listings_hidden"] == 1
+    assert await db.scalar(text("SELECT COUNT(*) FROM refresh_tokens WHERE user_id = ANY(:ids)"), {"ids": [spam_id, other_id]}) == 0
+    assert await db.scalar(text("SELECT COUNT(*) FROM listings WHERE status <> 'hidden'")) == 0
+    listing = {"title": "Again", "description": "", "category": "Women", "condition": "good", "price": 1.0}
+    assert (await client.post("/api/v1/listings/", json=listing, headers=spam_headers)).status_code == 403
+    resp = await client.post(f"{url}/ban-users", json={"user_ids": [str(spam_id)]}, headers=admin_headers)
+    assert resp.json()["banned"] == 0
+
+    resp = await client.post(f"{url}/unban-users", json={"user_ids": [str(other_id)], "reason": "appeal"}, headers=admin_headers)
+    assert resp.json()["unbanned"] == 1
+    actions = dict((await db.execute(text("SELECT action, COUNT(*) FROM moderation_actions GROUP BY action"))).all())
+    assert actions == {"hide_listing": 5, "ban_user": 2, "unban_user": 1}
+
+    monkeypatch.setattr(settings, "MODERATION_BULK_MAX_TARGETS", 1)
+    resp = await client.post(f"{url}/unban-users", json={"user_ids": [str(spam_id), str(other_id)]}, headers=admin_headers)
+    assert resp.status_code == 413
+
+@pytest.mark.asyncio
+async def test_moderation_audit_log_pages_and_target_history(client: AsyncClient, admin_headers, db):
+    user_ids, listing_id = [], None
+    for i in range(5):
+        resp = await client.post("/api/v1/auth/signup", json={"email": f"user{i}@example.com", "password": "pw"})
+        user_ids.append(str(await db.scalar(text("SELECT id FROM users WHERE email = :e"), {"e": f"user{i}@example.com"})))
+        if i == 0:
+            headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+            listing = {"title": "Bike", "description": "", "category": "Sports", "condition": "good", "price": 80.0}
+            listing_id = (await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"]
+    admin_id = str(await db.scalar(text("SELECT id FROM users WHERE email = 'admin@example.com'")))
+
+    url = "/api/v1/admin/moderation"
+    await client.post(f"{url}/hide-listing", json={"listing_id": listing_id, "reason": "stolen"}, headers=admin_headers)
+    # One transaction: five rows with the same created_at, ordered by id within it
+    await client.post(f"{url}/bulk/ban-users", json={"user_ids": user_ids, "reason": "ring"}, headers=admin_headers)
+    await client.post(f"{url}/unban-user", json={"user_id": user_ids[0], "reason": "appeal"}, headers=admin_headers)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get(f"{url}/actions", params=params, headers=admin_headers)).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    expected = (await db.execute(text("SELECT id::text FROM moderation_actions ORDER BY created_at DESC, id DESC"))).scalars().all()
+    assert seen == expected and len(seen) == 7
+
+    page = (await client.get(f"{url}/actions", params={"action": "ban_user", "admin_id": admin_id, "limit": 10}, headers=admin_headers)).json()
+    assert len(page["items"]) == 5 and page["next_cursor"] is None
+    assert {item["admin_email"] for item in page["items"]} == {"admin@example.com"}
+    page = (await client.get(f"{url}/actions", params={"target_type": "user", "target_id": user_ids[0]}, headers=admin_headers)).json()
+    assert [item["action"] for item in page["items"]] == ["unban_user", "ban_user"]
+    assert (await client.get(f"{url}/actions", params={"target_id": user_ids[0]}, headers=admin_headers)).status_code == 400
+    assert (await client.get(f"{url}/actions", params={"cursor": "bogus"}, headers=admin_headers)).status_code == 400
+
+    history = (await client.get(f"{url}/targets/user/{user_ids[0]}", params={"limit": 1}, headers=admin_headers)).json()
+    assert history["target"]["email"] == "user0@example.com" and history["target"]["is_banned"] is False
+    assert [item["reason"] for item in history["items"]] == ["appeal"]
+    history = (await client.get(f"{url}/targets/user/{user_ids[0]}", params={"cursor": history["next_cursor"]}, headers=admin_headers)).json()
+    assert [item["reason"] for item in history["items"]] == ["ring"] and history["next_cursor"] is None
+
+    history = (await client.get(f"{url}/targets/listing/{listing_id}", headers=admin_headers)).json()
+    assert history["target"]["title"] == "Bike" and history["target"]["status"] == "hidden"
+    assert history["target"]["seller_email"] == "user0@example.com"
+    assert [item["reason"] for item in history["items"]] == ["stolen"]
+    history = (await client.get(f"{url}/targets/user/{admin_id}", headers=admin_headers)).json()
+    assert history["target"]["role"] == "admin" and history["items"] == []
+    assert (await client.get(f"{url}/targets/listing/{user_ids[0]}", headers=admin_headers)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_content_screening_flags_hides_and_reloads(client: AsyncClient, admin_headers, db, db_engine, monkeypatch):
+    monkeypatch.setattr(screening_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    screener = screening_service.content_screener
+    rules = [
+        {"pattern": "Counterfeit", "action": "hide"},
+        {"pattern": "replica"},
+        {"kind": "regex", "pattern": r"\b\d{3}-\d{3}-\d{4}\b"},
+    ]
+    resp = await client.post("/api/v1/admin/screening/rules", json={"rules": rules}, headers=admin_headers)
+    assert resp.json() == {"added": 3}
+    resp = await client.post("/api/v1/admin/screening/rules", json={"rules": rules[:1]}, headers=admin_headers)
+    assert resp.json() == {"added": 0}
+    for pattern in ["([", "(?i)replica", r"(\d)\1"]:
+        resp = await client.post("/api/v1/admin/screening/rules", json={"rules": [{"kind": "regex", "pattern": pattern}]}, headers=admin_headers)
+        assert resp.status_code == 422
+    # A rule that slipped past validation is skipped, not fatal to the whole set
+    await db.execute(text("INSERT INTO screening_rules (id, kind, pattern, action) VALUES (gen_random_uuid(), 'regex', '(?P<x>a)', 'flag')"))
+    await db.commit()
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "seller@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    listing = {"title": "Coat", "description": "Replicas welcome, call 555-123-4567", "category": "Women", "condition": "good", "price": 5.0}
+    listing_id = (await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"]
+    # Terms match whole words only, so just the phone number regex hits
+    await client.post(f"/api/v1/listings/{listing_id}/publish", headers=headers)
+    await client.post(f"/api/v1/listings/{listing_id}/publish", headers=headers)
+    await screener.drain()
+    flags = (await db.execute(text("SELECT admin_id, reason FROM moderation_actions WHERE action = 'flag_listing'"))).all()
+    assert flags == [(None, r"screening: \b\d{3}-\d{3}-\d{4}\b")]
+
+    await client.put(f"/api/v1/listings/{listing_id}", json={"title": "COUNTERFEIT bag"}, headers=headers)
+    await screener.drain()
+    assert await db.scalar(text("SELECT status FROM listings WHERE id = :id"), {"id": listing_id}) == "hidden"
+
+    # Deleting the rule takes effect on the next screening, without a restart
+    rule_id = next(r["id"] for r in (await client.get("/api/v1/admin/screening/rules", headers=admin_headers)).json()
+                   if r["pattern"] == "Counterfeit")
+    await client.delete(f"/api/v1/admin/screening/rules/{rule_id}", headers=admin_headers)
+    listing["description"] = "Counterfeit-free"
+    other_id = (await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"]
+    await client.post(f"/api/v1/listings/{other_id}/publish", headers=headers)
+    await screener.drain()
+    assert await db.scalar(text("SELECT status FROM listings WHERE id = :id"), {"id": other_id}) == "live"
+    assert len(screener.rules) == 2
+
+@pytest.mark.asyncio
+async def test_near_duplicate_listings_are_flagged_and_clustered(client: AsyncClient, admin_headers, db, db_engine, monkeypatch):
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    monkeypatch.setattr(screening_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(duplicate_service, "SessionLocal", session_factory)
+    screener = screening_service.content_screener
+    detector = duplicate_service.duplicate_detector
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "spam@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    texts = [
+        ("Nike Air Max 90, size 42", "Barely worn, original box included. Pickup in Berlin or shipping."),
+        ("NIKE air max 90 - size 42!!", "barely worn - original box included; pick-up in Berlin or shipping"),
+        ("Nike Air Max 90 size 42", "Barely worn, original box included. Pickup in Berlin or shipping!"),
+        ("Vintage leather jacket", "Brown, medium, some wear on the sleeves."),
+    ]
+    ids = []
+    for title, description in texts:
+        listing = {"title": title, "description": description, "category": "Men", "condition": "good", "price": 50.0}
+        ids.append((await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"])
+        await client.post(f"/api/v1/listings/{ids[-1]}/publish", headers=headers)
+        await screener.drain()
+    assert len(detector.index) == 4
+
+    flags = (await db.execute(text(
+        "SELECT target_id::text, reason FROM moderation_actions WHERE action = 'flag_listing' ORDER BY created_at"
+    ))).all()
+    assert [target for target, _ in flags] == ids[1:3]
+    assert flags[0][1] == f"duplicate of {ids[0]}"
+
+    # A rebuild from the table gives the same index
+    detector.clear()
+    await detector.rebuild()
+    assert set(map(str, detector.index.signatures)) == set(ids)
+
+    resp = await client.get("/api/v1/admin/moderation/duplicates", headers=admin_headers)
+    body = resp.json()
+    assert body["listings"] == 4
+    assert [[l["id"] for l in cluster["listings"]] for cluster in body["clusters"]] == [ids[:3]]
+    assert body["clusters"][0]["sellers"] == 1
+
+    # Editing a copy into something else takes it out of the running
+    await client.put(f"/api/v1/listings/{ids[1]}", json={"title": "Garden chair", "description": "Teak, seats two"}, headers=headers)
+    await screener.drain()
+    signature = detector.hasher.signature(f"{texts[0][0]}\n{texts[0][1]}")
+    assert {str(match_id) for match_id, _ in detector.index.query(signature, detector.threshold)} == {ids[0], ids[2]}
@@ -67,3 +67,167 @@ async def test_auth_case_insensitive(client: AsyncClient):
     }
     resp = await client.post("/api/v1/auth/signup", json=duplicate_data)
     assert resp.status_code == 400 # Email already registered
+
+@pytest.mark.asyncio
+async def test_password_hash_backpressure(client: AsyncClient, monkeypatch):
+    from app.core import security
+    # Saturated executor rejects new hashing work instead of queueing it
+    monkeypatch.setattr(security.password_executor, "capacity", 0)
+    resp = await client.post("/api/v1/auth/signup", json={"email": "busy@example.com", "password": "pw"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+@pytest.mark.asyncio
+async def test_principal_cache(client: AsyncClient, monkeypatch):
+    from app.core.pg_listener import pg_listener
+    from app.core.principal_cache import principal_cache
+    from app.core.metrics import metrics
+    # Cache is only active while the LISTEN connection is up
+    monkeypatch.setattr(pg_listener, "connected", True)
+    principal_cache.clear()
+    metrics.reset()
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "cache@example.com", "password": "pw", "city": "Berlin"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    assert (await client.get("/api/v1/users/me", headers=headers)).json()["city"] == "Berlin"
+    assert (await client.get("/api/v1/users/me", headers=headers)).json()["city"] == "Berlin"
+    assert metrics.snapshot()["counters"]["principal_cache.hit"] == 1
+
+    # PATCH invalidates, so the next read sees the new value
+    resp = await client.patch("/api/v1/users/me", json={"city": "Paris"}, headers=headers)
+    assert resp.json()["city"] == "Paris"
+    assert (await client.get("/api/v1/users/me", headers=headers)).json()["city"] == "Paris"
+    principal_cache.clear()
+
+@pytest.mark.asyncio
+async def test_claim_tokens_skip_user_lookup(client: AsyncClient, monkeypatch):
+    import time
+    from app.core.config import settings
+    from app.core.metrics import metrics
+    from app.core.revocation import revocation_list
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS_ENABLED", True)
+    monkeypatch.setattr(revocation_list, "_entries", {})
+    monkeypatch.setattr(revocation_list, "loaded_at", time.monotonic())
+    metrics.reset()
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "claims@example.com", "password": "pw"})
+    user_id = resp.json()["user"]["id"]
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.get("/api/v1/conversations/", headers=headers)
+    assert resp.status_code == 200
+    counters = metrics.snapshot()["counters"]
+    assert counters["auth.principal.from_claims"] == 1
+    assert "auth.principal.from_db" not in counters
+
+    # A ban picked up by the revocation list rejects the token without a DB lookup
+    import uuid
+    monkeypatch.setattr(revocation_list, "_entries", {uuid.UUID(user_id): (1, True)})
+    resp = await client.get("/api/v1/conversations/", headers=headers)
+    assert resp.status_code == 403
+
+@pytest.mark.asyncio
+async def test_bans_and_demotions_apply_to_live_tokens(client: AsyncClient, db, monkeypatch):
+    import uuid
+    from sqlalchemy import update
+    from app.core.config import settings
+    from app.core.principal_cache import principal_cache
+    from app.models.user import User
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS_ENABLED", True)
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "demoted@example.com", "password": "pw"})
+    user_id = uuid.UUID(resp.json()["user"]["id"])
+    await db.execute(update(User).where(User.id == user_id).values(role="admin"))
+    await db.commit()
+    # A token minted while admin carries the admin role claim
+    resp = await client.post("/api/v1/auth/login", json={"email": "demoted@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    assert (await client.get("/api/v1/admin/metrics/users-by-region", headers=headers)).status_code == 200
+
+    await db.execute(update(User).where(User.id == user_id).values(role="user"))
+    await db.commit()
+    principal_cache.clear()
+    assert (await client.get("/api/v1/admin/metrics/users-by-region", headers=headers)).status_code == 403
+
+    await db.execute(update(User).where(User.id == user_id).values(is_banned=True))
+    await db.commit()
+    principal_cache.clear()
+    assert (await client.get("/api/v1/users/me", headers=headers)).status_code == 403
+
+@pytest.mark.asyncio
+async def test_refresh_token_maintenance(client: AsyncClient, db, db_engine, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select, func
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.core.config import settings
+    from app.models.refresh_token import RefreshToken
+    from app.services import auth_service
+    monkeypatch.setattr(settings, "MAX_SESSIONS_PER_USER", 2)
+
+    resp = await client.post("/api/v1/auth/signup", json={"email": "cap@example.com", "password": "pw"})
+    user_id = resp.json()["user"]["id"]
+    for _ in range(3):
+        await client.post("/api/v1/auth/login", json={"email": "cap@example.com", "password": "pw"})
+    count = await db.scalar(select(func.count()).select_from(RefreshToken))
+    assert count == 2
+
+    # Expired rows are reaped in batches
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+    for i in range(5):
+        db.add(RefreshToken(user_id=user_id, token_hash=f"old-{i}", expires_at=past))
+    await db.commit()
+    monkeypatch.setattr(auth_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(settings, "REFRESH_TOKEN_REAP_BATCH_SIZE", 2)
+    assert await auth_service.reap_expired_refresh_tokens() == 5
+    count = await db.scalar(select(func.count()).select_from(RefreshToken))
+    assert count == 2
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client: AsyncClient, db, monkeypatch):
+    from passlib.context import CryptContext
+    from sqlalchemy import select
+    from app.core import security
+    from app.models.user import User
+    await client.post("/api/v1/auth/signup", json={"email": "rehash@example.com", "password": "pw"})
+    old_hash = (await db.execute(select(User.password_hash).where(User.email == "rehash@example.com"))).scalar_one()
+
+    stronger = CryptContext(schemes=["argon2"], deprecated="auto", argon2__time_cost=4)
+    monkeypatch.setattr(security, "pwd_context", stronger)
+    assert stronger.needs_update(old_hash)
+
+    resp = await client.post("/api/v1/auth/login", json={"email": "rehash@example.com", "password": "pw"})
+    assert resp.status_code == 200
+    new_hash = (await db.execute(select(User.password_hash).where(User.email == "rehash@example.com"))).scalar_one()
+    assert new_hash != old_hash
+    assert not stronger.needs_update(new_hash)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "postgres"])
+async def test_login_rate_limit(client: AsyncClient, db_engine, monkeypatch, backend):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.core import rate_limit
+    monkeypatch.setattr(rate_limit.rate_limiter, "backend", backend)
+    monkeypatch.setattr(rate_limit, "SessionLocal", async_sessionmaker(db_engine))
+    monkeypatch.setattr(rate_limit, "LOGIN_PER_EMAIL", rate_limit.BucketRule("login_email", 2, 1))
+
+    await client.post("/api/v1/auth/signup", json={"email": "limit@example.com", "password": "pw"})
+    bad_login = {"email": "limit@example.com", "password": "wrong"}
+    assert (await client.post("/api/v1/auth/login", json=bad_login)).status_code == 401
+    assert (await client.post("/api/v1/auth/login", json=bad_login)).status_code == 401
+    resp = await client.post("/api/v1/auth/login", json=bad_login)
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+
+def test_client_ip_trusts_only_proxy_hops(monkeypatch):
+    from starlette.requests import Request
+    from app.core.config import settings
+    from app.core.rate_limit import client_ip
+    request = Request({"type": "http", "client": ("10.0.0.1", 1234),
+                       "headers": [(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4")]})
+    assert client_ip(request) == "10.0.0.1"
+    # Behind one proxy, the spoofed leftmost entry is ignored
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 1)
+    assert client_ip(request) == "1.2.3.4"
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", 2)
+    assert client_ip(request) == "6.6.6.6"
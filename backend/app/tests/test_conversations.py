@@ -1,5 +1,13 @@
+import asyncio
+import json
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.api.routes import conversations
+from app.core.chat_broker import chat_broker
+from app.core.pg_listener import pg_listener
+from app.main import app
 
 @pytest.mark.asyncio
 async def test_conversations_flow(client: AsyncClient):
@@ -78,3 +86,99 @@ async def test_conversations_flow(client: AsyncClient):
     
     fail_resp = await client.get(f"/api/v1/conversations/{conv_id}/messages", headers=rand_headers)
     assert fail_resp.status_code == 403
+
+async def open_socket(token: str):
+    # Drives the ASGI app directly, so the socket shares the test's event loop and database
+    inbox, outbox = asyncio.Queue(), asyncio.Queue()
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "root_path": "",
+        "path": "/api/v1/conversations/ws", "query_string": b"",
+        "headers": [], "subprotocols": [], "server": ("test", 80), "client": ("test", 1234),
+    }
+    await inbox.put({"type": "websocket.connect"})
+    await inbox.put({"type": "websocket.receive", "text": json.dumps({"type": "auth", "token": token})})
+    task = asyncio.create_task(app(scope, inbox.get, outbox.put))
+    return inbox, outbox, task
+
+async def next_frame(socket) -> dict:
+    return await asyncio.wait_for(socket[1].get(), timeout=5)
+
+@pytest.mark.asyncio
+async def test_websocket_pushes_messages_and_read_receipts(client: AsyncClient, db, db_engine, monkeypatch):
+    monkeypatch.setattr(conversations, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(chat_broker, "fanout", "memory")
+    tokens = {}
+    for email in ("seller@test.com", "buyer@test.com"):
+        tokens[email] = (await client.post("/api/v1/auth/signup", json={"email": email, "password": "pass"})).json()["access_token"]
+    seller_headers = {"Authorization": f"Bearer {tokens['seller@test.com']}"}
+    buyer_headers = {"Authorization": f"Bearer {tokens['buyer@test.com']}"}
+    listing = {"title": "Lamp", "category": "Home", "condition": "good", "price": 15}
+    listing_id = (await client.post("/api/v1/listings/", json=listing, headers=seller_headers)).json()["id"]
+    await client.post(f"/api/v1/listings/{listing_id}/publish", headers=seller_headers)
+    conv_id = (await client.post("/api/v1/conversations/", json={"listing_id": listing_id}, headers=buyer_headers)).json()["id"]
+
+    rejected = await open_socket("not-a-token")
+    assert (await next_frame(rejected))["type"] == "websocket.accept"
+    assert (await next_frame(rejected))["code"] == 1008
+    seller = await open_socket(tokens["seller@test.com"])
+    buyer = await open_socket(tokens["buyer@test.com"])
+    assert (await next_frame(seller))["type"] == "websocket.accept"
+    assert (await next_frame(buyer))["type"] == "websocket.accept"
+    # Subscribed once the auth frame is checked
+    for _ in range(100):
+        if chat_broker.connections == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert chat_broker.connections == 2
+
+    resp = await client.post(f"/api/v1/conversations/{conv_id}/messages", json={"body": "Still available?"}, headers=buyer_headers)
+    event = json.loads((await next_frame(seller))["text"])
+    assert event == {"type": "message", **resp.json()}
+    # The sender's own connections get it too
+    assert json.loads((await next_frame(buyer))["text"])["id"] == resp.json()["id"]
+
+    await client.post(f"/api/v1/conversations/{conv_id}/read", headers=seller_headers)
+    receipt = json.loads((await next_frame(buyer))["text"])
+    assert receipt["type"] == "read" and receipt["conversation_id"] == conv_id
+    await next_frame(seller)
+    # Nothing left unread: no receipt
+    await client.post(f"/api/v1/conversations/{conv_id}/read", headers=seller_headers)
+    assert buyer[1].empty()
+
+    # Across workers: events travel as notifications and come back through the listener
+    monkeypatch.setattr(chat_broker, "fanout", "postgres")
+    await pg_listener.start()
+    try:
+        for _ in range(100):
+            if pg_listener.connected:
+                break
+            await asyncio.sleep(0.05)
+        await client.post(f"/api/v1/conversations/{conv_id}/messages", json={"body": "é" * 2000}, headers=seller_headers)
+        event = json.loads((await next_frame(buyer))["text"])
+        assert event["truncated"] is True and event["body"] is None
+        await next_frame(seller)
+    finally:
+        await pg_listener.stop()
+    # Notifications missed while the listener is down are lost: sockets close so clients
+    # reconnect and catch up, and new ones are refused until it is back
+    for socket in (seller, buyer):
+        assert (await next_frame(socket))["code"] == 1013
+        await asyncio.wait_for(socket[2], timeout=5)
+    refused = await open_socket(tokens["seller@test.com"])
+    await next_frame(refused)
+    assert (await next_frame(refused))["code"] == 1013
+
+    # A ban closes the user's open sockets
+    monkeypatch.setattr(chat_broker, "fanout", "memory")
+    seller = await open_socket(tokens["seller@test.com"])
+    await next_frame(seller)
+    while chat_broker.connections == 0:
+        await asyncio.sleep(0.01)
+    seller_id = (await client.get("/api/v1/users/me", headers=seller_headers)).json()["id"]
+    await db.execute(text("UPDATE users SET is_banned = true WHERE id = :id"), {"id": seller_id})
+    await db.commit()
+    chat_broker.on_invalidate(seller_id)
+    assert (await next_frame(seller))["code"] == 1008
+    await asyncio.wait_for(seller[2], timeout=5)
+    assert chat_broker.connections == 0
+
@@ -0,0 +1,222 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.models.event import Event
+from app.core.config import settings
+from app.services import event_service, event_partition_service
+from app.services.admin_metrics_service import AdminMetricsService
+from app.services.event_service import event_ingestor
+
+@pytest.fixture
+def ingestor_db(db_engine, monkeypatch):
+    # Point the background flusher at the per-test engine
+    monkeypatch.setattr(event_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    event_ingestor._buffer.clear()
+    event_ingestor._failures = 0
+    yield
+    event_ingestor._buffer.clear()
+
+@pytest.mark.asyncio
+async def test_events_are_buffered_and_flushed(client: AsyncClient, db, ingestor_db):
+    resp = await client.post("/api/v1/events/", json={"event_type": "search", "metadata": {"q": "jeans"}})
+    assert resp.status_code == 202
+    assert resp.json()["metadata"] == {"q": "jeans"}
+    await client.post("/api/v1/events/", json={"event_type": "search"})
+    # Unknown listing violates the FK; only that row is dropped
+    await client.post("/api/v1/events/", json={"event_type": "view_listing", "listing_id": str(uuid.uuid4())})
+    # jsonb rejects NUL characters: the whole batch fails and that row is isolated and dropped
+    await client.post("/api/v1/events/", json={"event_type": "search", "metadata": {"q": "\u0000"}})
+
+    assert await db.scalar(select(func.count()).select_from(Event)) == 0
+    assert await event_ingestor.flush() == 2
+    assert len(event_ingestor) == 0
+    rows = (await db.execute(select(Event.event_type, Event.metadata_))).all()
+    assert sorted(r.event_type for r in rows) == ["search", "search"]
+    assert {"q": "jeans"} in [r.metadata_ for r in rows]
+
+@pytest.mark.asyncio
+async def test_failed_flushes_are_retried_then_dropped(client: AsyncClient, db, ingestor_db, monkeypatch):
+    async def lost_connection(db, rows):
+        raise ConnectionResetError("connection lost")
+    monkeypatch.setattr(event_ingestor, "max_retries", 2)
+    monkeypatch.setattr(event_service, "insert_event_rows", lost_connection)
+    await client.post("/api/v1/events/", json={"event_type": "search"})
+
+    for _ in range(2):
+        with pytest.raises(ConnectionResetError):
+            await event_ingestor.flush()
+        assert len(event_ingestor) == 1
+    # The third consecutive failure gives up on the batch instead of filling the buffer
+    assert await event_ingestor.flush() == 0
+    assert len(event_ingestor) == 0
+
+@pytest.mark.asyncio
+async def test_event_rollups_feed_admin_metrics(client: AsyncClient, db, ingestor_db, monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_DEDUP_TYPES", [])
+    resp = await client.post("/api/v1/auth/signup", json={"email": "rollup@example.com", "password": "pw", "region": "North"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    listing = {"title": "Coat", "description": "", "category": "Women", "condition": "good", "price": 20.0}
+    listing_id = (await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"]
+    await client.post(f"/api/v1/listings/{listing_id}/publish", headers=headers)
+
+    for _ in range(3):
+        await client.post("/api/v1/events/", json={"event_type": "view_listing", "listing_id": listing_id}, headers=headers)
+    await client.post("/api/v1/events/", json={"event_type": "search"})
+    await event_ingestor.flush()
+    await client.post("/api/v1/events/", json={"event_type": "view_listing", "listing_id": listing_id}, headers=headers)
+    await event_ingestor.flush()
+
+    # Enriched with the viewer's region and the listing's category at ingest
+    views = (await db.execute(select(Event.region, Event.category).where(Event.event_type == "view_listing"))).all()
+    assert set(views) == {("North", "Women")}
+    # Two flushes into the same hour accumulate into one rollup row
+    rollups = (await db.execute(text(
+        "SELECT region, category, count FROM event_rollups_hourly WHERE event_type = 'view_listing'"
+    ))).all()
+    assert [tuple(r) for r in rollups] == [("North", "Women", 4)]
+
+    service = AdminMetricsService(db, live=True)
+    activity = {r["event_type"]: r["count"] for r in await service.get_activity(30)}
+    assert activity == {"view_listing": 4, "search": 1}
+    assert [r["count"] for r in await service.get_activity(30, region="North")] == [4]
+    demand = [r for r in await service.get_supply_demand(30) if r["category"] == "Women"]
+    assert [(r["region"], r["demand_count"]) for r in demand] == [("North", 4)]
+
+@pytest.mark.asyncio
+async def test_repeat_views_are_suppressed_and_counted(client: AsyncClient, db, ingestor_db):
+    resp = await client.post("/api/v1/auth/signup", json={"email": "viewer@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    listing = {"title": "Lamp", "description": "", "category": "Home", "condition": "good", "price": 5.0}
+    listing_id = (await client.post("/api/v1/listings/", json=listing, headers=headers)).json()["id"]
+    view = {"event_type": "view_listing", "listing_id": listing_id}
+
+    for _ in range(3):
+        await client.post("/api/v1/events/", json=view, headers=headers)
+    # Different anonymous sessions are different viewers; searches are never deduplicated
+    await client.post("/api/v1/events/", json=view, headers={"X-Session-Id": "a"})
+    await client.post("/api/v1/events/", json=view, headers={"X-Session-Id": "b"})
+    await client.post("/api/v1/events/", json=view, headers={"X-Session-Id": "b"})
+    # Anonymous views without a session id can't be told apart, so none are suppressed
+    await client.post("/api/v1/events/", json=view)
+    await client.post("/api/v1/events/", json=view)
+    resp = await client.post("/api/v1/events/bulk", json=[view, {"event_type": "search"}, {"event_type": "search"}], headers=headers)
+    assert resp.json() == {"accepted": 2, "dropped": 0, "suppressed": 1}
+    # Bulk repeats are judged by occurred_at: views hours apart all count, even in one request
+    now = datetime.now(timezone.utc)
+    timed = [{**view, "occurred_at": (now - timedelta(minutes=m)).isoformat()} for m in (300, 290, 120)]
+    resp = await client.post("/api/v1/events/bulk", json=timed, headers={"X-Session-Id": "c"})
+    assert resp.json() == {"accepted": 2, "dropped": 0, "suppressed": 1}
+    assert await event_ingestor.flush() == 5
+
+    views = await db.scalar(select(func.count()).select_from(Event).where(Event.event_type == "view_listing"))
+    assert views == 7
+    activity = {r["event_type"]: (r["count"], r["suppressed"]) for r in await AdminMetricsService(db, live=True).get_activity(30)}
+    assert activity == {"view_listing": (7, 5), "search": (2, 0)}
+
+@pytest.mark.asyncio
+async def test_event_buffer_backpressure(client: AsyncClient, ingestor_db, monkeypatch):
+    monkeypatch.setattr(event_ingestor, "max_buffer", 1)
+    monkeypatch.setattr(event_ingestor, "enqueue_timeout", 0.01)
+    assert (await client.post("/api/v1/events/", json={"event_type": "search"})).status_code == 202
+    resp = await client.post("/api/v1/events/", json={"event_type": "search"})
+    assert resp.status_code == 503
+
+@pytest.mark.asyncio
+async def test_bulk_events_json_and_ndjson(client: AsyncClient, db):
+    events = [{"event_type": "search", "occurred_at": "2020-01-01T00:00:00Z"} for _ in range(50)]
+    events[0] = {"event_type": "search", "metadata": {"q": "coat"}}
+    resp = await client.post("/api/v1/events/bulk", json=events)
+    assert resp.status_code == 200
+    assert resp.json() == {"accepted": 50, "dropped": 0, "suppressed": 0}
+
+    lines = "\n".join(['{"event_type": "view_listing"}', "", '{"event_type": "favorite", "listing_id": "%s"}' % uuid.uuid4()])
+    resp = await client.post("/api/v1/events/bulk", content=lines, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.json() == {"accepted": 1, "dropped": 1, "suppressed": 0}
+
+    assert await db.scalar(select(func.count()).select_from(Event)) == 51
+    # Old client timestamps are clamped to the accepted window rather than trusted blindly
+    oldest = await db.scalar(select(func.min(Event.created_at)))
+    assert oldest.year > 2020
+
+@pytest.mark.asyncio
+async def test_bulk_events_rejects_bad_input(client: AsyncClient, monkeypatch):
+    from app.core.config import settings
+    resp = await client.post("/api/v1/events/bulk", json=[{"event_type": "search"}, {"listing_id": "x"}])
+    assert resp.status_code == 422
+    assert "index 1" in resp.json()["detail"]
+    resp = await client.post("/api/v1/events/bulk", content=b'[{"event_type": "search"}', headers={"Content-Type": "application/json"})
+    assert resp.status_code == 400
+    monkeypatch.setattr(settings, "EVENT_BULK_MAX_EVENTS", 2)
+    resp = await client.post("/api/v1/events/bulk", json=[{"event_type": "search"}] * 3)
+    assert resp.status_code == 413
+    # The item limit holds even when an oversized item arrives whole in one chunk
+    big = {"event_type": "search", "metadata": {"q": "x" * 2000}}
+    monkeypatch.setattr(settings, "EVENT_BULK_MAX_ITEM_BYTES", 1000)
+    resp = await client.post("/api/v1/events/bulk", json=[big])
+    assert resp.status_code == 400 and "exceeds" in resp.json()["detail"]
+    resp = await client.post("/api/v1/events/bulk", content=json.dumps(big) + "\n", headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 400 and "exceeds" in resp.json()["detail"]
+    resp = await client.post("/api/v1/events/bulk", content=json.dumps(big), headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 400
+
+@pytest.mark.asyncio
+async def test_event_partition_maintenance(db, db_engine, monkeypatch):
+    monkeypatch.setattr(event_partition_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(settings, "EVENT_PARTITIONS_AHEAD", 2)
+    monkeypatch.setattr(settings, "EVENT_RETENTION_DAYS", 60)
+    # Rows that landed in the default partition before their partition existed
+    for ts in ("2026-03-15", "2026-01-10"):
+        db.add(Event(event_type="search", metadata_={}, created_at=datetime.fromisoformat(ts).replace(tzinfo=timezone.utc)))
+    await db.commit()
+
+    created = await event_partition_service.ensure_event_partitions(today=date(2026, 3, 20))
+    assert created == ["events_p202603", "events_p202604", "events_p202605"]
+    assert await event_partition_service.ensure_event_partitions(today=date(2026, 3, 20)) == []
+    placement = dict((await db.execute(text(
+        "SELECT tableoid::regclass::text, COUNT(*) FROM events GROUP BY 1"
+    ))).all())
+    assert placement == {"events_p202603": 1, "events_default": 1}
+    await db.commit()  # release our lock on events so the detach can proceed
+
+    dropped = await event_partition_service.drop_expired_event_partitions(today=date(2026, 6, 1))
+    assert dropped == ["events_p202603"]
+    assert await db.scalar(select(func.count()).select_from(Event)) == 0
+
+@pytest.mark.asyncio
+async def test_partition_maintenance_runs_in_one_worker_at_a_time(db, db_engine, monkeypatch):
+    monkeypatch.setattr(event_partition_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    # Another worker holds the maintenance lock: this one skips the round
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": event_partition_service.MAINTENANCE_LOCK})
+    await event_partition_service.maintain_event_partitions()
+    assert await event_partition_service.list_event_partitions(db) == ["events_default"]
+    await db.commit()
+
+    await event_partition_service.maintain_event_partitions()
+    assert len(await event_partition_service.list_event_partitions(db)) == settings.EVENT_PARTITIONS_AHEAD + 2
+
+@pytest.mark.asyncio
+async def test_windowed_event_queries_scan_only_matching_partitions(db, db_engine, monkeypatch):
+    monkeypatch.setattr(event_partition_service, "SessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
+    monkeypatch.setattr(settings, "EVENT_PARTITIONS_AHEAD", 3)
+    await event_partition_service.ensure_event_partitions(today=date(2026, 3, 20))
+
+    def scanned(plan: dict) -> set:
+        found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+        for child in plan.get("Plans", []):
+            found |= scanned(child)
+        return found
+
+    async def partitions_scanned(where: str, **params) -> set:
+        result = await db.execute(text(f"EXPLAIN (FORMAT JSON) SELECT COUNT(*) FROM events WHERE {where}"), params)
+        return scanned(result.scalar()[0]["Plan"])
+
+    window = {"start": datetime(2026, 4, 10, tzinfo=timezone.utc), "end": datetime(2026, 5, 5, tzinfo=timezone.utc)}
+    assert await partitions_scanned("created_at >= :start AND created_at < :end", **window) == {"events_p202604", "events_p202605"}
+    assert await partitions_scanned("created_at >= :start AND created_at < :start + interval '1 day'", **window) == {"events_p202604"}
+    # Outside every period partition, only the catch-all is left
+    before = {"start": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+    assert await partitions_scanned("created_at < :start", **before) == {"events_default"}